@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of the text chunkers used by /data/process.
+
+Compares helpers.text_chunker.TextChunker with LangChain RecursiveCharacterTextSplitter
+on a large generated text and checks that both return the same chunks.
+
+Usage (from the src folder):
+    python -m benchmarks.chunker_benchmark --size-mb 20 --chunk-size 500 --overlap-size 50
+"""
+from helpers.text_chunker import TextChunker
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+import argparse
+import random
+import time
+
+def generate_text(size: int, seed: int = 0):
+    """Function to generate a text of about the giving number of characters with paragraphs, lines and words"""
+    rng = random.Random(seed)
+    words = [ "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(1, 12))) for _ in range(5000) ]
+
+    paragraphs = []
+    total = 0
+    while total < size:
+        lines = [
+            " ".join(rng.choices(words, k=rng.randint(3, 25)))
+            for _ in range(rng.randint(1, 8))
+        ]
+        paragraph = "\n".join(lines)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+
+    return "\n\n".join(paragraphs)
+
+def run_splitter(name: str, split_text, text: str, repeats: int):
+    """Function to time a split function, returns its chunks and prints its throughput"""
+    timings = []
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        chunks = split_text(text)
+        timings.append(time.perf_counter() - started_at)
+
+    best = min(timings)
+    print(f"{name:<12} best {best:8.3f}s  {len(text) / best / 1e6:8.2f} M chars/s  {len(chunks)} chunks")
+
+    return chunks, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the native chunker with the LangChain splitter")
+    parser.add_argument("--size-mb", type=float, default=20, help="size of the generated text (millions of characters)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap-size", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    text = generate_text(size=int(args.size_mb * 1e6))
+    print(f"text: {len(text) / 1e6:.1f} M chars, chunk_size={args.chunk_size}, overlap_size={args.overlap_size}")
+
+    langchain_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.overlap_size,
+        length_function=len,
+    )
+    native_chunker = TextChunker(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.overlap_size,
+        length_function=len,
+    )
+
+    langchain_chunks, langchain_time = run_splitter("langchain", langchain_splitter.split_text, text, args.repeats)
+    native_chunks, native_time = run_splitter("native", native_chunker.split_text, text, args.repeats)
+
+    print(f"speedup: {langchain_time / native_time:.2f}x, same chunks: {langchain_chunks == native_chunks}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Offline benchmark of the RAG pipeline components (ProcessController, ChunkModel, IndexingController,
+NLPController and the vector db provider) across data sizes.
+
+Runs without any external service: an in-memory Mongo stand-in (mongomock_motor, or a local Mongo with
+--mongodb-url), the deterministic FAKE embedding / generation provider of LLMProviderFactory (with an
+optional simulated latency per request) and the vector db in local mode under a temporary folder.
+For each size it measures:
+    chunking   load and split a generated text file (ProcessController.split_file)
+    insert     insert the chunks in the db (ChunkModel.insert_many_chunks)
+    push       embed and index the chunks (IndexingController.index_project)
+    search     latency of the vector search of a query (NLPController.search_vector_db_collection)
+    prompt     latency of the prompt assembly of the retrieved documents (NLPController.construct_rag_prompt)
+    answer     latency of a full answer (NLPController.answer_rag_question)
+
+The results are written as JSON to compare the runs (--compare prints the change against an older run).
+The in-memory stand-in scans the collection for every update, so the db bound numbers (insert, push)
+are only comparable between in-memory runs, use a local Mongo for large sizes and absolute numbers.
+
+Usage (from the src folder):
+    python -m benchmarks.pipeline_benchmark --sizes 500 2000 --output results.json
+    python -m benchmarks.pipeline_benchmark --sizes 2000 --vectordb NUMPY --compare results.json
+    python -m benchmarks.pipeline_benchmark --sizes 10000 100000 --mongodb-url mongodb://localhost:27017
+    python -m benchmarks.pipeline_benchmark --embedding-latency 0.05 --generation-latency 0.5
+"""
+from dotenv import dotenv_values
+from datetime import datetime, timezone
+import numpy as np
+import subprocess
+import tempfile
+import argparse
+import platform
+import asyncio
+import random
+import shutil
+import json
+import time
+import os
+
+# required settings without a default, used if they are not set in the environment or the .env file
+DEFAULT_SETTINGS = {
+    "APP_NAME": "rag-benchmark",
+    "APP_VERSION": "0.1",
+    "OPENAI_API_KEY": "",
+    "OPENAI_API_URL": "",
+    "COHERE_API_KEY": "",
+    "FILE_ALLOWED_TYPES": '["text/plain"]',
+    "FILE_MAX_SIZE": "10",
+    "FILE_DEFAULT_CHUNK_SIZE": "512000",
+    "MONGODB_URL": "",
+    "MONGODB_DATABASE": "rag",
+    "INPUT_DAFAULT_MAX_CHARACTERS": "1024",
+    "GENERATION_DAFAULT_MAX_TOKENS": "200",
+    "GENERATION_DAFAULT_TEMPERATURE": "0.1",
+    "VECTOR_DB_DISTANCE_METHOD": "cosine",
+}
+
+# the (comparable) metrics printed by --compare, and whether a higher value is better
+COMPARED_METRICS = {
+    ("chunking", "chars_per_second"): True,
+    ("insert", "chunks_per_second"): True,
+    ("push", "chunks_per_second"): True,
+    ("search", "p50_ms"): False,
+    ("search", "p99_ms"): False,
+    ("prompt", "p50_ms"): False,
+    ("prompt", "p99_ms"): False,
+    ("answer", "p50_ms"): False,
+    ("answer", "p99_ms"): False,
+}
+
+def configure_settings(args, vector_db_path: str):
+    """Function to set the settings of the offline run (fake llm provider, local vector db)
+    before the settings are read by the controllers"""
+    configured = {**dotenv_values(".env"), **os.environ}
+
+    for key, value in DEFAULT_SETTINGS.items():
+        if not configured.get(key):
+            os.environ[key] = value
+
+    os.environ.update({
+        "GENERATION_BACKEND": "FAKE",
+        "EMBEDDING_BACKEND": "FAKE",
+        "GENERATION_MODEL_ID": "fake-generation",
+        "EMBEDDING_MODEL_ID": "fake-embedding",
+        "EMBEDDING_MODEL_SIZE": str(args.embedding_size),
+        "FAKE_EMBEDDING_LATENCY": str(args.embedding_latency),
+        "FAKE_GENERATION_LATENCY": str(args.generation_latency),
+        "VECTOR_DB_BACKEND": args.vectordb,
+        "VECTOR_DB_PATH": vector_db_path, # an absolute path is kept as it is by the factory
+        "VECTOR_DB_URL": "",
+        "SEARCH_DEFAULT_MODE": "vector",
+        "METRICS_ENABLED": "False",
+    })
+
+def patch_mongomock_bulk_update():
+    """Function to make the in-memory stand-in accept the sort argument that pymongo (>= 4.11)
+    passes to the update operations of bulk_write (ChunkModel.mark_chunks_indexed)"""
+    import mongomock.collection
+    import inspect
+
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+    if "sort" in inspect.signature(add_update).parameters:
+        return
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    mongomock.collection.BulkOperationBuilder.add_update = add_update_without_sort
+
+def get_git_commit():
+    """Function to return the current git commit (None outside a git checkout)"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def summarize_latencies(latencies: list):
+    """Function to return the percentiles (milliseconds) of a list of latencies (seconds)"""
+    latencies_ms = np.array(latencies) * 1000
+
+    return {
+        "count": len(latencies),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "max_ms": round(float(latencies_ms.max()), 3),
+    }
+
+async def measure_latencies(run_query, queries: list, warmup: int = 5):
+    """Function to call an async function for every query (after a few warm-up calls) and return the latencies"""
+    for query in queries[:warmup]:
+        await run_query(query)
+
+    latencies = []
+    for query in queries:
+        started_at = time.perf_counter()
+        await run_query(query)
+        latencies.append(time.perf_counter() - started_at)
+
+    return latencies
+
+def generate_queries(chunks: list, count: int, seed: int = 0):
+    """Function to create queries from the words of random chunks (like questions on the indexed data)"""
+    rng = random.Random(seed)
+    queries = []
+
+    for _ in range(count):
+        words = rng.choice(chunks).chunk_text.split()
+        start = rng.randint(0, max(0, len(words) - 8))
+        queries.append(" ".join(words[start:start + 8]))
+
+    return queries
+
+async def run_size(args, size: int, db_client, clients: dict):
+    """Function to run all the measures for one data size (number of chunks)"""
+    from controllers import ProcessController, NLPController, IndexingController
+    from models.ProjectModel import ProjectModel
+    from models.ChunkModel import ChunkModel
+    from models.db_schemes import DataChunk
+    from benchmarks.chunker_benchmark import generate_text
+    from bson.objectid import ObjectId
+
+    project_id = f"benchmark{size}{int(time.time())}"
+    result = {"chunks": size}
+
+    project_model = await ProjectModel.create_instance(db_client=db_client)
+    chunk_model = await ChunkModel.create_instance(db_client=db_client)
+    project = await project_model.get_project_or_create_one(project_id=project_id)
+
+    process_controller = ProcessController(project_id=project_id)
+    nlp_controller = NLPController(
+        vectordb_client=clients["vectordb"],
+        generation_client=clients["generation"],
+        embedding_client=clients["embedding"],
+        template_parser=clients["template_parser"],
+    )
+
+    try:
+        # chunking: a text file of about size chunks
+        file_id = "benchmark.txt"
+        text = generate_text(size=size * (args.chunk_size - args.overlap_size), seed=size)
+        with open(os.path.join(process_controller.project_path, file_id), "w", encoding="utf-8") as text_file:
+            text_file.write(text)
+
+        started_at = time.perf_counter()
+        file_chunks = process_controller.split_file(file_id=file_id, chunk_size=args.chunk_size,
+                                                    overlap_size=args.overlap_size)
+        seconds = time.perf_counter() - started_at
+
+        result["chunking"] = {
+            "characters": len(text),
+            "chunks": len(file_chunks),
+            "seconds": round(seconds, 4),
+            "chars_per_second": round(len(text) / seconds),
+            "chunks_per_second": round(len(file_chunks) / seconds),
+        }
+
+        # insert
+        chunks = [
+            DataChunk(
+                chunk_text=chunk.page_content,
+                chunk_metadata=chunk.metadata,
+                chunk_order=i+1,
+                chunk_project_id=project.id,
+                chunk_asset_id=ObjectId(),
+            )
+            for i, chunk in enumerate(file_chunks)
+        ]
+
+        started_at = time.perf_counter()
+        inserted_count = await chunk_model.insert_many_chunks(chunks=chunks)
+        seconds = time.perf_counter() - started_at
+
+        result["insert"] = {
+            "chunks": inserted_count,
+            "seconds": round(seconds, 4),
+            "chunks_per_second": round(inserted_count / seconds),
+        }
+
+        # push
+        indexing_controller = IndexingController(nlp_controller=nlp_controller, chunk_model=chunk_model)
+
+        started_at = time.perf_counter()
+        is_success, stats = await indexing_controller.index_project(project=project, do_reset=True,
+                                                                    read_batch_size=args.push_batch_size)
+        seconds = time.perf_counter() - started_at
+
+        result["push"] = {
+            "is_success": is_success,
+            "chunks": stats.get("inserted_items_count"),
+            "seconds": round(seconds, 4),
+            "chunks_per_second": round((stats.get("inserted_items_count") or 0) / seconds),
+            # items per second of the read / embed / upsert stages while they are busy
+            "stages_items_per_second": {
+                stage: round(stage_stats["items_per_second"])
+                for stage, stage_stats in stats.get("stages", {}).items()
+            },
+        }
+
+        # search, prompt assembly and answer
+        queries = generate_queries(chunks=chunks, count=args.queries, seed=size)
+
+        async def search(query: str):
+            return await nlp_controller.search_vector_db_collection(project=project, text=query, limit=args.limit)
+
+        async def answer(query: str):
+            return await nlp_controller.answer_rag_question(project=project, query=query, limit=args.limit)
+
+        result["search"] = summarize_latencies(await measure_latencies(search, queries))
+
+        retrieved_documents = [ await search(query) for query in queries ]
+        prompt_latencies = []
+        for query, documents in zip(queries, retrieved_documents):
+            started_at = time.perf_counter()
+            nlp_controller.construct_rag_prompt(query=query, retrieved_documents=documents)
+            prompt_latencies.append(time.perf_counter() - started_at)
+
+        result["prompt"] = summarize_latencies(prompt_latencies)
+        result["answer"] = summarize_latencies(await measure_latencies(answer, queries))
+
+    finally:
+        nlp_controller.reset_vector_db_collection(project=project)
+        await chunk_model.delete_chunks_by_project_id(project_id=project.id)
+        await project_model.collection.delete_one({"project_id": project_id})
+        shutil.rmtree(process_controller.project_path, ignore_errors=True)
+
+    return result
+
+def print_result(result: dict):
+    """Function to print the measures of one data size"""
+    print(f"chunks: {result['chunks']}")
+    print(f"  chunking {result['chunking']['chars_per_second'] / 1e6:8.2f} M chars/s "
+          f"{result['chunking']['chunks_per_second']:10d} chunks/s")
+    print(f"  insert   {result['insert']['chunks_per_second']:10d} chunks/s")
+    print(f"  push     {result['push']['chunks_per_second']:10d} chunks/s")
+
+    for name in ["search", "prompt", "answer"]:
+        print(f"  {name:<8} p50 {result[name]['p50_ms']:9.3f} ms  p99 {result[name]['p99_ms']:9.3f} ms")
+
+def print_comparison(results: list, baseline_path: str):
+    """Function to print the change of the measures against the results of an older run"""
+    with open(baseline_path, "r") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    baseline_results = { result["chunks"]: result for result in baseline["results"] }
+    print(f"compared with {baseline_path} (commit {baseline['environment'].get('git_commit')})")
+
+    for result in results:
+        baseline_result = baseline_results.get(result["chunks"])
+        if baseline_result is None:
+            continue
+
+        print(f"chunks: {result['chunks']}")
+        for (name, metric), higher_is_better in COMPARED_METRICS.items():
+            old, new = baseline_result.get(name, {}).get(metric), result.get(name, {}).get(metric)
+            if not old or new is None:
+                continue
+
+            change = (new - old) / old * 100
+            better = (change > 0) == higher_is_better
+            print(f"  {name:<8} {metric:<18} {old:>12} -> {new:>12}  {change:+7.1f}% "
+                  f"{'better' if better else 'worse'}")
+
+async def run(args):
+    vector_db_path = tempfile.mkdtemp(prefix="rag-benchmark-")
+    configure_settings(args, vector_db_path=vector_db_path)
+
+    from helpers.config import get_settings
+    from stores.llm.LLMProviderFactory import LLMProviderFactory
+    from stores.vectordb.VectorDBProviderFactory import VectorDBProviderFactory
+    from stores.llm.templates.template_parser import TemplateParser
+
+    settings = get_settings()
+
+    if args.mongodb_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo_conn = AsyncIOMotorClient(args.mongodb_url)
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("mongomock_motor is not installed, install it or use --mongodb-url")
+        patch_mongomock_bulk_update()
+        mongo_conn = AsyncMongoMockClient()
+
+    database_name = f"rag_benchmark_{int(time.time())}"
+    db_client = mongo_conn[database_name]
+
+    llm_provider_factory = LLMProviderFactory(settings)
+
+    generation_client = llm_provider_factory.create(provider=settings.GENERATION_BACKEND)
+    generation_client.set_generation_model(model_id=settings.GENERATION_MODEL_ID)
+
+    embedding_client = llm_provider_factory.create(provider=settings.EMBEDDING_BACKEND)
+    embedding_client.set_embedding_model(model_id=settings.EMBEDDING_MODEL_ID,
+                                         embedding_size=settings.EMBEDDING_MODEL_SIZE)
+
+    vectordb_client = VectorDBProviderFactory(settings).create(provider=settings.VECTOR_DB_BACKEND)
+    vectordb_client.connect()
+
+    clients = {
+        "generation": generation_client,
+        "embedding": embedding_client,
+        "vectordb": vectordb_client,
+        "template_parser": TemplateParser(language=settings.PRIMARY_LANG, default_language=settings.DEFAULT_LANG),
+    }
+
+    results = []
+    try:
+        for size in args.sizes:
+            result = await run_size(args, size=size, db_client=db_client, clients=clients)
+            print_result(result)
+            results.append(result)
+    finally:
+        if args.mongodb_url:
+            await mongo_conn.drop_database(database_name)
+        mongo_conn.close()
+        await vectordb_client.disconnect_async()
+        await llm_provider_factory.close()
+        shutil.rmtree(vector_db_path, ignore_errors=True)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the throughput and latency of the pipeline components offline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000], help="numbers of chunks")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap-size", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200, help="number of search / answer queries per size")
+    parser.add_argument("--limit", type=int, default=10, help="number of retrieved documents")
+    parser.add_argument("--push-batch-size", type=int, default=100)
+    parser.add_argument("--embedding-size", type=int, default=384)
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="simulated seconds per embedding request")
+    parser.add_argument("--generation-latency", type=float, default=0.0, help="simulated seconds per generation")
+    parser.add_argument("--vectordb", type=str, default="QDRANT", choices=["QDRANT", "NUMPY", "IVF"])
+    parser.add_argument("--mongodb-url", type=str, default=None, help="local Mongo (default: in-memory stand-in)")
+    parser.add_argument("--output", type=str, default="pipeline_benchmark.json", help="JSON results file")
+    parser.add_argument("--compare", type=str, default=None, help="JSON results of an older run")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    results = asyncio.run(run(args))
+
+    report = {
+        "benchmark": "pipeline",
+        "created_at": started_at.isoformat(),
+        "environment": {
+            "git_commit": get_git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mongodb": "local" if args.mongodb_url else "in-memory",
+        },
+        "params": vars(args),
+        "results": results,
+    }
+
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        print_comparison(results, baseline_path=args.compare)
+
+if __name__ == "__main__":
+    main()
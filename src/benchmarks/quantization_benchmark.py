@@ -0,0 +1,102 @@
+"""
+Recall / memory benchmark of the vector quantization settings (VECTOR_DB_QUANTIZATION).
+
+Emulates the qdrant quantized search with numpy: the candidates are the top limit * oversampling vectors
+by the quantized score (int8 scalar or 1 bit binary), then they are rescored with the float32 vectors.
+The recall is measured against the exact float32 search, so run it on real embeddings of your data
+(a .npy matrix) to choose the quantization and the oversampling.
+
+Usage (from the src folder):
+    python -m benchmarks.quantization_benchmark --vectors embeddings.npy --limit 10 --oversampling 1 2 4
+    python -m benchmarks.quantization_benchmark --count 100000 --dim 1536
+"""
+import numpy as np
+import argparse
+
+def normalize(vectors: np.ndarray):
+    """Function to scale the vectors to unit length (cosine distance)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def generate_vectors(count: int, dim: int, seed: int = 0):
+    """Function to generate clustered unit vectors (closer to real embeddings than uniform noise)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 100), dim))
+    vectors = centers[rng.integers(0, centers.shape[0], count)] + 0.7 * rng.normal(size=(count, dim))
+    return normalize(vectors).astype(np.float32)
+
+def quantize_scalar(vectors: np.ndarray, quantile: float = 0.99):
+    """Function to encode the vectors to int8 on the range of the central values (like qdrant scalar quantization)"""
+    low = np.quantile(vectors, 1 - quantile)
+    high = np.quantile(vectors, quantile)
+    scale = (high - low) / 255
+
+    codes = np.clip(np.round((vectors - low) / scale) - 128, -128, 127).astype(np.int8)
+    decode = lambda codes: (codes.astype(np.float32) + 128) * scale + low
+
+    return codes, decode
+
+def quantize_binary(vectors: np.ndarray):
+    """Function to encode every dimension to its sign bit (like qdrant binary quantization)"""
+    return np.packbits(vectors > 0, axis=1)
+
+def search_candidates(quantization: str, codes, decode, queries: np.ndarray, count: int):
+    """Function to return the top candidates of every query by the quantized score"""
+    if quantization == "scalar":
+        scores = queries @ decode(codes).T
+    else:
+        # matching bits - different bits = dim - 2 * hamming distance (bits counted with a byte table)
+        bit_counts = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+        scores = np.stack([
+            -bit_counts[query_code ^ codes].sum(axis=1, dtype=np.int32)
+            for query_code in quantize_binary(queries)
+        ])
+
+    return np.argpartition(-scores, count - 1, axis=1)[:, :count]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the recall and memory of the vector quantization settings")
+    parser.add_argument("--vectors", type=str, default=None, help=".npy matrix of embeddings (default: generated)")
+    parser.add_argument("--count", type=int, default=20000, help="number of generated vectors")
+    parser.add_argument("--dim", type=int, default=1536, help="size of the generated vectors")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    args = parser.parse_args()
+
+    vectors = normalize(np.load(args.vectors)).astype(np.float32) if args.vectors else \
+        generate_vectors(count=args.count, dim=args.dim)
+
+    # the queries are perturbed stored vectors, they have close neighbours like real questions
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(vectors.shape[0], args.queries, replace=False)]
+    queries = normalize(queries + 0.3 * rng.normal(size=queries.shape) / np.sqrt(vectors.shape[1])).astype(np.float32)
+
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.limit]
+    float_bytes = vectors.shape[1] * 4
+    print(f"vectors: {vectors.shape[0]} x {vectors.shape[1]}, float32 {float_bytes} bytes/vector, limit={args.limit}")
+
+    encoders = {
+        "scalar": lambda: quantize_scalar(vectors),
+        "binary": lambda: (quantize_binary(vectors), None),
+    }
+
+    for quantization, encode in encoders.items():
+        codes, decode = encode()
+        code_bytes = codes.shape[1]
+
+        for oversampling in args.oversampling:
+            candidates = search_candidates(quantization, codes, decode, queries,
+                                           count=min(vectors.shape[0], int(np.ceil(args.limit * oversampling))))
+
+            # rescore the candidates with the original vectors
+            recall = 0
+            for query, query_candidates, query_exact in zip(queries, candidates, exact):
+                rescored = query_candidates[np.argsort(-(vectors[query_candidates] @ query))[:args.limit]]
+                recall += len(set(rescored.tolist()) & set(query_exact.tolist())) / args.limit
+
+            print(f"{quantization:<7} {code_bytes:6d} bytes/vector ({float_bytes / code_bytes:4.1f}x smaller)  "
+                  f"oversampling {oversampling:4.1f}  recall@{args.limit} {recall / len(queries):.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,12 @@ class BaseController:
             self.base_dir,
             "assets/database"
         )
+
+        # prepare location to store the profiles of the sampling profiler
+        self.profiles_dir = os.path.join(
+            self.base_dir,
+            "assets/profiles"
+        )
         
     def generate_random_string(self, length: int=12):
         return ''.join(random.choices(string.ascii_lowercase + string.digits, k=length))
@@ -0,0 +1,345 @@
+from .BaseController import BaseController
+from .NLPController import NLPController
+from models.ChunkModel import ChunkModel
+from models.db_schemes import Project
+from helpers.metrics import track_latency
+import asyncio
+import logging
+import time
+
+class IndexingController(BaseController):
+    """
+    Pipelined indexing engine that pushes the chunks of a project into the vector database.
+
+    The work is split into three stages connected by bounded queues (backpressure):
+        1. a reader that pages over the project chunks in Mongo,
+        2. a pool of embedding workers that embed the pages concurrently,
+        3. upsert workers that group embedded records into bigger batches and insert them.
+    So Mongo, the embedding api and the vector database are all busy at the same time.
+    """
+
+    # marks the end of the stream in a queue
+    END_OF_STREAM = None
+
+    def __init__(self, nlp_controller: NLPController, chunk_model: ChunkModel,
+                 embed_workers: int = None, upsert_workers: int = None,
+                 queue_size: int = None, upsert_batch_size: int = None):
+        """
+        Initialize the indexing engine.
+
+        Args:
+            nlp_controller (NLPController): The controller used to embed and insert the chunks.
+            chunk_model (ChunkModel): The model used to read the project chunks.
+            embed_workers (int, optional): Number of concurrent embedding workers. Defaults to INDEX_EMBED_WORKERS.
+            upsert_workers (int, optional): Number of concurrent upsert workers. Defaults to INDEX_UPSERT_WORKERS.
+            queue_size (int, optional): Maximum number of batches waiting between two stages. Defaults to INDEX_QUEUE_SIZE.
+            upsert_batch_size (int, optional): Number of records inserted together. Defaults to INDEX_UPSERT_BATCH_SIZE.
+        """
+        super().__init__()
+
+        self.nlp_controller = nlp_controller
+        self.chunk_model = chunk_model
+
+        self.embed_workers = embed_workers or self.app_settings.INDEX_EMBED_WORKERS
+        self.upsert_workers = upsert_workers or self.app_settings.INDEX_UPSERT_WORKERS
+        self.queue_size = queue_size or self.app_settings.INDEX_QUEUE_SIZE
+        self.upsert_batch_size = upsert_batch_size or self.app_settings.INDEX_UPSERT_BATCH_SIZE
+
+        self.logger = logging.getLogger(__name__)
+
+    def create_stage_stats(self, workers: int):
+        """Function to create the counters of one pipeline stage"""
+        return {
+            "workers": workers,
+            "batches": 0,
+            "items": 0,
+            "busy_seconds": 0.0, # summed over the workers of the stage
+        }
+
+    @track_latency("controller")
+    async def index_project(self, project: Project, do_reset: bool = False, read_batch_size: int = 100,
+                            after_id=None, on_checkpoint=None):
+        """
+        Push the chunks of a project into the vector database.
+
+        The push is incremental: every chunk is stored under an ID derived from its Mongo _id and is marked
+        with its content hash and the embedding model once inserted, so only the new or changed chunks
+        (or all of them if the embedding model changed) are embedded, and the records of the deleted
+        chunks are removed from the collection.
+
+        Args:
+            project (Project): The project to index.
+            do_reset (bool): Whether to reset the collection and re-index all chunks. Defaults to False.
+            read_batch_size (int): Number of chunks read (and embedded) together. Defaults to 100.
+            after_id (ObjectId, optional): Resume token, only the chunks after this _id are indexed.
+            on_checkpoint (callable, optional): Async callback called with a checkpoint dict
+                                                ({"after_id", "inserted_items_count"})
+                                                every time all the chunks up to "after_id" are inserted.
+
+        Returns:
+            tuple: (is_success (bool), stats (dict)) where stats has the number of inserted and deleted
+                   items and the throughput of each stage.
+        """
+        # the collection is created (or reset) once before the stages start,
+        # a new collection is empty so all the chunks are pushed whatever their markers say
+        is_new_collection = self.nlp_controller.prepare_vector_db_collection(project=project, do_reset=do_reset)
+        is_full_push = bool(do_reset) or bool(is_new_collection)
+
+        # the markers of the chunks point to records that no longer exist, they are cleared before
+        # the push starts so the chunks not pushed yet stay pending if this push stops early
+        if is_full_push:
+            await self.chunk_model.unmark_project_chunks_indexed(project_id=project.id)
+
+        # the chunks inserted before the lexical index existed are added to it (lexical / hybrid search)
+        lexical_indexed_count = await self.sync_lexical_index(project=project, batch_size=read_batch_size)
+
+        embedding_model = self.nlp_controller.get_embedding_model_name()
+
+        embed_queue = asyncio.Queue(maxsize=self.queue_size)
+        upsert_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        stats = {
+            "read": self.create_stage_stats(workers=1),
+            "embed": self.create_stage_stats(workers=self.embed_workers),
+            "upsert": self.create_stage_stats(workers=self.upsert_workers),
+        }
+
+        # pages are embedded concurrently and could finish out of order, so the checkpoint only moves
+        # forward to the last page that all the pages before it are inserted too
+        pages = [] # last chunk id of each read page
+        done_pages = set()
+        checkpoint = { "page_no": -1 }
+
+        async def read_stage():
+            started_at = time.perf_counter()
+
+            async for page_chunks in self.chunk_model.iterate_project_chunks(
+                project_id=project.id,
+                batch_size=read_batch_size,
+                after_id=after_id,
+                pending_for_model=None if is_full_push else embedding_model,
+            ):
+                stats["read"]["busy_seconds"] += time.perf_counter() - started_at
+                stats["read"]["batches"] += 1
+                stats["read"]["items"] += len(page_chunks)
+
+                pages.append(page_chunks[-1].id)
+                await embed_queue.put((len(pages) - 1, page_chunks))
+                started_at = time.perf_counter()
+
+            for _ in range(self.embed_workers):
+                await embed_queue.put(self.END_OF_STREAM)
+
+        async def embed_stage():
+            while (item := await embed_queue.get()) is not self.END_OF_STREAM:
+                page_no, page_chunks = item
+
+                started_at = time.perf_counter()
+                embedded_chunks = await self.nlp_controller.embed_chunks(chunks=page_chunks)
+                stats["embed"]["busy_seconds"] += time.perf_counter() - started_at
+
+                if embedded_chunks is None:
+                    raise RuntimeError(f"Could not embed a page of {len(page_chunks)} chunks")
+
+                stats["embed"]["batches"] += 1
+                stats["embed"]["items"] += len(embedded_chunks["record_ids"])
+
+                # the chunks that were embedded (the failed ones are skipped), to mark them as indexed
+                chunks_by_record_id = { self.nlp_controller.get_record_id(chunk_id=c.id): c for c in page_chunks }
+                embedded_page_chunks = [ chunks_by_record_id[record_id] for record_id in embedded_chunks["record_ids"] ]
+
+                await upsert_queue.put((page_no, embedded_chunks, embedded_page_chunks))
+
+        async def upsert_stage():
+            pending = { "texts": [], "metadata": [], "vectors": [], "record_ids": [], "asset_ids": [] }
+            pending_chunks = []
+            pending_pages = []
+
+            async def flush():
+                if len(pending["record_ids"]) == 0:
+                    return
+
+                started_at = time.perf_counter()
+                # the vector db client is blocking, run it in a thread so the other stages keep running
+                is_inserted = await asyncio.to_thread(
+                    self.nlp_controller.insert_into_vector_db, project=project, **pending
+                )
+
+                if not is_inserted:
+                    raise RuntimeError(f"Could not insert a batch of {len(pending['record_ids'])} records")
+
+                # the next push skips these chunks unless their content or the embedding model changes
+                await self.chunk_model.mark_chunks_indexed(
+                    chunk_ids=[ c.id for c in pending_chunks ],
+                    chunk_hashes=[ c.chunk_hash or c.create_hash() for c in pending_chunks ],
+                    embedding_model=embedding_model,
+                )
+                stats["upsert"]["busy_seconds"] += time.perf_counter() - started_at
+
+                stats["upsert"]["batches"] += 1
+                stats["upsert"]["items"] += len(pending["record_ids"])
+
+                for values in pending.values():
+                    values.clear()
+                pending_chunks.clear()
+
+                done_pages.update(pending_pages)
+                pending_pages.clear()
+                await move_checkpoint()
+
+            while (item := await upsert_queue.get()) is not self.END_OF_STREAM:
+                page_no, embedded_chunks, embedded_page_chunks = item
+                pending_pages.append(page_no)
+                pending_chunks.extend(embedded_page_chunks)
+
+                for key, values in embedded_chunks.items():
+                    pending[key].extend(values)
+
+                if len(pending["record_ids"]) >= self.upsert_batch_size:
+                    await flush()
+
+            await flush()
+
+        async def move_checkpoint():
+            page_no = checkpoint["page_no"]
+            while page_no + 1 in done_pages:
+                page_no += 1
+
+            if page_no == checkpoint["page_no"]:
+                return
+
+            checkpoint["page_no"] = page_no
+            if on_checkpoint:
+                await on_checkpoint({
+                    "after_id": pages[page_no],
+                    "inserted_items_count": stats["upsert"]["items"],
+                })
+
+        async def embed_stages():
+            # the upsert workers stop only after all embedding workers are done
+            async with asyncio.TaskGroup() as group:
+                for _ in range(self.embed_workers):
+                    group.create_task(embed_stage())
+
+            for _ in range(self.upsert_workers):
+                await upsert_queue.put(self.END_OF_STREAM)
+
+        is_success = True
+        deleted_items_count = 0
+        started_at = time.perf_counter()
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(read_stage())
+                group.create_task(embed_stages())
+                for _ in range(self.upsert_workers):
+                    group.create_task(upsert_stage())
+        except* Exception as errors:
+            # the task group cancels the other stages when one of them fails
+            for error in errors.exceptions:
+                self.logger.error(f"Error while indexing project {project.project_id}: {error}")
+            is_success = False
+
+        # a reset / new collection has no records of deleted chunks
+        if is_success and not is_full_push:
+            deleted_items_count = await self.remove_stale_records(project=project)
+            is_success = deleted_items_count is not None
+
+        elapsed_seconds = time.perf_counter() - started_at
+
+        for stage_stats in stats.values():
+            # items per second of one worker while it is busy, times the number of workers
+            stage_stats["items_per_second"] = (
+                stage_stats["items"] / stage_stats["busy_seconds"] * stage_stats["workers"]
+                if stage_stats["busy_seconds"] else 0.0
+            )
+
+        return is_success, {
+            "inserted_items_count": stats["upsert"]["items"],
+            "deleted_items_count": deleted_items_count or 0,
+            "lexical_indexed_count": lexical_indexed_count,
+            "elapsed_seconds": elapsed_seconds,
+            "items_per_second": stats["upsert"]["items"] / elapsed_seconds if elapsed_seconds else 0.0,
+            "stages": stats,
+        }
+
+    async def sync_lexical_index(self, project: Project, batch_size: int = 100):
+        """
+        Rebuild the lexical (BM25) index of a project from its chunks in Mongo when it does not have
+        all of them, e.g. the chunks processed before the lexical index was added, or an index file that was lost.
+
+        Args:
+            project (Project): The project to check.
+            batch_size (int): Number of chunks read (and added) together. Defaults to 100.
+
+        Returns:
+            int: The number of chunks added to the index (0 if it was already in sync or not configured).
+        """
+        lexical_index = self.nlp_controller.lexical_index
+        if lexical_index is None:
+            return 0
+
+        chunks_count = await self.chunk_model.count_project_chunks(project_id=project.id)
+        indexed_count = await asyncio.to_thread(lexical_index.count, project_id=project.project_id)
+
+        if indexed_count == chunks_count:
+            return 0
+
+        self.logger.info(f"Rebuilding the lexical index of project {project.project_id} "
+                         f"({indexed_count} of {chunks_count} chunks indexed)")
+
+        _ = await asyncio.to_thread(lexical_index.delete_project_chunks, project_id=project.project_id)
+
+        added_count = 0
+        async for page_chunks in self.chunk_model.iterate_project_chunks(
+            project_id=project.id,
+            batch_size=batch_size,
+            projection={ "_id": 1, "chunk_text": 1, "chunk_asset_id": 1 },
+        ):
+            added_count += await asyncio.to_thread(lexical_index.add_chunks, project_id=project.project_id,
+                                                   chunks=page_chunks)
+
+        return added_count
+
+    async def remove_stale_records(self, project: Project, batch_size: int = 1000):
+        """
+        Delete the records of the chunks that no longer exist in the project (and the records
+        with the positional IDs of older versions) from the vector database.
+
+        Args:
+            project (Project): The project to clean.
+            batch_size (int): Number of record IDs checked together. Defaults to 1000.
+
+        Returns:
+            int or None: The number of deleted records, or None if the deletion failed.
+        """
+        deleted_items_count = 0
+        record_ids = self.nlp_controller.iterate_vector_db_record_ids(project=project, batch_size=batch_size)
+
+        # the vector db client is blocking, so read every batch in a thread
+        while (batch := await asyncio.to_thread(next, record_ids, None)) is not None:
+            chunk_ids = { record_id: self.nlp_controller.get_chunk_id(record_id=record_id) for record_id in batch }
+
+            existing_chunk_ids = await self.chunk_model.get_existing_chunk_ids(
+                project_id=project.id,
+                chunk_ids=[ chunk_id for chunk_id in chunk_ids.values() if chunk_id is not None ],
+            )
+
+            stale_record_ids = [
+                record_id
+                for record_id, chunk_id in chunk_ids.items()
+                if chunk_id not in existing_chunk_ids
+            ]
+
+            if len(stale_record_ids) == 0:
+                continue
+
+            is_deleted = await asyncio.to_thread(self.nlp_controller.delete_from_vector_db,
+                                                 project=project, record_ids=stale_record_ids)
+            if not is_deleted:
+                self.logger.error(f"Could not delete {len(stale_record_ids)} stale records of project {project.project_id}")
+                return None
+
+            deleted_items_count += len(stale_record_ids)
+
+        return deleted_items_count
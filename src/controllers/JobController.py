@@ -0,0 +1,276 @@
+from .BaseController import BaseController
+from .NLPController import NLPController
+from .ProcessController import ProcessController
+from .IndexingController import IndexingController
+from models.JobModel import JobModel
+from models.ChunkModel import ChunkModel
+from models.ProjectModel import ProjectModel
+from models.db_schemes import Job, Project
+from models.enums.JobEnums import JobTypeEnum, JobStatusEnum
+from bson.objectid import ObjectId
+from datetime import datetime, timedelta
+import contextvars
+import asyncio
+import logging
+import uuid
+
+class JobController(BaseController):
+    """
+    Runs the long operations (/data/process and /nlp/index/push) as background jobs.
+
+    Each job is a document in the "jobs" collection with its status, progress and a checkpoint
+    (the processed assets / the last indexed chunk), the running process sends a heartbeat,
+    so when it crashes or restarts another process (or the same after restart) claims the job
+    and resumes it from its checkpoint instead of starting over.
+    """
+
+    def __init__(self, app):
+        """
+        Initialize the job runner.
+
+        Args:
+            app: The FastAPI application that holds the db and the llm/vectordb clients.
+        """
+        super().__init__()
+
+        self.app = app
+        self.worker_id = uuid.uuid4().hex # identify this process in the job documents
+        self.lease_seconds = self.app_settings.JOB_LEASE_SECONDS
+
+        self.running_jobs = {} # job id -> asyncio task
+        self.maintenance_task = None
+
+        self.logger = logging.getLogger(__name__)
+
+    async def start(self):
+        """Function to resume the abandoned jobs and start watching for new ones"""
+        self.maintenance_task = asyncio.create_task(self.maintain_jobs())
+
+    async def stop(self):
+        """Function to stop the running jobs, they stay "running" in the db so they are resumed later"""
+        tasks = list(self.running_jobs.values())
+        if self.maintenance_task:
+            tasks.append(self.maintenance_task)
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def create_job(self, project: Project, job_type: str, params: dict):
+        """
+        Create a job and start running it in the background.
+
+        Args:
+            project (Project): The project of the job.
+            job_type (str): One of JobTypeEnum values.
+            params (dict): The request parameters needed to run the job.
+
+        Returns:
+            Job: The created job.
+        """
+        job_model = await JobModel.create_instance(db_client=self.app.db_client)
+
+        job = await job_model.create_job(job=Job(
+            job_project_id=project.id,
+            job_type=job_type,
+            job_status=JobStatusEnum.PENDING.value,
+            job_params=params,
+            job_worker_id=self.worker_id,
+            job_heartbeat_at=datetime.utcnow(),
+        ))
+
+        self.launch_job(job=job)
+
+        return job
+
+    def launch_job(self, job: Job):
+        """Function to run a claimed job in a background task"""
+        # a new context, so the job is not traced as a part of the request that created it
+        task = asyncio.create_task(self.run_job(job=job), context=contextvars.Context())
+        self.running_jobs[job.id] = task
+        task.add_done_callback(lambda _: self.running_jobs.pop(job.id, None))
+
+    async def maintain_jobs(self):
+        """Function that keeps the heartbeat of the running jobs and claims the abandoned ones"""
+        while True:
+            try:
+                job_model = await JobModel.create_instance(db_client=self.app.db_client)
+
+                await job_model.send_heartbeat(job_ids=list(self.running_jobs.keys()),
+                                               worker_id=self.worker_id)
+
+                stale_before = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+                for job in await job_model.get_abandoned_jobs(stale_before=stale_before):
+                    claimed_job = await job_model.claim_job(job_id=job.id, worker_id=self.worker_id,
+                                                            stale_before=stale_before)
+                    if claimed_job:
+                        self.logger.info(f"Resuming job {claimed_job.id} from its checkpoint")
+                        self.launch_job(job=claimed_job)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error while maintaining jobs: {e}")
+
+            # report a few times within one lease so a slow update does not make the job look abandoned
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def run_job(self, job: Job):
+        """Function to run a job until it's completed or failed"""
+        job_model = await JobModel.create_instance(db_client=self.app.db_client)
+        await job_model.update_job(job_id=job.id, fields={"job_status": JobStatusEnum.RUNNING.value})
+
+        try:
+            if job.job_type == JobTypeEnum.PROCESS.value:
+                result = await self.run_process_job(job_model=job_model, job=job)
+            elif job.job_type == JobTypeEnum.INDEX.value:
+                result = await self.run_index_job(job_model=job_model, job=job)
+            else:
+                raise ValueError(f"Unsupported job type: {job.job_type}")
+
+        except Exception as e:
+            self.logger.error(f"Error while running job {job.id}: {e}")
+            await job_model.update_job(job_id=job.id, fields={
+                "job_status": JobStatusEnum.FAILED.value,
+                "job_error": str(e),
+            })
+            await self.bump_project_index_version(job=job)
+            return
+
+        # the chunks / index of the project changed, the cached answers of the project are not valid anymore
+        await self.bump_project_index_version(job=job)
+
+        await job_model.update_job(job_id=job.id, fields={
+            "job_status": JobStatusEnum.COMPLETED.value if result["is_success"] else JobStatusEnum.FAILED.value,
+            "job_result": result,
+        })
+
+    async def get_job_project(self, job: Job):
+        """Function to return the project of a job"""
+        project_model = await ProjectModel.create_instance(db_client=self.app.db_client)
+        return await project_model.get_project_or_create_one(project_id=job.job_params["project_id"])
+
+    async def bump_project_index_version(self, job: Job):
+        """Function to increase the index version of the project of a job (invalidates its cached answers)"""
+        project_model = await ProjectModel.create_instance(db_client=self.app.db_client)
+        return await project_model.bump_index_version(project_id=job.job_params["project_id"])
+
+    async def run_process_job(self, job_model: JobModel, job: Job):
+        """Function to split the files of a project to chunks, the checkpoint has the processed assets"""
+        params = job.job_params
+        project = await self.get_job_project(job=job)
+        chunk_model = await ChunkModel.create_instance(db_client=self.app.db_client)
+
+        checkpoint = job.job_checkpoint or { "processed_asset_ids": [], "current_asset_id": None }
+        project_files_ids = {
+            ObjectId(asset_id): file_id
+            for asset_id, file_id in params["files"].items()
+            if asset_id not in checkpoint["processed_asset_ids"]
+        }
+
+        if job.job_checkpoint is None:
+            # first run: in case you want to clean the chunks for this project in the db first then insert new one
+            if params["do_reset"] == 1:
+                _ = await chunk_model.delete_chunks_by_project_id(project_id=project.id)
+                _ = await asyncio.to_thread(self.app.lexical_index.delete_project_chunks,
+                                            project_id=project.project_id)
+        elif checkpoint["current_asset_id"]:
+            # resumed run: remove the chunks of the file that was interrupted (inserted by this job)
+            _ = await chunk_model.delete_chunks_by_asset_id(project_id=project.id,
+                                                            asset_id=checkpoint["current_asset_id"],
+                                                            inserted_after=job.job_created_at)
+            _ = await asyncio.to_thread(self.app.lexical_index.delete_asset_chunks,
+                                        project_id=project.project_id,
+                                        asset_id=checkpoint["current_asset_id"],
+                                        inserted_after_id=str(ObjectId.from_datetime(job.job_created_at)))
+
+        result = { "inserted_chunks": (job.job_result or {}).get("inserted_chunks", 0) }
+
+        async def on_file_start(asset_id):
+            checkpoint["current_asset_id"] = str(asset_id)
+            await job_model.update_job(job_id=job.id, fields={"job_checkpoint": checkpoint})
+
+        async def on_file_done(asset_id, inserted_count):
+            checkpoint["processed_asset_ids"].append(str(asset_id))
+            checkpoint["current_asset_id"] = None
+            result["inserted_chunks"] += inserted_count
+
+            await job_model.update_job(job_id=job.id, fields={
+                "job_checkpoint": checkpoint,
+                "job_progress": len(checkpoint["processed_asset_ids"]),
+                "job_total": len(params["files"]),
+                "job_result": result,
+            })
+
+        process_controller = ProcessController(project_id=params["project_id"])
+        is_success, _, _ = await process_controller.process_project_files(
+            chunk_model=chunk_model,
+            project=project,
+            project_files_ids=project_files_ids,
+            chunk_size=params["chunk_size"],
+            overlap_size=params["overlap_size"],
+            on_file_start=on_file_start,
+            on_file_done=on_file_done,
+            process_pool=self.app.process_pool if params.get("parallel") else None,
+            stream=bool(params.get("stream")),
+            lexical_index=self.app.lexical_index,
+        )
+
+        return {
+            "is_success": is_success,
+            "inserted_chunks": result["inserted_chunks"],
+            "processed_files": len(checkpoint["processed_asset_ids"]),
+        }
+
+    async def run_index_job(self, job_model: JobModel, job: Job):
+        """Function to push the chunks of a project into the vector db, the checkpoint has the last indexed chunk"""
+        params = job.job_params
+        project = await self.get_job_project(job=job)
+        chunk_model = await ChunkModel.create_instance(db_client=self.app.db_client)
+
+        checkpoint = job.job_checkpoint or { "after_id": None, "inserted_items_count": 0 }
+        inserted_before = checkpoint["inserted_items_count"]
+
+        await job_model.update_job(job_id=job.id, fields={
+            "job_total": await chunk_model.count_project_chunks(project_id=project.id),
+        })
+
+        async def on_checkpoint(new_checkpoint: dict):
+            new_checkpoint["after_id"] = str(new_checkpoint["after_id"])
+            new_checkpoint["inserted_items_count"] += inserted_before
+
+            await job_model.update_job(job_id=job.id, fields={
+                "job_checkpoint": new_checkpoint,
+                "job_progress": new_checkpoint["inserted_items_count"],
+            })
+
+        nlp_controller = NLPController(
+            vectordb_client=self.app.vectordb_client,
+            generation_client=self.app.generation_client,
+            embedding_client=self.app.embedding_client,
+            template_parser=self.app.template_parser,
+            lexical_index=self.app.lexical_index,
+        )
+
+        indexing_controller = IndexingController(
+            nlp_controller=nlp_controller,
+            chunk_model=chunk_model,
+            embed_workers=params.get("embed_workers"),
+            upsert_workers=params.get("upsert_workers"),
+        )
+
+        is_success, pipeline_stats = await indexing_controller.index_project(
+            project=project,
+            # the collection is reset in the first run only, a resumed run continues filling it
+            do_reset=bool(params["do_reset"]) and job.job_checkpoint is None,
+            read_batch_size=params["batch_size"],
+            after_id=ObjectId(checkpoint["after_id"]) if checkpoint["after_id"] else None,
+            on_checkpoint=on_checkpoint,
+        )
+
+        return {
+            "is_success": is_success,
+            "inserted_items_count": inserted_before + pipeline_stats["inserted_items_count"],
+            "pipeline_stats": pipeline_stats,
+        }
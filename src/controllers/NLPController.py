@@ -1,8 +1,17 @@
 from .BaseController import BaseController
 from models.db_schemes import Project, DataChunk
 from stores.llm.LLMEnums import DocumentTypeEnum
+from stores.llm.context import ContextPacker
+from models import ResponseSignal, SearchModeEnum
+from models.db_schemes import RetrievedDocument
 from typing import List
+from bson.objectid import ObjectId
+from helpers.metrics import track_latency
+import numpy as np
+import asyncio
 import json
+import logging
+import uuid
 
 class NLPController(BaseController):
     """
@@ -11,7 +20,7 @@ class NLPController(BaseController):
     """
 
     def __init__(self, vectordb_client, generation_client, 
-                 embedding_client, template_parser):
+                 embedding_client, template_parser, lexical_index=None, answer_cache=None):
         """
         Initialize the NLPController with required clients and utilities.
 
@@ -20,6 +29,10 @@ class NLPController(BaseController):
             generation_client: Client for generating text responses.
             embedding_client: Client for creating embeddings of text.
             template_parser: Template parser for constructing prompts.
+            lexical_index (BM25Index, optional): The keyword index of the chunks used by the lexical
+                                                 and hybrid search modes. Defaults to None.
+            answer_cache (AnswerCache, optional): The cache of the answers of answer_rag_question.
+                                                  Defaults to None (no caching).
         """
 
         super().__init__()
@@ -28,6 +41,10 @@ class NLPController(BaseController):
         self.generation_client = generation_client
         self.embedding_client = embedding_client
         self.template_parser = template_parser
+        self.lexical_index = lexical_index
+        self.answer_cache = answer_cache
+
+        self.logger = logging.getLogger(__name__)
 
     def create_collection_name(self, project_id: str):
         """
@@ -37,10 +54,75 @@ class NLPController(BaseController):
             project_id (str): The unique ID of the project.
 
         Returns:
-            str: The generated collection name.
+            str: The generated collection name (the shared collection in multi-tenant mode).
         """
+        if self.app_settings.VECTOR_DB_MULTI_TENANT:
+            return self.app_settings.VECTOR_DB_SHARED_COLLECTION_NAME
+
         return f"collection_{project_id}".strip()
+
+    def get_project_filter(self, project: Project):
+        """
+        Return the payload filter that restricts the shared collection to the records of a project.
+
+        Args:
+            project (Project): The project.
+
+        Returns:
+            dict or None: The filter in multi-tenant mode, None when the project has its own collection.
+        """
+        if self.app_settings.VECTOR_DB_MULTI_TENANT:
+            return { "project_id": project.project_id }
+
+        return None
     
+    def get_record_id(self, chunk_id: ObjectId):
+        """
+        Derive the vector database ID of a chunk from its Mongo _id (the same chunk always gets the same ID).
+
+        Args:
+            chunk_id (ObjectId): The _id of the chunk.
+
+        Returns:
+            str: A UUID holding the 12 bytes of the ObjectId (left padded with zeros).
+        """
+        return str(uuid.UUID(str(chunk_id).rjust(32, "0")))
+
+    def get_chunk_id(self, record_id):
+        """
+        Reverse of get_record_id.
+
+        Args:
+            record_id: The vector database ID of a record.
+
+        Returns:
+            ObjectId or None: The _id of the chunk, or None if the record was not created from a chunk _id
+                              (e.g. the positional integer IDs used by older versions).
+        """
+        if isinstance(record_id, int):
+            return None
+
+        try:
+            record_hex = uuid.UUID(str(record_id)).hex
+        except ValueError:
+            return None
+
+        if not record_hex.startswith("0" * 8):
+            return None
+
+        return ObjectId(record_hex[8:])
+
+    def get_embedding_model_name(self):
+        """
+        Return the name of the current embedding model, stored with the indexed chunks
+        so that changing the model re-indexes them.
+
+        Returns:
+            str: The backend, model id and embedding size.
+        """
+        return (f"{self.app_settings.EMBEDDING_BACKEND}/{self.embedding_client.embedding_model_id}"
+                f"/{self.embedding_client.embedding_size}")
+
     def reset_vector_db_collection(self, project: Project):
         """
         Delete an existing collection in the vector database.
@@ -52,6 +134,12 @@ class NLPController(BaseController):
             bool: True if the collection was successfully deleted, False otherwise.
         """
         collection_name = self.create_collection_name(project_id=project.project_id)
+
+        # the shared collection stays, only the records of the project are deleted
+        project_filter = self.get_project_filter(project=project)
+        if project_filter:
+            return self.vectordb_client.delete_by_filter(collection_name=collection_name, filters=project_filter)
+
         return self.vectordb_client.delete_collection(collection_name=collection_name)
     
     def get_vector_db_collection_info(self, project: Project):
@@ -65,14 +153,25 @@ class NLPController(BaseController):
             dict: A dictionary containing collection information.
         """
         collection_name = self.create_collection_name(project_id=project.project_id)
+
+        # the info of the shared collection is about all the projects, report the records of this project only
+        project_filter = self.get_project_filter(project=project)
+        if project_filter:
+            return {
+                "collection_name": collection_name,
+                "multi_tenant": True,
+                "points_count": self.vectordb_client.count(collection_name=collection_name, filters=project_filter),
+            }
+
         collection_info = self.vectordb_client.get_collection_info(collection_name=collection_name)
 
         return json.loads( # convert to json
             json.dumps(collection_info, default=lambda x: x.__dict__) # convert to string
         ) # to avoid errors
     
-    def index_into_vector_db(self, project: Project, chunks: List[DataChunk],
-                                   chunks_ids: List[int], 
+    @track_latency("controller")
+    async def index_into_vector_db(self, project: Project, chunks: List[DataChunk],
+                                   chunks_ids: List[int] = None,
                                    do_reset: bool = False):
         """
         Index/insert text chunks into the vector database.
@@ -80,77 +179,479 @@ class NLPController(BaseController):
         Args:
             project (Project): The project for which the chunks are to be indexed.
             chunks (List[DataChunk]): A list of data chunks to be indexed.
-            chunks_ids (List[int]): A list of IDs corresponding to the data chunks.
+            chunks_ids (List[int], optional): A list of IDs corresponding to the data chunks.
+                                              Defaults to None (derived from the chunks _id).
             do_reset (bool): Whether to reset the collection before indexing. Defaults to False.
 
         Returns:
             bool: True if the indexing was successful.
         """
-        # step1: get collection name
+        # step1: generate embeddings (in batches) then prepare inserted items
+        embedded_chunks = await self.embed_chunks(chunks=chunks, chunks_ids=chunks_ids)
+
+        if embedded_chunks is None:
+            return False
+
+        # step2: create collection if not exists
+        _ = self.prepare_vector_db_collection(project=project, do_reset=do_reset)
+
+        # step3: insert into vector db
+        return self.insert_into_vector_db(project=project, **embedded_chunks)
+
+    def prepare_vector_db_collection(self, project: Project, do_reset: bool = False):
+        """
+        Create the collection of a project in the vector database if it does not exist.
+
+        Args:
+            project (Project): The project that owns the collection.
+            do_reset (bool): Whether to delete the existing collection first. Defaults to False.
+
+        Returns:
+            bool: True if a new collection was created.
+        """
         collection_name = self.create_collection_name(project_id=project.project_id)
 
-        # step2: generate embeddings then prepare inserted items
-        texts = [ c.chunk_text for c in chunks ]
-        metadata = [ c.chunk_metadata for c in  chunks]
-        vectors = [
-            self.embedding_client.embed_text(text=text, 
-                                             document_type=DocumentTypeEnum.DOCUMENT.value)
-            for text in texts
-        ]
+        project_filter = self.get_project_filter(project=project)
+        if project_filter is None:
+            return self.vectordb_client.create_collection(
+                collection_name=collection_name,
+                embedding_size=self.embedding_client.embedding_size,
+                do_reset=do_reset,
+            )
 
-        # step3: create collection if not exists
-        _ = self.vectordb_client.create_collection(
+        # multi-tenant: the shared collection is created once, a reset deletes the records of the project only
+        is_created = self.vectordb_client.create_collection(
             collection_name=collection_name,
             embedding_size=self.embedding_client.embedding_size,
-            do_reset=do_reset,
+            indexed_fields=["project_id", "asset_id"],
+            tenant_field="project_id",
         )
 
-        # step4: insert into vector db
-        _ = self.vectordb_client.insert_many(
+        if do_reset:
+            _ = self.vectordb_client.delete_by_filter(collection_name=collection_name, filters=project_filter)
+
+        return is_created
+
+    async def embed_chunks(self, chunks: List[DataChunk], chunks_ids: List[int] = None):
+        """
+        Generate the embeddings of text chunks (in batches) and prepare them for insertion.
+
+        Args:
+            chunks (List[DataChunk]): A list of data chunks to be embedded.
+            chunks_ids (List[int], optional): A list of IDs corresponding to the data chunks.
+                                              Defaults to None (derived from the chunks _id).
+
+        Returns:
+            dict or None: The texts, metadata, vectors, record_ids and asset_ids of the chunks that were embedded
+                          (the chunks that failed are skipped), or None if no chunk could be embedded.
+        """
+        if chunks_ids is None:
+            chunks_ids = [ self.get_record_id(chunk_id=c.id) for c in chunks ]
+
+        texts = [ c.chunk_text for c in chunks ]
+        metadata = [ c.chunk_metadata for c in  chunks]
+        asset_ids = [ str(c.chunk_asset_id) for c in chunks ]
+        vectors = await self.embedding_client.embed_texts_async(texts=texts,
+                                                                document_type=DocumentTypeEnum.DOCUMENT.value)
+
+        if vectors is None:
+            return None
+
+        # skip the chunks that could not be embedded instead of failing the whole page
+        failed_ids = [ chunks_ids[i] for i, vector in enumerate(vectors) if vector is None ]
+        if len(failed_ids):
+            self.logger.error(f"Could not embed {len(failed_ids)} chunks, skipped ids: {failed_ids}")
+
+            kept = [ i for i, vector in enumerate(vectors) if vector is not None ]
+            texts = [ texts[i] for i in kept ]
+            metadata = [ metadata[i] for i in kept ]
+            vectors = [ vectors[i] for i in kept ]
+            chunks_ids = [ chunks_ids[i] for i in kept ]
+            asset_ids = [ asset_ids[i] for i in kept ]
+
+            if len(vectors) == 0:
+                return None
+
+        return {
+            "texts": texts,
+            "metadata": metadata,
+            "vectors": vectors,
+            "record_ids": chunks_ids,
+            "asset_ids": asset_ids,
+        }
+
+    def insert_into_vector_db(self, project: Project, texts: list, metadata: list,
+                                    vectors: list, record_ids: list, asset_ids: list = None):
+        """
+        Insert already embedded records into the collection of a project.
+
+        Args:
+            project (Project): The project that owns the collection.
+            texts (list): The texts of the records.
+            metadata (list): The metadata of the records.
+            vectors (list): The embedding vectors of the records.
+            record_ids (list): The IDs of the records.
+            asset_ids (list, optional): The asset of each record. Defaults to None.
+
+        Returns:
+            bool: True if the insertion was successful.
+        """
+        collection_name = self.create_collection_name(project_id=project.project_id)
+
+        # the project / asset of each record are stored as filterable payload fields
+        asset_ids = asset_ids or [None] * len(texts)
+        payload_fields = [
+            { "project_id": project.project_id, "asset_id": asset_id }
+            for asset_id in asset_ids
+        ]
+
+        return self.vectordb_client.insert_many(
             collection_name=collection_name,
             texts=texts,
             metadata=metadata,
             vectors=vectors,
-            record_ids=chunks_ids,
+            record_ids=record_ids,
+            payload_fields=payload_fields,
         )
 
-        return True
+    def iterate_vector_db_record_ids(self, project: Project, batch_size: int = 1000):
+        """
+        Iterate over the IDs of the records in the collection of a project.
 
-    def search_vector_db_collection(self, project: Project, text: str, limit: int = 10):
+        Args:
+            project (Project): The project that owns the collection.
+            batch_size (int): The number of IDs in each batch. Defaults to 1000.
+
+        Yields:
+            list: A batch of record IDs.
         """
-        Perform a semantic search in the vector database.
+        collection_name = self.create_collection_name(project_id=project.project_id)
+
+        yield from self.vectordb_client.iterate_record_ids(collection_name=collection_name,
+                                                           batch_size=batch_size,
+                                                           filters=self.get_project_filter(project=project))
+
+    def delete_from_vector_db(self, project: Project, record_ids: list):
+        """
+        Delete records from the collection of a project.
+
+        Args:
+            project (Project): The project that owns the collection.
+            record_ids (list): The IDs of the records to delete.
+
+        Returns:
+            bool: True if the deletion was successful.
+        """
+        collection_name = self.create_collection_name(project_id=project.project_id)
+
+        return self.vectordb_client.delete_many(collection_name=collection_name, record_ids=record_ids)
+
+    @track_latency("controller")
+    async def search_vector_db_collection(self, project: Project, text: str, limit: int = 10,
+                                          search_params: dict = None, search_mode: str = None,
+                                          fetch_k: int = None, mmr_lambda: float = None,
+                                          query_vector: list = None):
+        """
+        Search the chunks of a project that are related to a query.
 
         Args:
             project (Project): The project for which the search is to be performed.
             text (str): The query text to search for.
             limit (int): The maximum number of results to retrieve. Defaults to 10.
+            search_params (dict, optional): Provider specific recall / latency knobs. Defaults to None.
+            search_mode (str, optional): One of SearchModeEnum values. Defaults to None (SEARCH_DEFAULT_MODE setting).
+            fetch_k (int, optional): Number of vector search candidates re-ranked by MMR (vector mode only),
+                                     MMR is used when it's greater than the limit. Defaults to None (SEARCH_MMR_FETCH_K setting).
+            mmr_lambda (float, optional): The MMR trade-off between relevance (1) and diversity (0).
+                                          Defaults to None (SEARCH_MMR_LAMBDA setting).
+            query_vector (list, optional): The embedding of the query if it's already computed (e.g. by the
+                                           answer cache lookup). Defaults to None (the query is embedded).
 
         Returns:
             list or bool: A list of search results or False if no results are found.
         """
+        search_mode = search_mode or self.app_settings.SEARCH_DEFAULT_MODE
+
+        if search_mode == SearchModeEnum.LEXICAL.value:
+            results = await self.search_lexical_index(project=project, text=text, limit=limit)
+
+        elif search_mode == SearchModeEnum.HYBRID.value:
+            # both searches run concurrently, each one returns more candidates than the limit
+            candidates_count = max(limit, self.app_settings.HYBRID_SEARCH_CANDIDATES)
+
+            vector_results, lexical_results = await asyncio.gather(
+                self.search_by_text_embedding(project=project, text=text, limit=candidates_count,
+                                              search_params=search_params, query_vector=query_vector),
+                self.search_lexical_index(project=project, text=text, limit=candidates_count),
+            )
+
+            results = self.fuse_search_results(results_lists=[vector_results, lexical_results], limit=limit)
+
+        else:
+            results = await self.search_by_text_embedding(project=project, text=text, limit=limit,
+                                                          search_params=search_params,
+                                                          fetch_k=fetch_k, mmr_lambda=mmr_lambda,
+                                                          query_vector=query_vector)
+
+        if not results:
+            return False
+
+        return results
+
+    @track_latency("controller")
+    async def search_vector_db_collection_batch(self, project: Project, texts: list, limit: int = 10,
+                                                search_params: dict = None, search_mode: str = None,
+                                                fetch_k: int = None, mmr_lambda: float = None):
+        """
+        Search the chunks of a project for many queries at once, the queries are embedded
+        by one provider call and searched by one batched vector search.
+
+        Args:
+            project (Project): The project for which the search is to be performed.
+            texts (list): The query texts.
+            limit (int): The maximum number of results to retrieve for each query. Defaults to 10.
+            search_params (dict, optional): Provider specific recall / latency knobs. Defaults to None.
+            search_mode (str, optional): One of SearchModeEnum values. Defaults to None (SEARCH_DEFAULT_MODE setting).
+            fetch_k (int, optional): Number of vector search candidates re-ranked by MMR (vector mode only),
+                                     MMR is used when it's greater than the limit. Defaults to None (SEARCH_MMR_FETCH_K setting).
+            mmr_lambda (float, optional): The MMR trade-off between relevance (1) and diversity (0).
+                                          Defaults to None (SEARCH_MMR_LAMBDA setting).
+
+        Returns:
+            list: The search results of each query, in the order of the texts (empty list for no results).
+        """
+        search_mode = search_mode or self.app_settings.SEARCH_DEFAULT_MODE
+
+        if search_mode == SearchModeEnum.LEXICAL.value:
+            return list(await asyncio.gather(*[
+                self.search_lexical_index(project=project, text=text, limit=limit)
+                for text in texts
+            ]))
+
+        if search_mode == SearchModeEnum.HYBRID.value:
+            candidates_count = max(limit, self.app_settings.HYBRID_SEARCH_CANDIDATES)
+
+            vector_results, *lexical_results = await asyncio.gather(
+                self.search_by_text_embeddings(project=project, texts=texts, limit=candidates_count,
+                                               search_params=search_params),
+                *[
+                    self.search_lexical_index(project=project, text=text, limit=candidates_count)
+                    for text in texts
+                ],
+            )
+
+            return [
+                self.fuse_search_results(results_lists=[query_vector_results, query_lexical_results], limit=limit)
+                for query_vector_results, query_lexical_results in zip(vector_results, lexical_results)
+            ]
+
+        return await self.search_by_text_embeddings(project=project, texts=texts, limit=limit,
+                                                    search_params=search_params,
+                                                    fetch_k=fetch_k, mmr_lambda=mmr_lambda)
+
+    async def search_by_text_embeddings(self, project: Project, texts: list, limit: int = 10,
+                                        search_params: dict = None, fetch_k: int = None, mmr_lambda: float = None):
+        """
+        Perform a semantic search in the vector database for many queries.
+
+        Args:
+            project (Project): The project for which the search is to be performed.
+            texts (list): The query texts.
+            limit (int): The maximum number of results to retrieve for each query. Defaults to 10.
+            search_params (dict, optional): Provider specific recall / latency knobs. Defaults to None.
+            fetch_k (int, optional): Number of candidates re-ranked by MMR. Defaults to None (SEARCH_MMR_FETCH_K setting).
+            mmr_lambda (float, optional): The MMR relevance / diversity trade-off. Defaults to None (SEARCH_MMR_LAMBDA setting).
+
+        Returns:
+            list: The search results of each query (empty list for no results or a failed embedding).
+        """
+        collection_name = self.create_collection_name(project_id=project.project_id)
+
+        # all the queries in one embedding call (the provider splits them only over its batch limits)
+        vectors = await self.embedding_client.embed_texts_async(texts=texts,
+                                                                document_type=DocumentTypeEnum.QUERY.value)
+        vectors = vectors or [None] * len(texts)
+
+        # the queries that could not be embedded have no results
+        embedded = [ i for i, vector in enumerate(vectors) if vector ]
+        results = [ [] for _ in texts ]
+
+        if len(embedded) == 0:
+            return results
+
+        fetch_k = self.get_mmr_fetch_k(limit=limit, fetch_k=fetch_k)
+
+        batch_results = await self.vectordb_client.search_by_vectors_async(
+            collection_name=collection_name,
+            vectors=[ vectors[i] for i in embedded ],
+            limit=fetch_k or limit,
+            search_params=search_params,
+            filters=self.get_project_filter(project=project),
+            with_vectors=bool(fetch_k),
+        )
+
+        for i, query_results in zip(embedded, batch_results or []):
+            results[i] = query_results or []
+            if fetch_k:
+                results[i] = self.rerank_by_mmr(query_vector=vectors[i], documents=results[i],
+                                                limit=limit, mmr_lambda=mmr_lambda)
+
+        return results
+
+    async def search_by_text_embedding(self, project: Project, text: str, limit: int = 10,
+                                       search_params: dict = None, fetch_k: int = None, mmr_lambda: float = None,
+                                       query_vector: list = None):
+        """
+        Perform a semantic search in the vector database.
+
+        Args:
+            project (Project): The project for which the search is to be performed.
+            text (str): The query text to search for.
+            limit (int): The maximum number of results to retrieve. Defaults to 10.
+            search_params (dict, optional): Provider specific recall / latency knobs. Defaults to None.
+            fetch_k (int, optional): Number of candidates re-ranked by MMR. Defaults to None (SEARCH_MMR_FETCH_K setting).
+            mmr_lambda (float, optional): The MMR relevance / diversity trade-off. Defaults to None (SEARCH_MMR_LAMBDA setting).
+            query_vector (list, optional): The embedding of the query if it's already computed. Defaults to None.
+
+        Returns:
+            list: A list of search results (empty if no results are found).
+        """
         # step1: get collection name
         collection_name = self.create_collection_name(project_id=project.project_id)
 
-        # step2: get text embedding vector
-        vector = self.embedding_client.embed_text(text=text, 
-                                                 document_type=DocumentTypeEnum.QUERY.value)
+        # step2: get text embedding vector (unless it's already given)
+        vector = query_vector or await self.embedding_client.embed_text_async(
+            text=text, document_type=DocumentTypeEnum.QUERY.value
+        )
 
         if not vector or len(vector) == 0:
-            return False
+            return []
 
-        # step3: do semantic search
-        results = self.vectordb_client.search_by_vector(
+        # step3: do semantic search (without blocking the event loop),
+        # with MMR a larger pool of candidates is retrieved with their vectors
+        fetch_k = self.get_mmr_fetch_k(limit=limit, fetch_k=fetch_k)
+
+        results = await self.vectordb_client.search_by_vector_async(
             collection_name=collection_name,
             vector=vector,
-            limit=limit
+            limit=fetch_k or limit,
+            search_params=search_params,
+            filters=self.get_project_filter(project=project),
+            with_vectors=bool(fetch_k),
         )
 
-        if not results:
-            return False
+        # step4: select a relevant and diverse top-k
+        if fetch_k:
+            results = self.rerank_by_mmr(query_vector=vector, documents=results or [],
+                                         limit=limit, mmr_lambda=mmr_lambda)
 
-        return results
+        return results or []
+
+    def get_mmr_fetch_k(self, limit: int, fetch_k: int = None):
+        """Function to return the number of MMR candidates (None when MMR is not used), at most
+        SEARCH_MMR_MAX_FETCH_K since the candidates are loaded with their vectors and compared pairwise"""
+        fetch_k = fetch_k if fetch_k is not None else self.app_settings.SEARCH_MMR_FETCH_K
+        fetch_k = min(fetch_k, self.app_settings.SEARCH_MMR_MAX_FETCH_K) if fetch_k else fetch_k
+
+        if not fetch_k or fetch_k <= limit:
+            return None
+
+        return fetch_k
+
+    def rerank_by_mmr(self, query_vector: list, documents: list, limit: int, mmr_lambda: float = None):
+        """
+        Select a relevant and diverse subset of the documents with maximal marginal relevance: each step takes
+        the document with the best lambda * similarity(query) - (1 - lambda) * max similarity(selected documents).
+
+        Args:
+            query_vector (list): The embedding of the query.
+            documents (list): The candidates, retrieved with their vectors.
+            limit (int): The number of documents to select.
+            mmr_lambda (float, optional): 1 = relevance only, 0 = diversity only.
+                                          Defaults to None (SEARCH_MMR_LAMBDA setting).
+
+        Returns:
+            list: The selected documents in selection order (with their search scores, without their vectors).
+        """
+        mmr_lambda = mmr_lambda if mmr_lambda is not None else self.app_settings.SEARCH_MMR_LAMBDA
+
+        if len(documents) == 0 or any(doc.vector is None for doc in documents):
+            selected = list(range(min(limit, len(documents))))
+        else:
+            vectors = np.asarray([ doc.vector for doc in documents ], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            query = np.asarray(query_vector, dtype=np.float32)
+            query /= max(float(np.linalg.norm(query)), 1e-12)
+
+            relevance = vectors @ query
+            similarities = vectors @ vectors.T
+
+            selected = [ int(np.argmax(relevance)) ]
+            max_similarities = similarities[selected[0]].copy()
+
+            for _ in range(min(limit, len(documents)) - 1):
+                mmr_scores = mmr_lambda * relevance - (1 - mmr_lambda) * max_similarities
+                mmr_scores[selected] = -np.inf
+
+                best = int(np.argmax(mmr_scores))
+                selected.append(best)
+                np.maximum(max_similarities, similarities[best], out=max_similarities)
+
+        return [ documents[i].copy(update={"vector": None}) for i in selected ]
+
+    async def search_lexical_index(self, project: Project, text: str, limit: int = 10):
+        """
+        Perform a keyword (BM25) search in the lexical index of a project, without an embedding call.
+
+        Args:
+            project (Project): The project for which the search is to be performed.
+            text (str): The query text to search for.
+            limit (int): The maximum number of results to retrieve. Defaults to 10.
+
+        Returns:
+            list: A list of search results (empty if no results are found).
+        """
+        if self.lexical_index is None:
+            self.logger.error("Lexical search is requested but the lexical index is not configured")
+            return []
+
+        results = await asyncio.to_thread(self.lexical_index.search, project_id=project.project_id,
+                                          text=text, limit=limit)
+
+        return [
+            RetrievedDocument(text=chunk_text, score=score)
+            for _, chunk_text, score in results
+        ]
+
+    def fuse_search_results(self, results_lists: list, limit: int = 10):
+        """
+        Merge ranked result lists with reciprocal rank fusion (the scores of the lists are not comparable,
+        so each document gets sum(1 / (k + rank)) over the lists it appears in).
+
+        Args:
+            results_lists (list): Lists of RetrievedDocument ordered from the best match.
+            limit (int): The maximum number of results to return. Defaults to 10.
+
+        Returns:
+            list: The fused results with their RRF score.
+        """
+        rrf_k = self.app_settings.HYBRID_RRF_K
+        scores = {}
+
+        # the same chunk has the same text in both indexes (repeated texts count once per list, at their best rank)
+        for results in results_lists:
+            texts = list(dict.fromkeys([ result.text for result in results or [] ]))
+            for rank, text in enumerate(texts):
+                scores[text] = scores.get(text, 0) + 1 / (rrf_k + rank + 1)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+        return [ RetrievedDocument(text=text, score=score) for text, score in ranked ]
     
-    def answer_rag_question(self, project: Project, query: str, limit: int = 10):
+    @track_latency("controller")
+    async def answer_rag_question(self, project: Project, query: str, limit: int = 10,
+                                  search_params: dict = None, search_mode: str = None,
+                                  fetch_k: int = None, mmr_lambda: float = None):
         """
         Generate an answer to a query using Retrieval-Augmented Generation (RAG).
 
@@ -158,42 +659,148 @@ class NLPController(BaseController):
             project (Project): The project for which the query is being answered.
             query (str): The query text.
             limit (int): The number of related documents to retrieve for the query. Defaults to 10.
+            search_params (dict, optional): Provider specific recall / latency knobs. Defaults to None.
+            search_mode (str, optional): One of SearchModeEnum values. Defaults to None (SEARCH_DEFAULT_MODE setting).
+            fetch_k (int, optional): Number of candidates re-ranked by MMR. Defaults to None (SEARCH_MMR_FETCH_K setting).
+            mmr_lambda (float, optional): The MMR relevance / diversity trade-off. Defaults to None (SEARCH_MMR_LAMBDA setting).
 
         Returns:
             tuple: A tuple containing the answer (str), the full prompt (str), and the chat history (list).
         """
         answer, full_prompt, chat_history = None, None, None
 
+        # step0: reuse the answer of the same (or a very similar) question if the project did not change
+        cache_scope, query_vector = None, None
+        if self.answer_cache is not None:
+            cache_scope = self.create_answer_cache_scope(project=project, limit=limit, search_params=search_params,
+                                                         search_mode=search_mode, fetch_k=fetch_k,
+                                                         mmr_lambda=mmr_lambda)
+            cached, query_vector = await self.get_cached_answer(scope=cache_scope, query=query,
+                                                                search_mode=search_mode)
+            if cached is not None:
+                return cached["answer"], cached["full_prompt"], cached["chat_history"]
+
         # step1: retrieve related documents
-        retrieved_documents = self.search_vector_db_collection(
+        retrieved_documents = await self.search_vector_db_collection(
             project=project,
             text=query,
             limit=limit,
+            search_params=search_params,
+            search_mode=search_mode,
+            fetch_k=fetch_k,
+            mmr_lambda=mmr_lambda,
+            query_vector=query_vector, # embedded by the semantic tier of the answer cache (if it was looked up)
         )
 
         if not retrieved_documents or len(retrieved_documents) == 0:
             return answer, full_prompt, chat_history
         
         # step2: Construct LLM prompt
+        full_prompt, chat_history = self.construct_rag_prompt(
+            query=query,
+            retrieved_documents=retrieved_documents,
+        )
+
+        # step3: Retrieve the Answer
+        answer = await self.generation_client.generate_text_async(
+            prompt=full_prompt,
+            chat_history=chat_history
+        )
+
+        if answer and cache_scope is not None:
+            self.answer_cache.set(scope=cache_scope, query=query, answer=answer, full_prompt=full_prompt,
+                                  chat_history=chat_history, vector=query_vector)
+
+        return answer, full_prompt, chat_history
+
+    def create_answer_cache_scope(self, project: Project, limit: int, search_params: dict = None,
+                                  search_mode: str = None, fetch_k: int = None, mmr_lambda: float = None):
+        """Function to create the answer cache scope of a question (everything that changes its answer
+        except the question itself: the index version of the project, the models and the retrieval options)"""
+        return self.answer_cache.create_scope(
+            project_id=project.project_id,
+            index_version=project.index_version,
+            generation_model_id=getattr(self.generation_client, "generation_model_id", None),
+            temperature=getattr(self.generation_client, "default_generation_temperature", None),
+            embedding_model_id=self.get_embedding_model_name(),
+            language=getattr(self.template_parser, "language", None),
+            limit=limit,
+            search_params=search_params,
+            search_mode=search_mode or self.app_settings.SEARCH_DEFAULT_MODE,
+            fetch_k=self.get_mmr_fetch_k(limit=limit, fetch_k=fetch_k),
+            mmr_lambda=mmr_lambda if mmr_lambda is not None else self.app_settings.SEARCH_MMR_LAMBDA,
+        )
+
+    async def get_cached_answer(self, scope: tuple, query: str, search_mode: str = None):
+        """
+        Look up the answer cache, first the exact tier then the semantic tier.
+
+        Args:
+            scope (tuple): The answer cache scope of the question.
+            query (str): The query text.
+            search_mode (str, optional): One of SearchModeEnum values. Defaults to None (SEARCH_DEFAULT_MODE setting).
+
+        Returns:
+            tuple: The cached entry (or None) and the embedding of the query (or None), the embedding
+                   is reused by the retrieval and stored with the new answer.
+        """
+        # the lexical mode does not embed the query, so it does not use the semantic tier
+        use_semantic = self.answer_cache.semantic_enabled and \
+            (search_mode or self.app_settings.SEARCH_DEFAULT_MODE) != SearchModeEnum.LEXICAL.value
+
+        cached = self.answer_cache.get_exact(scope=scope, query=query, count_miss=not use_semantic)
+        if cached is not None or not use_semantic:
+            return cached, None
+
+        query_vector = await self.embedding_client.embed_text_async(text=query,
+                                                                    document_type=DocumentTypeEnum.QUERY.value)
 
+        return self.answer_cache.get_similar(scope=scope, vector=query_vector), query_vector
+
+    @track_latency("prompt", provider=lambda self: type(self.generation_client).__name__,
+                   model=lambda self: self.generation_client.generation_model_id)
+    def construct_rag_prompt(self, query: str, retrieved_documents: list):
+        """
+        Build the generation prompt and the chat history for a query and its retrieved documents.
+
+        Args:
+            query (str): The query text.
+            retrieved_documents (list): The documents retrieved for the query.
+
+        Returns:
+            tuple: A tuple containing the full prompt (str) and the chat history (list).
+        """
         # system prompt
         system_prompt = self.template_parser.get("rag", "system_prompt")
 
-        # body prompt
-        documents_prompts = "\n".join([
-            self.template_parser.get("rag", "document_prompt", {
-                    "doc_num": idx + 1,
-                    "chunk_text": self.generation_client.process_text(doc.text),
-            })
-            for idx, doc in enumerate(retrieved_documents)
-        ])
-
         # footer prompt
         footer_prompt = self.template_parser.get("rag", "footer_prompt", {
             "query": query
         })
 
-        # step3: Construct Generation Client Prompts
+        # body prompt: the documents that fit in the context of the model (the system and footer prompts are kept)
+        document_template = self.template_parser.get("rag", "document_prompt", {
+            "doc_num": len(retrieved_documents),
+            "chunk_text": "",
+        })
+
+        packed_texts, packing_stats = self.get_context_packer().pack(
+            documents=retrieved_documents,
+            fixed_tokens=self.generation_client.estimate_tokens(system_prompt) + \
+                self.generation_client.estimate_tokens(footer_prompt),
+            document_overhead_tokens=self.generation_client.estimate_tokens(document_template),
+        )
+        self.logger.debug(f"Context packing: {packing_stats}")
+
+        documents_prompts = self.template_parser.render_many("rag", "document_prompt", [
+            {
+                "doc_num": idx + 1,
+                "chunk_text": text,
+            }
+            for idx, text in enumerate(packed_texts)
+        ])
+
+        # Construct Generation Client Prompts
         # we assign the system prompt to history
         chat_history = [
             self.generation_client.construct_prompt(
@@ -204,11 +811,69 @@ class NLPController(BaseController):
 
         full_prompt = "\n\n".join([ documents_prompts,  footer_prompt])
 
-        # step4: Retrieve the Answer
-        answer = self.generation_client.generate_text(
-            prompt=full_prompt,
-            chat_history=chat_history
+        return full_prompt, chat_history
+
+    def get_context_packer(self):
+        """Function to create the packer of the retrieved documents from the context settings"""
+        return ContextPacker(
+            estimate_tokens=self.generation_client.estimate_tokens,
+            context_size=self.app_settings.GENERATION_CONTEXT_SIZE,
+            max_output_tokens=self.app_settings.GENERATION_DAFAULT_MAX_TOKENS,
+            max_context_tokens=self.app_settings.CONTEXT_MAX_TOKENS,
+            min_score=self.app_settings.CONTEXT_MIN_SCORE,
+            max_score_gap=self.app_settings.CONTEXT_MAX_SCORE_GAP,
+            max_overlap_characters=self.app_settings.CONTEXT_MAX_OVERLAP_CHARACTERS,
         )
 
-        return answer, full_prompt, chat_history
+    async def stream_rag_answer(self, query: str, retrieved_documents: list):
+        """
+        Stream the answer of a query token by token, the retrieval is done by the caller
+        so it could reject the request before the stream starts.
+
+        Args:
+            query (str): The query text.
+            retrieved_documents (list): The documents retrieved for the query.
+
+        Yields:
+            dict: Events with keys "event" and "data", first a "metadata" event with the retrieved
+                  documents, then a "token" event for each generated piece of text, and finally
+                  a "done" event with the full answer (or an "error" event if the generation failed).
+        """
+        yield {
+            "event": "metadata",
+            "data": {
+                "documents": [ doc.dict() for doc in retrieved_documents ],
+            },
+        }
+
+        full_prompt, chat_history = self.construct_rag_prompt(
+            query=query,
+            retrieved_documents=retrieved_documents,
+        )
 
+        answer_parts = []
+        try:
+            async for text in self.generation_client.generate_text_stream(
+                prompt=full_prompt,
+                chat_history=chat_history,
+            ):
+                answer_parts.append(text)
+                yield { "event": "token", "data": { "text": text } }
+        except Exception as e:
+            self.logger.error(f"Error while streaming the answer: {e}")
+
+        answer = "".join(answer_parts)
+        if not answer:
+            yield { "event": "error", "data": { "signal": ResponseSignal.RAG_ANSWER_ERROR.value } }
+            return
+
+        yield {
+            "event": "done",
+            "data": {
+                "signal": ResponseSignal.RAG_ANSWER_SUCCESS.value,
+                "answer": answer,
+                "full_prompt": full_prompt,
+                "chat_history": chat_history,
+                "streamed_parts": len(answer_parts),
+            },
+        }
@@ -4,7 +4,14 @@ import os
 from langchain_community.document_loaders import TextLoader
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from models import ProcessingEnum
+from langchain_core.documents import Document
+from models import ProcessingEnum, ChunkerEnum
+from helpers.text_chunker import TextChunker
+from helpers.metrics import track_latency
+from models.db_schemes import DataChunk
+import asyncio
+import logging
+import pymupdf
 
 class ProcessController(BaseController):
 
@@ -14,6 +21,8 @@ class ProcessController(BaseController):
         self.project_id = project_id
         self.project_path = ProjectController().get_project_path(project_id=project_id)
 
+        self.logger = logging.getLogger(__name__)
+
     def get_file_extension(self, file_id: str):
         """Function to return file extention"""
         return os.path.splitext(file_id)[-1]
@@ -40,7 +49,47 @@ class ProcessController(BaseController):
         
         return None
 
-    def get_file_content(self, file_id: str):
+    def get_pdf_page_count(self, file_id: str):
+        """Function to return the number of pages of a pdf file (without loading its text)"""
+        file_path = os.path.join(self.project_path, file_id)
+
+        with pymupdf.open(file_path) as pdf:
+            return pdf.page_count
+
+    def get_pdf_pages_content(self, file_id: str, page_start: int, page_end: int):
+        """Function to load a range of pages of a pdf file (same output as PyMuPDFLoader for these pages)"""
+        file_path = os.path.join(self.project_path, file_id)
+
+        with pymupdf.open(file_path) as pdf:
+            pdf_metadata = {
+                key: value
+                for key, value in pdf.metadata.items()
+                if key != "encryption"
+            }
+
+            return [
+                Document(
+                    page_content=pdf[page_no].get_text().strip(),
+                    metadata={
+                        **pdf_metadata,
+                        "source": file_path,
+                        "file_path": file_path,
+                        "total_pages": pdf.page_count,
+                        "page": page_no,
+                    }
+                )
+                for page_no in range(page_start, min(page_end, pdf.page_count))
+            ]
+
+    @track_latency("ingestion", operation="load_file", provider="filesystem")
+    def get_file_content(self, file_id: str, page_range: tuple=None):
+
+        # a part of a pdf file (used to split big files between the processing workers)
+        if page_range is not None and self.get_file_extension(file_id=file_id) == ProcessingEnum.PDF.value:
+            if not os.path.exists(os.path.join(self.project_path, file_id)):
+                return None
+
+            return self.get_pdf_pages_content(file_id=file_id, page_start=page_range[0], page_end=page_range[1])
 
         # get suitable loader of file depending on the file type
         loader = self.get_file_loader(file_id=file_id)
@@ -51,17 +100,30 @@ class ProcessController(BaseController):
 
         return None
 
+    def get_text_splitter(self, chunk_size: int=100, overlap_size: int=20):
+        """Function to create the splitter used to split the text to chunks"""
+        if self.app_settings.CHUNKER_BACKEND == ChunkerEnum.NATIVE.value:
+            return TextChunker(
+                chunk_size=chunk_size,
+                chunk_overlap=overlap_size,
+                length_function=len,
+            )
+
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=overlap_size,
+            length_function=len,
+        )
+
+    @track_latency("ingestion", operation="split_file", provider=lambda self: self.app_settings.CHUNKER_BACKEND,
+                   items=lambda args: len(args["file_content"]))
     def process_file_content(self, file_content: list, file_id: str,
                             chunk_size: int=100, overlap_size: int=20):
         
         """Function to split the file content to chunks"""
 
         # create object from splitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=overlap_size,
-            length_function=len,
-        )
+        text_splitter = self.get_text_splitter(chunk_size=chunk_size, overlap_size=overlap_size)
 
         # get list of loaded text
         file_content_texts = [
@@ -82,6 +144,330 @@ class ProcessController(BaseController):
 
         return chunks
 
+    def split_file(self, file_id: str, chunk_size: int=100, overlap_size: int=20, page_range: tuple=None):
+        """Function to load a file (or a range of its pages) and split it to chunks"""
+
+        # get file content
+        file_content = self.get_file_content(file_id=file_id, page_range=page_range)
+
+        # if no file exist
+        if file_content is None:
+            return None
+
+        # process the file (spilt to chunks)
+        return self.process_file_content(
+            file_content=file_content,
+            file_id=file_id,
+            chunk_size=chunk_size,
+            overlap_size=overlap_size
+        )
+
+    def is_stream_file(self, file_id: str):
+        """Function to check if a file is big enough to be processed as a stream"""
+        file_path = os.path.join(self.project_path, file_id)
+
+        return os.path.exists(file_path) and os.path.getsize(file_path) >= self.app_settings.PROCESS_STREAM_MIN_FILE_SIZE
+
+    def iterate_text_file_chunks(self, file_path: str, text_splitter):
+        """Generator that reads a text file block by block and yields its chunks,
+        the text after the start of the last chunk of a block is carried to the next block
+        so the chunks (and their overlap) continue across the block boundaries"""
+        metadata = { "source": file_path } # same metadata as TextLoader
+        carry = ""
+        carry_offset = 0 # position of the carried text in the file (in characters)
+
+        with open(file_path, "r", encoding="utf-8") as file:
+            while True:
+                block = file.read(self.app_settings.PROCESS_STREAM_BLOCK_SIZE)
+                is_last_block = len(block) == 0
+
+                text = carry + block
+                chunks = text_splitter.create_documents([text], metadatas=[metadata])
+
+                # the offsets of the chunks (if the splitter records them) are relative to the file
+                for chunk in chunks:
+                    if "start_offset" in chunk.metadata:
+                        chunk.metadata["start_offset"] += carry_offset
+                        chunk.metadata["end_offset"] += carry_offset
+
+                if is_last_block:
+                    yield from chunks
+                    return
+
+                if len(chunks) == 0:
+                    carry = text
+                    continue
+
+                # the last chunk could be cut by the end of the block, it's split again with the next block
+                yield from chunks[:-1]
+
+                last_chunk = chunks[-1]
+                last_chunk_start = (
+                    last_chunk.metadata["start_offset"] - carry_offset
+                    if "start_offset" in last_chunk.metadata
+                    else text.rfind(last_chunk.page_content)
+                )
+
+                carry = text[last_chunk_start:]
+                carry_offset += last_chunk_start
+
+    def iterate_file_chunks(self, file_id: str, chunk_size: int=100, overlap_size: int=20):
+        """Generator that yields the chunks of a file while it's read (page by page / block by block),
+        so only a small part of the file is in memory whatever its size"""
+        file_path = os.path.join(self.project_path, file_id)
+        text_splitter = self.get_text_splitter(chunk_size=chunk_size, overlap_size=overlap_size)
+
+        if self.get_file_extension(file_id=file_id) == ProcessingEnum.TXT.value:
+            yield from self.iterate_text_file_chunks(file_path=file_path, text_splitter=text_splitter)
+            return
+
+        loader = self.get_file_loader(file_id=file_id)
+        for page in loader.lazy_load():
+            yield from text_splitter.split_documents([page])
+
+    def iterate_file_chunk_batches(self, file_id: str, chunk_size: int=100, overlap_size: int=20):
+        """Generator that groups the chunks of a file to batches of PROCESS_STREAM_BATCH_SIZE chunks"""
+        batch = []
+
+        for chunk in self.iterate_file_chunks(file_id=file_id, chunk_size=chunk_size, overlap_size=overlap_size):
+            batch.append(chunk)
+
+            if len(batch) >= self.app_settings.PROCESS_STREAM_BATCH_SIZE:
+                yield batch
+                batch = []
+
+        if len(batch):
+            yield batch
+
+    async def insert_chunks(self, chunk_model, project, chunks: list, lexical_index=None):
+        """Function to insert chunks in the db and add them to the lexical index of the project
+
+        Returns:
+            int: The number of inserted chunks.
+        """
+        inserted_count = await chunk_model.insert_many_chunks(chunks=chunks)
 
-    
+        if lexical_index is not None:
+            await asyncio.to_thread(lexical_index.add_chunks, project_id=project.project_id, chunks=chunks)
+
+        return inserted_count
+
+    async def process_file_in_stream(self, chunk_model, project, asset_id, file_id: str,
+                                     chunk_size: int=100, overlap_size: int=20, lexical_index=None):
+        """Function to split a file to chunks and insert them in the db batch by batch while the file is read
+
+        Returns:
+            int: The number of inserted chunks.
+        """
+        inserted_count = 0
+        batches = self.iterate_file_chunk_batches(file_id=file_id, chunk_size=chunk_size, overlap_size=overlap_size)
+
+        # the file is read and split in a thread, one batch at a time, so the event loop is not blocked
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            batch_records = [
+                DataChunk(
+                    chunk_text=chunk.page_content,
+                    chunk_metadata=chunk.metadata,
+                    chunk_order=inserted_count+i+1,
+                    chunk_project_id=project.id,
+                    chunk_asset_id=asset_id
+                )
+                for i, chunk in enumerate(batch)
+            ]
+
+            inserted_count += await self.insert_chunks(chunk_model=chunk_model, project=project,
+                                                       chunks=batch_records, lexical_index=lexical_index)
+
+        return inserted_count
+
+    def get_file_page_ranges(self, file_id: str):
+        """Function to divide a pdf file to ranges of pages, each range is processed by a worker"""
+        pages_per_task = self.app_settings.PROCESS_PDF_PAGES_PER_TASK
+
+        if self.get_file_extension(file_id=file_id) != ProcessingEnum.PDF.value:
+            return [None]
+
+        if not os.path.exists(os.path.join(self.project_path, file_id)):
+            return [None]
+
+        page_count = self.get_pdf_page_count(file_id=file_id)
+        if page_count <= pages_per_task:
+            return [None]
+
+        return [
+            (page_start, page_start + pages_per_task)
+            for page_start in range(0, page_count, pages_per_task)
+        ]
+
+    async def split_project_files(self, project_files_ids: dict, chunk_size: int=100,
+                                  overlap_size: int=20, process_pool=None):
+        """Async generator that loads and splits the giving files then yields (asset_id, file_id, chunks),
+        the work runs outside the event loop: in a thread one file at a time, or in the giving process pool
+        where the files (and the page ranges of big pdf files) are split in parallel and yielded as they complete"""
+
+        if process_pool is None:
+            for asset_id, file_id in project_files_ids.items():
+                file_chunks = await asyncio.to_thread(self.split_file, file_id=file_id,
+                                                      chunk_size=chunk_size, overlap_size=overlap_size)
+                yield asset_id, file_id, file_chunks
+            return
+
+        loop = asyncio.get_running_loop()
+
+        # the workers load and split the file in other processes, so the whole file is timed here
+        @track_latency("ingestion", operation="load_and_split_file_in_pool",
+                       provider=lambda _: self.app_settings.CHUNKER_BACKEND)
+        async def split_in_pool(asset_id, file_id):
+            page_ranges = await asyncio.to_thread(self.get_file_page_ranges, file_id=file_id)
+
+            parts = await asyncio.gather(*[
+                loop.run_in_executor(process_pool, split_file_in_worker, self.project_id, file_id,
+                                     chunk_size, overlap_size, page_range)
+                for page_range in page_ranges
+            ])
+
+            if any(part is None for part in parts):
+                return asset_id, file_id, None
+
+            # the parts are joined in the order of their pages to keep the chunks order
+            return asset_id, file_id, [
+                Document(page_content=page_content, metadata=metadata)
+                for part in parts
+                for page_content, metadata in part
+            ]
+
+        tasks = [
+            asyncio.create_task(split_in_pool(asset_id, file_id))
+            for asset_id, file_id in project_files_ids.items()
+        ]
+
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # stop the remaining files if the caller stopped early (e.g. a failed file or a cancelled job)
+            for task in tasks:
+                task.cancel()
+
+    @track_latency("controller")
+    async def process_project_files(self, chunk_model, project, project_files_ids: dict,
+                                    chunk_size: int=100, overlap_size: int=20,
+                                    on_file_start=None, on_file_done=None, process_pool=None,
+                                    stream: bool=False, lexical_index=None):
+        """Function to split the giving files of a project to chunks and insert them in the db
+
+        Args:
+            chunk_model (ChunkModel): The model used to insert the chunks.
+            project (Project): The project that owns the files.
+            project_files_ids (dict): A mapping between the asset ids and the file names to process.
+            chunk_size (int): The size of each chunk. Defaults to 100.
+            overlap_size (int): The overlap between two chunks. Defaults to 20.
+            on_file_start (callable, optional): Async callback called with the asset id before the chunks
+                                                of a file are inserted.
+            on_file_done (callable, optional): Async callback called with the asset id and the number
+                                               of inserted chunks after a file is processed.
+            process_pool (ProcessPoolExecutor, optional): Load and split the files in parallel in this pool.
+                                                          Defaults to None (one file at a time).
+            stream (bool): Read all the files as streams (inserting their chunks in batches while reading them),
+                           otherwise only the files bigger than PROCESS_STREAM_MIN_FILE_SIZE. Defaults to False.
+            lexical_index (BM25Index, optional): Add the inserted chunks to the keyword index of the project.
+                                                 Defaults to None.
+
+        Returns:
+            tuple: (is_success (bool), no_records (int), no_files (int))
+        """
+        # no of processed chunks and files
+        no_records = 0
+        no_files = 0
+
+        # the big files are never loaded at once, they are read and inserted in batches
+        stream_files_ids = {
+            asset_id: file_id
+            for asset_id, file_id in project_files_ids.items()
+            if (stream and os.path.exists(os.path.join(self.project_path, file_id))) or self.is_stream_file(file_id=file_id)
+        }
+
+        project_files_ids = {
+            asset_id: file_id
+            for asset_id, file_id in project_files_ids.items()
+            if asset_id not in stream_files_ids
+        }
+
+        for asset_id, file_id in stream_files_ids.items():
+
+            if on_file_start:
+                await on_file_start(asset_id)
+
+            inserted_count = await self.process_file_in_stream(chunk_model=chunk_model, project=project,
+                                                               asset_id=asset_id, file_id=file_id,
+                                                               chunk_size=chunk_size, overlap_size=overlap_size,
+                                                               lexical_index=lexical_index)
+
+            # in case the chunking process is faild
+            if inserted_count == 0:
+                return False, no_records, no_files
+
+            no_records += inserted_count
+            no_files += 1
+
+            if on_file_done:
+                await on_file_done(asset_id, inserted_count)
+
+        files_chunks = self.split_project_files(project_files_ids=project_files_ids, chunk_size=chunk_size,
+                                                overlap_size=overlap_size, process_pool=process_pool)
+
+        async for asset_id, file_id, file_chunks in files_chunks:
+
+            # if no file exist
+            if file_chunks is None:
+                self.logger.error(f"Error while processing file: {file_id}")
+                continue # dont stop the app, skip the rest of this iteration and move to the next iteration/file
+
+            # in case the chunking process is faild
+            if len(file_chunks) == 0:
+                await files_chunks.aclose()
+                return False, no_records, no_files
+
+            if on_file_start:
+                await on_file_start(asset_id)
+
+            # prepare chunks to insert then in db
+            file_chunks_records = [
+                DataChunk(
+                    chunk_text=chunk.page_content,
+                    chunk_metadata=chunk.metadata,
+                    chunk_order=i+1,
+                    chunk_project_id=project.id,
+                    chunk_asset_id=asset_id
+                )
+                for i, chunk in enumerate(file_chunks)
+            ]
+
+            # inset chunks as bulk
+            inserted_count = await self.insert_chunks(chunk_model=chunk_model, project=project,
+                                                      chunks=file_chunks_records, lexical_index=lexical_index)
+            no_records += inserted_count
+            no_files += 1
+
+            if on_file_done:
+                await on_file_done(asset_id, inserted_count)
+
+        return True, no_records, no_files
+
+def split_file_in_worker(project_id: str, file_id: str, chunk_size: int, overlap_size: int, page_range: tuple=None):
+    """Function run by the processing pool workers to split a file (or a range of its pages),
+    it returns plain (text, metadata) pairs since they are sent back to the main process"""
+    file_chunks = ProcessController(project_id=project_id).split_file(
+        file_id=file_id,
+        chunk_size=chunk_size,
+        overlap_size=overlap_size,
+        page_range=page_range,
+    )
+
+    if file_chunks is None:
+        return None
 
+    return [
+        (chunk.page_content, chunk.metadata)
+        for chunk in file_chunks
+    ]
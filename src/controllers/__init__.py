@@ -3,3 +3,5 @@ from .ProjectController import ProjectController
 from .ProcessController import ProcessController
 from .EmbedController import EmbedController
 from .NLPController import NLPController
+from .IndexingController import IndexingController
+from .JobController import JobController
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
 # BaseSettings: Base class for settings, allowing values to be overridden by environment variables.
 
 class Settings(BaseSettings):
@@ -7,10 +8,26 @@ class Settings(BaseSettings):
     APP_VERSION: str
     OPENAI_API_KEY: str
 
+    METRICS_ENABLED: bool = True
+    TRACING_ENABLED: bool = True
+    TRACING_LOG_SPANS: bool = False
+    PROFILER_TOKEN: Optional[str] = None
+    PROFILER_SAMPLE_INTERVAL: float = 0.005
+    PROFILER_MAX_SECONDS: int = 60
+
     FILE_ALLOWED_TYPES: list
     FILE_MAX_SIZE: int
     FILE_DEFAULT_CHUNK_SIZE: int
 
+    CHUNKER_BACKEND: str = "native"
+
+    PROCESS_POOL_WORKERS: int = 4
+    PROCESS_PDF_PAGES_PER_TASK: int = 50
+
+    PROCESS_STREAM_MIN_FILE_SIZE: int = 52428800
+    PROCESS_STREAM_BLOCK_SIZE: int = 1048576
+    PROCESS_STREAM_BATCH_SIZE: int = 1000
+
     MONGODB_URL: str
     MONGODB_DATABASE: str
 
@@ -20,6 +37,8 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = None
     OPENAI_API_URL: str = None
     COHERE_API_KEY: str = None
+    FAKE_EMBEDDING_LATENCY: float = 0.0
+    FAKE_GENERATION_LATENCY: float = 0.0
 
     GENERATION_MODEL_ID: str = None
     EMBEDDING_MODEL_ID: str = None
@@ -27,13 +46,71 @@ class Settings(BaseSettings):
     INPUT_DAFAULT_MAX_CHARACTERS: int = None
     GENERATION_DAFAULT_MAX_TOKENS: int = None
     GENERATION_DAFAULT_TEMPERATURE: float = None
+    GENERATION_CONTEXT_SIZE: int = 8192
+    CONTEXT_MAX_TOKENS: Optional[int] = None
+    CONTEXT_MIN_SCORE: Optional[float] = None
+    CONTEXT_MAX_SCORE_GAP: Optional[float] = None
+    CONTEXT_MAX_OVERLAP_CHARACTERS: int = 200
+
+    LLM_REQUEST_TIMEOUT: float = 60
+    LLM_CONNECT_TIMEOUT: float = 10
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 30
+
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "embedding_cache"
+    EMBEDDING_CACHE_MAX_ITEMS: int = 10000
+    EMBEDDING_CACHE_MAX_DISK_ITEMS: int = 1000000
+
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ITEMS: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: Optional[int] = 86400
+    ANSWER_CACHE_SEMANTIC_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+
+    INDEX_EMBED_WORKERS: int = 4
+    INDEX_UPSERT_WORKERS: int = 1
+    INDEX_QUEUE_SIZE: int = 8
+    INDEX_UPSERT_BATCH_SIZE: int = 500
+
+    JOB_LEASE_SECONDS: int = 60
 
     VECTOR_DB_BACKEND : str
     VECTOR_DB_PATH : str
     VECTOR_DB_DISTANCE_METHOD: str = None
+    VECTOR_DB_MULTI_TENANT: bool = False
+    VECTOR_DB_SHARED_COLLECTION_NAME: str = "collection_shared"
+    VECTOR_DB_QUANTIZATION: Optional[str] = None
+    VECTOR_DB_QUANTIZATION_OVERSAMPLING: float = 2.0
+    VECTOR_DB_QUANTIZATION_RESCORE: bool = True
+    VECTOR_DB_URL: Optional[str] = None
+    VECTOR_DB_API_KEY: Optional[str] = None
+    VECTOR_DB_PREFER_GRPC: bool = False
+    VECTOR_DB_GRPC_PORT: int = 6334
+    VECTOR_DB_TIMEOUT: int = 30
+    VECTOR_DB_POOL_SIZE: int = 20
+    VECTOR_DB_UPLOAD_PARALLEL: int = 1
+    VECTOR_DB_UPLOAD_BATCH_SIZE: int = 64
+
+    IVF_NLIST: int = 0
+    IVF_NPROBE: int = 8
+    IVF_MIN_TRAIN_SIZE: int = 10000
+    IVF_TRAIN_SAMPLE_SIZE: int = 50000
+    IVF_RETRAIN_GROWTH: float = 2.0
+
+    LEXICAL_INDEX_PATH: str = "lexical_index"
+    SEARCH_DEFAULT_MODE: str = "vector"
+    HYBRID_SEARCH_CANDIDATES: int = 50
+    HYBRID_RRF_K: int = 60
+    SEARCH_BATCH_MAX_QUERIES: int = 64
+    SEARCH_MMR_FETCH_K: int = 0
+    SEARCH_MMR_MAX_FETCH_K: int = 500
+    SEARCH_MMR_LAMBDA: float = 0.5
 
     PRIMARY_LANG: str = "en"
     DEFAULT_LANG: str = "en"
+    TEMPLATES_RELOAD: bool = False
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,264 @@
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from bisect import bisect_left
+from helpers.tracing import get_current_trace
+import threading
+import inspect
+import time
+
+class MetricsRegistry:
+    """
+    In-process registry of the latency histograms and call / item counters of the pipeline stages
+    (mongo, embedding, vectordb, generation, prompt, ingestion), exported in the Prometheus text format.
+
+    Each series is labelled by stage, operation, provider and model, recording a call costs a
+    perf_counter call, a dict lookup and a bisect over the buckets. Each worker process has its own registry.
+    """
+
+    # seconds, from a fast in-memory search to a long generation
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    LABEL_NAMES = ("stage", "operation", "provider", "model")
+
+    def __init__(self, prefix: str = "rag", enabled: bool = True):
+        """
+        Initialize the registry.
+
+        Args:
+            prefix (str): The prefix of the exported metric names. Defaults to "rag".
+            enabled (bool): Whether the calls are recorded. Defaults to True.
+        """
+        self.prefix = prefix
+        self.enabled = enabled
+        self.lock = threading.Lock()
+
+        # labels -> [bucket counts..., +Inf count], sum of seconds, calls / errors / items counters
+        self.histograms = {}
+        self.sums = {}
+        self.calls = {}
+        self.errors = {}
+        self.items = {}
+
+    def observe(self, labels: tuple, seconds: float, error: bool = False, items: int = None):
+        """
+        Record one call of a stage.
+
+        Args:
+            labels (tuple): (stage, operation, provider, model).
+            seconds (float): The duration of the call.
+            error (bool): Whether the call raised an error. Defaults to False.
+            items (int, optional): The number of processed items (texts, vectors, documents). Defaults to None.
+        """
+        with self.lock:
+            counts = self.histograms.get(labels)
+            if counts is None:
+                counts = self.histograms[labels] = [0] * (len(self.BUCKETS) + 1)
+                self.sums[labels] = 0.0
+                self.calls[labels] = 0
+                self.errors[labels] = 0
+                self.items[labels] = 0
+
+            counts[bisect_left(self.BUCKETS, seconds)] += 1
+            self.sums[labels] += seconds
+            self.calls[labels] += 1
+
+            if error:
+                self.errors[labels] += 1
+            if items:
+                self.items[labels] += items
+
+    @staticmethod
+    def format_labels(labels: tuple, extra: str = ""):
+        """Function to format the labels of a series ({stage="...",...})"""
+        values = [
+            f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for name, value in zip(MetricsRegistry.LABEL_NAMES, labels)
+        ]
+        if extra:
+            values.append(extra)
+
+        return "{" + ",".join(values) + "}"
+
+    def render(self) -> str:
+        """Function to export all the series in the Prometheus text exposition format"""
+        with self.lock:
+            histograms = { labels: list(counts) for labels, counts in self.histograms.items() }
+            sums, calls = dict(self.sums), dict(self.calls)
+            errors, items = dict(self.errors), dict(self.items)
+
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Latency of the pipeline stages.",
+            f"# TYPE {name} histogram",
+        ]
+
+        for labels in sorted(histograms):
+            cumulative = 0
+            for bucket, count in zip(self.BUCKETS, histograms[labels]):
+                cumulative += count
+                lines.append(f"{name}_bucket{self.format_labels(labels, f'le=\"{bucket}\"')} {cumulative}")
+
+            lines.append(f"{name}_bucket{self.format_labels(labels, 'le=\"+Inf\"')} {calls[labels]}")
+            lines.append(f"{name}_sum{self.format_labels(labels)} {sums[labels]}")
+            lines.append(f"{name}_count{self.format_labels(labels)} {calls[labels]}")
+
+        for counter, help_text, values in [
+            ("stage_calls_total", "Number of calls of the pipeline stages.", calls),
+            ("stage_errors_total", "Number of calls of the pipeline stages that raised an error.", errors),
+            ("stage_items_total", "Number of items (texts, vectors, documents) processed by the pipeline stages.", items),
+        ]:
+            lines.append(f"# HELP {self.prefix}_{counter} {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{counter} counter")
+            lines.extend([
+                f"{self.prefix}_{counter}{self.format_labels(labels)} {values[labels]}"
+                for labels in sorted(values)
+            ])
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Function to remove all the recorded series"""
+        with self.lock:
+            for series in [self.histograms, self.sums, self.calls, self.errors, self.items]:
+                series.clear()
+
+@lru_cache
+def get_metrics():
+    """Function to return the metrics registry of the process"""
+    return MetricsRegistry()
+
+# the (stage, operation) being recorded in the current context, a nested call of the same
+# operation (e.g. embed_text -> embed_texts, or a provider that calls its parent class) is recorded once
+_active_operations = ContextVar("active_operations", default=frozenset())
+
+def get_label(value, instance):
+    """Function to resolve a label value: a constant, or a function of the instance (e.g. its model id)"""
+    if callable(value):
+        try:
+            return value(instance)
+        except Exception:
+            return ""
+
+    return value if value is not None else ""
+
+def track_latency(stage: str, operation: str = None, provider=None, model=None, items=None):
+    """
+    Decorator that records the latency of a method (sync, async or async generator) in the metrics registry,
+    and as a span of the trace of the request being served.
+
+    Args:
+        stage (str): The pipeline stage (e.g. "embedding", "vectordb", "mongo").
+        operation (str, optional): The operation label. Defaults to None (the method name without "_async").
+        provider (str or callable, optional): The provider label, or a function of the instance.
+                                              Defaults to None (the class name of the instance).
+        model (str or callable, optional): The model label, or a function of the instance. Defaults to None.
+        items (callable, optional): Function of the call arguments (dict) that returns the number of items.
+                                    Defaults to None.
+    """
+    def decorator(function):
+        operation_name = operation or function.__name__.removesuffix("_async")
+        signature = inspect.signature(function) if items else None
+
+        def start(args, kwargs, activate: bool = True):
+            """Function to return the labels and the start time of a call (None if it's not recorded),
+            activate marks the operation as active in the current context until the call stops"""
+            metrics, trace = get_metrics(), get_current_trace()
+            active_operations = _active_operations.get()
+            if (not metrics.enabled and trace is None) or (stage, operation_name) in active_operations:
+                return None
+
+            instance = args[0] if args else None
+            labels = (
+                stage,
+                operation_name,
+                get_label(provider, instance) if provider is not None else type(instance).__name__,
+                get_label(model, instance),
+            )
+
+            items_count = None
+            if items:
+                try:
+                    bound = signature.bind(*args, **kwargs)
+                    bound.apply_defaults()
+                    items_count = items(bound.arguments)
+                except Exception:
+                    items_count = None
+
+            # a span inside another span of the same stage is not added twice to the stage time of the trace
+            nested = any(active_stage == stage for active_stage, _ in active_operations)
+
+            token = _active_operations.set(active_operations | {(stage, operation_name)}) if activate else None
+            return labels, items_count, trace, nested, token, time.perf_counter()
+
+        def stop(started, error: bool):
+            labels, items_count, trace, nested, token, start_time = started
+            duration = time.perf_counter() - start_time
+
+            metrics = get_metrics()
+            if metrics.enabled:
+                metrics.observe(labels, duration, error=error, items=items_count)
+            if trace is not None:
+                trace.add_span(labels, start_time=start_time, duration=duration, error=error, nested=nested)
+
+            if token is not None:
+                _active_operations.reset(token)
+
+        if inspect.isasyncgenfunction(function):
+            @wraps(function)
+            async def async_generator_wrapper(*args, **kwargs):
+                # the context var is not set across the yields: the body of the generator runs in the context
+                # of its consumer, and it may be closed (early stop) by the garbage collector in another context
+                started = start(args, kwargs, activate=False)
+                if started is None:
+                    async for value in function(*args, **kwargs):
+                        yield value
+                    return
+
+                error = False
+                try:
+                    async for value in function(*args, **kwargs):
+                        yield value
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    stop(started, error=error)
+
+            return async_generator_wrapper
+
+        if inspect.iscoroutinefunction(function):
+            @wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                started = start(args, kwargs)
+                if started is None:
+                    return await function(*args, **kwargs)
+
+                error = False
+                try:
+                    return await function(*args, **kwargs)
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    stop(started, error=error)
+
+            return async_wrapper
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            started = start(args, kwargs)
+            if started is None:
+                return function(*args, **kwargs)
+
+            error = False
+            try:
+                return function(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                stop(started, error=error)
+
+        return wrapper
+
+    return decorator
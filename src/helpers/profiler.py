@@ -0,0 +1,147 @@
+from collections import Counter
+import threading
+import logging
+import hmac
+import time
+import sys
+import os
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler: a background thread takes the stack of every thread of the process
+    at a fixed interval (running, waiting on I/O or idle), and the counts of the stacks are written in the
+    folded format ("thread;frame;frame count" per line) read by flamegraph.pl, speedscope and inferno.
+
+    Only one session runs at a time, a session stops sampling after max_seconds even if it was not stopped.
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.005, max_seconds: float = 60):
+        """
+        Initialize the profiler.
+
+        Args:
+            output_dir (str): The directory of the profile files.
+            interval (float): Seconds between two samples. Defaults to 0.005.
+            max_seconds (float): The longest session. Defaults to 60.
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_seconds = max_seconds
+
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = None
+        self.stacks = None
+        self.samples = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_authorized(token: str, expected_token: str) -> bool:
+        """Function to check the token of a profiling request (the profiler is disabled without a configured token)"""
+        if not expected_token or not token:
+            return False
+
+        return hmac.compare_digest(token.encode(), expected_token.encode())
+
+    def is_running(self) -> bool:
+        return self.thread is not None
+
+    def get_profile_file_name(self, name: str):
+        """Function to return the file name of a profile"""
+        return f"{name}.folded"
+
+    @staticmethod
+    def get_frame_name(frame):
+        """Function to return the name of a frame in a stack (function and location)"""
+        code = frame.f_code
+        file_name = os.path.basename(code.co_filename)
+        return f"{code.co_qualname} ({file_name}:{code.co_firstlineno})".replace(";", ":")
+
+    def sample(self, thread_names: dict):
+        """Function to add the current stack of every thread (except the sampler) to the counts"""
+        sampler_id = threading.get_ident()
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_id:
+                continue
+
+            stack = []
+            while frame is not None:
+                stack.append(self.get_frame_name(frame))
+                frame = frame.f_back
+
+            stack.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+            self.stacks[";".join(reversed(stack))] += 1
+
+        self.samples += 1
+
+    def run_sampler(self, stop_event: threading.Event):
+        """Function run by the sampling thread until the session is stopped or reaches max_seconds"""
+        deadline = time.monotonic() + self.max_seconds
+
+        while not stop_event.wait(self.interval) and time.monotonic() < deadline:
+            thread_names = { thread.ident: thread.name for thread in threading.enumerate() }
+            self.sample(thread_names)
+
+    def start(self) -> bool:
+        """Function to start a session (False if a session is already running)"""
+        with self.lock:
+            if self.is_running():
+                return False
+
+            self.stacks = Counter()
+            self.samples = 0
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(target=self.run_sampler, args=(self.stop_event,),
+                                           name="sampling-profiler", daemon=True)
+            self.thread.start()
+
+            return True
+
+    def stop(self, name: str):
+        """
+        Stop the running session and write its profile.
+
+        Args:
+            name (str): The name of the profile file (without extension).
+
+        Returns:
+            dict or None: The file name, path and number of samples of the profile, None if no session was running.
+        """
+        with self.lock:
+            if not self.is_running():
+                return None
+
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+            stacks, samples = self.stacks, self.samples
+
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        file_name = self.get_profile_file_name(name)
+        profile_path = os.path.join(self.output_dir, file_name)
+
+        with open(profile_path, "w") as profile_file:
+            for stack, count in stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+
+        self.logger.info(f"Profile written to {profile_path} ({samples} samples)")
+
+        return {
+            "profile_file": file_name,
+            "profile_path": profile_path,
+            "samples": samples,
+        }
+
+    def run(self, seconds: float, name: str):
+        """Function to profile the process for some seconds (blocking, call it in a thread),
+        None if a session is already running"""
+        if not self.start():
+            return None
+
+        time.sleep(min(seconds, self.max_seconds))
+
+        return self.stop(name)
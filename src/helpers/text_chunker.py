@@ -0,0 +1,243 @@
+from langchain_core.documents import Document
+from typing import Callable, List
+
+class TextChunker:
+    """
+    Recursive separator based text splitter (same chunks as LangChain RecursiveCharacterTextSplitter
+    with its default settings) that works on (start, end) character offsets of the original text.
+
+    The text is scanned with str.find / str.rfind (for one character separators the chunk ends are found
+    directly instead of visiting every word), the pieces and chunks are kept as offsets and a substring
+    is only created for the final chunks, so the position of every chunk in the text is known and stored
+    in its metadata ("start_offset", "end_offset").
+    """
+
+    DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+    def __init__(self, chunk_size: int = 100, chunk_overlap: int = 20,
+                 length_function: Callable[[str], int] = len,
+                 separators: List[str] = None):
+        """
+        Initialize the chunker.
+
+        Args:
+            chunk_size (int): Maximum length of a chunk (measured by length_function). Defaults to 100.
+            chunk_overlap (int): Maximum length shared by two consecutive chunks. Defaults to 20.
+            length_function (callable): Function that measures the length of a text (e.g. a token counter).
+                                        Defaults to len (number of characters).
+            separators (List[str], optional): The separators tried in order. Defaults to DEFAULT_SEPARATORS.
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) is larger than chunk size ({chunk_size})")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_function = length_function
+        self.separators = separators or self.DEFAULT_SEPARATORS
+
+        # the length of a span is its number of characters, no need to create the substring
+        self.is_char_length = length_function is len
+        self.separator_length = length_function("")
+
+    def split_span(self, text: str, start: int, end: int, separator: str):
+        """Function to split text[start:end] on a separator, each piece starts with its separator"""
+        if separator == "":
+            return [ (i, i + 1) for i in range(start, end) ]
+
+        pieces = []
+        piece_start = start
+        position = text.find(separator, start, end)
+
+        while position != -1:
+            if position > piece_start:
+                pieces.append((piece_start, position))
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+
+        if end > piece_start:
+            pieces.append((piece_start, end))
+
+        return pieces
+
+    def split_span_by_char(self, text: str, start: int, end: int, separator: str, next_separators: list):
+        """Function to return the chunks of text[start:end] split on a one character separator
+        when the length is the number of characters (the common case).
+
+        It gives the same chunks as split_span + merge_spans without going over every piece:
+        the end of a chunk is the last separator within chunk_size characters of its start (str.rfind)
+        and the start of the next chunk is the first separator within the overlap (str.find)."""
+        chunks = []
+        position = start
+
+        def get_piece_end(piece_start: int):
+            piece_end = text.find(separator, piece_start + 1, end)
+            return end if piece_end == -1 else piece_end
+
+        while position < end:
+            piece_end = get_piece_end(position)
+
+            # a piece longer than a chunk is split by the next separators
+            if piece_end - position >= self.chunk_size:
+                if len(next_separators) == 0:
+                    chunks.append((position, piece_end))
+                else:
+                    chunks.extend(self.split_spans(text, position, piece_end, next_separators))
+                position = piece_end
+                continue
+
+            # a run of short pieces is merged to chunks
+            chunk_start = position
+            while True:
+                limit = chunk_start + self.chunk_size
+                if end <= limit:
+                    chunk_end = end
+                else:
+                    chunk_end = text.rfind(separator, chunk_start + 1, limit + 1)
+                    if chunk_end == -1:
+                        chunk_end = get_piece_end(chunk_start)
+
+                chunks.append((chunk_start, chunk_end))
+                position = chunk_end
+
+                if position >= end:
+                    break
+
+                # the next piece is too long, it ends the run
+                next_piece_length = get_piece_end(position) - position
+                if next_piece_length >= self.chunk_size:
+                    break
+
+                # the next chunk starts with the last pieces of this chunk (up to chunk_overlap),
+                # as long as the next piece still fits in the chunk
+                overlap_start = max(chunk_end - self.chunk_overlap, chunk_end + next_piece_length - self.chunk_size)
+                next_chunk_start = text.find(separator, overlap_start, chunk_end)
+                chunk_start = chunk_end if next_chunk_start == -1 else next_chunk_start
+
+        return chunks
+
+    def merge_spans(self, spans: list, lengths: list):
+        """Function to merge consecutive small spans to chunks of up to chunk_size,
+        every new chunk starts with the last spans of the previous one (up to chunk_overlap)"""
+        chunks = []
+        first = 0 # index of the first span of the current chunk
+        total = 0
+
+        # the spans are joined without a separator (each span starts with its own separator),
+        # its length is counted between the spans anyway to measure the chunks like LangChain does
+        separator_length = self.separator_length
+
+        for i, length in enumerate(lengths):
+            if total + length + (separator_length if i > first else 0) > self.chunk_size and i > first:
+                chunks.append((spans[first][0], spans[i - 1][1]))
+
+                while total > self.chunk_overlap or (
+                    total + length + (separator_length if i > first else 0) > self.chunk_size and total > 0
+                ):
+                    total -= lengths[first] + (separator_length if i - first > 1 else 0)
+                    first += 1
+
+            total += length + (separator_length if i > first else 0)
+
+        if len(spans) > first:
+            chunks.append((spans[first][0], spans[-1][1]))
+
+        return chunks
+
+    def split_spans(self, text: str, start: int, end: int, separators: list):
+        """Function to return the (start, end) offsets of the chunks of text[start:end]"""
+        chunks = []
+
+        # use the first separator that exists in the text, the bigger pieces are split by the next ones
+        separator = separators[-1]
+        next_separators = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                next_separators = separators[i + 1:]
+                break
+
+        if self.is_char_length and len(separator) == 1:
+            return self.split_span_by_char(text, start, end, separator, next_separators)
+
+        good_spans = []
+        good_lengths = []
+
+        pieces = self.split_span(text, start, end, separator)
+        if self.is_char_length:
+            lengths = [ piece_end - piece_start for piece_start, piece_end in pieces ]
+        else:
+            lengths = [ self.length_function(text[piece_start:piece_end]) for piece_start, piece_end in pieces ]
+
+        for piece, length in zip(pieces, lengths):
+            if length < self.chunk_size:
+                good_spans.append(piece)
+                good_lengths.append(length)
+                continue
+
+            if len(good_spans):
+                chunks.extend(self.merge_spans(good_spans, good_lengths))
+                good_spans, good_lengths = [], []
+
+            if len(next_separators) == 0:
+                chunks.append(piece)
+            else:
+                chunks.extend(self.split_spans(text, piece[0], piece[1], next_separators))
+
+        if len(good_spans):
+            chunks.extend(self.merge_spans(good_spans, good_lengths))
+
+        return chunks
+
+    def split_text_with_offsets(self, text: str):
+        """
+        Split a text to chunks.
+
+        Args:
+            text (str): The text to split.
+
+        Returns:
+            list: (chunk_text, start_offset, end_offset) of each chunk, the surrounding whitespace
+                  of the chunks is removed (and not counted in their offsets).
+        """
+        chunks = []
+
+        for start, end in self.split_spans(text, 0, len(text), self.separators):
+            chunk = text[start:end]
+            stripped_chunk = chunk.strip()
+
+            if stripped_chunk == "":
+                continue
+
+            start += len(chunk) - len(chunk.lstrip())
+            chunks.append((stripped_chunk, start, start + len(stripped_chunk)))
+
+        return chunks
+
+    def split_text(self, text: str):
+        """Function to split a text to chunks (same interface as the LangChain splitters)"""
+        return [ chunk for chunk, _, _ in self.split_text_with_offsets(text) ]
+
+    def create_documents(self, texts: list, metadatas: list = None):
+        """Function to split texts to chunk documents, each chunk has the metadata of its text
+        and its offsets in that text (same interface as the LangChain splitters)"""
+        metadatas = metadatas or [{}] * len(texts)
+
+        return [
+            Document(
+                page_content=chunk,
+                metadata={ **metadata, "start_offset": start_offset, "end_offset": end_offset },
+            )
+            for text, metadata in zip(texts, metadatas)
+            for chunk, start_offset, end_offset in self.split_text_with_offsets(text)
+        ]
+
+    def split_documents(self, documents: list):
+        """Function to split documents to chunk documents (same interface as the LangChain splitters)"""
+        return self.create_documents(
+            texts=[ document.page_content for document in documents ],
+            metadatas=[ document.metadata for document in documents ],
+        )
@@ -0,0 +1,181 @@
+from starlette.datastructures import Headers, MutableHeaders
+from contextvars import ContextVar
+import logging
+import asyncio
+import time
+import json
+import uuid
+
+class RequestTrace:
+    """
+    The spans (stage, operation, provider, model, start and duration) recorded while serving one request.
+
+    The spans are added by the track_latency decorator of the routes' controllers and stores, so the
+    trace follows the request through the event loop and the threads it uses (asyncio.to_thread copies
+    the context). It is summarized per stage in the Server-Timing header of the response.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.trace_id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status_code = None
+
+        self.start_time = time.perf_counter()
+        self.duration = None
+        self.spans = []
+
+    def add_span(self, labels: tuple, start_time: float, duration: float, error: bool = False,
+                 nested: bool = False):
+        """
+        Add a span to the trace (called from the event loop or from a thread).
+
+        Args:
+            labels (tuple): (stage, operation, provider, model).
+            start_time (float): The perf_counter value at the start of the span.
+            duration (float): The duration of the span in seconds.
+            error (bool): Whether the span raised an error. Defaults to False.
+            nested (bool): Whether the span runs inside another span of the same stage (e.g. a db call
+                           made by another db call), it is not added twice to the stage time. Defaults to False.
+        """
+        stage, operation, provider, model = labels
+        self.spans.append({
+            "stage": stage,
+            "operation": operation,
+            "provider": provider,
+            "model": model,
+            "start_ms": round((start_time - self.start_time) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "error": error,
+            "nested": nested,
+        })
+
+    def finish(self):
+        """Function to set the total duration of the request"""
+        self.duration = time.perf_counter() - self.start_time
+
+    def get_stage_timings(self) -> dict:
+        """Function to return the total milliseconds and the number of calls of each stage"""
+        timings = {}
+
+        for span in list(self.spans):
+            if span["nested"]:
+                continue
+
+            timing = timings.setdefault(span["stage"], {"duration_ms": 0.0, "calls": 0})
+            timing["duration_ms"] += span["duration_ms"]
+            timing["calls"] += 1
+
+        return timings
+
+    def get_server_timing(self) -> str:
+        """Function to format the Server-Timing header (one metric per stage, and the total)"""
+        total_ms = (self.duration if self.duration is not None else time.perf_counter() - self.start_time) * 1000
+
+        metrics = [
+            f'{stage};desc="{stage} ({timing["calls"]} calls)";dur={timing["duration_ms"]:.3f}'
+            for stage, timing in self.get_stage_timings().items()
+        ]
+        metrics.append(f"total;dur={total_ms:.3f}")
+
+        return ", ".join(metrics)
+
+    def to_dict(self) -> dict:
+        """Function to return the trace as a dict (structured log)"""
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "stages": self.get_stage_timings(),
+            "spans": list(self.spans),
+        }
+
+# the trace of the request being served (None outside a request, e.g. in the background jobs)
+current_trace = ContextVar("current_trace", default=None)
+
+def get_current_trace():
+    """Function to return the trace of the request being served in the current context"""
+    return current_trace.get()
+
+class TracingMiddleware:
+    """
+    ASGI middleware that traces each http request: it adds the Server-Timing (per stage breakdown)
+    and X-Trace-Id headers to the response, logs the spans as JSON (optional), and profiles the
+    request with the sampling profiler of the app when it has a valid X-Profile header.
+    """
+
+    PROFILE_HEADER = "x-profile"
+
+    def __init__(self, app, enabled: bool = True, log_spans: bool = False, profiler_token: str = None):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The wrapped ASGI app.
+            enabled (bool): Whether the requests are traced. Defaults to True.
+            log_spans (bool): Whether the trace of each request is logged as JSON. Defaults to False.
+            profiler_token (str, optional): The token that a request sends in the X-Profile header to be profiled.
+                                            Defaults to None (requests are never profiled).
+        """
+        self.app = app
+        self.enabled = enabled
+        self.log_spans = log_spans
+        self.profiler_token = profiler_token
+
+        self.logger = logging.getLogger(__name__)
+
+    def get_profiler(self, scope):
+        """Function to return the profiler of the app if the request asks (with the right token) to be profiled"""
+        profiler = getattr(scope.get("app"), "profiler", None)
+        token = Headers(scope=scope).get(self.PROFILE_HEADER)
+
+        if profiler is None or not profiler.is_authorized(token=token, expected_token=self.profiler_token):
+            return None
+
+        return profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(method=scope["method"], path=scope["path"])
+        trace_token = current_trace.set(trace)
+
+        # the profile covers the whole request (the body of a streamed answer too), it is
+        # named in advance since the headers are sent before the end of the request
+        profiler = self.get_profiler(scope)
+        profile_name = f"request-{trace.trace_id}"
+        if profiler is not None and not profiler.start():
+            profiler = None
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                trace.status_code = message["status"]
+
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", trace.get_server_timing())
+                headers.append("X-Trace-Id", trace.trace_id)
+                if profiler is not None:
+                    headers.append("X-Profile-File", profiler.get_profile_file_name(profile_name))
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(trace_token)
+            trace.finish()
+
+            route = scope.get("route")
+            trace.route = getattr(route, "path", None)
+
+            if profiler is not None:
+                await asyncio.to_thread(profiler.stop, profile_name)
+
+            if self.log_spans:
+                self.logger.info(json.dumps(trace.to_dict(), default=str))
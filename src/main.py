@@ -1,35 +1,79 @@
 from fastapi import FastAPI
-from routes import base, data, nlp
+from routes import base, data, nlp, jobs, metrics, profiler
 from motor.motor_asyncio import AsyncIOMotorClient
 from helpers.config import get_settings
+from helpers.metrics import get_metrics
+from helpers.tracing import TracingMiddleware
+from helpers.profiler import SamplingProfiler
 from stores.llm.LLMProviderFactory import LLMProviderFactory
 from stores.vectordb.VectorDBProviderFactory import VectorDBProviderFactory
 from stores.llm.templates.template_parser import TemplateParser
+from stores.llm.cache import EmbeddingCache, CachedEmbeddingClient, AnswerCache
+from stores.lexical import BM25Index
+from controllers.EmbedController import EmbedController
+from controllers.JobController import JobController
+from controllers.BaseController import BaseController
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
 
 
 
 app = FastAPI()
 
+# Server-Timing header (per stage time) of each request, and the profiling of the requests with an X-Profile header
+tracing_settings = get_settings()
+app.add_middleware(
+    TracingMiddleware,
+    enabled=tracing_settings.TRACING_ENABLED,
+    log_spans=tracing_settings.TRACING_LOG_SPANS,
+    profiler_token=tracing_settings.PROFILER_TOKEN,
+)
+
 async def startup_span():
     # Startup - get mango db connecton
     settings = get_settings()
+    get_metrics().enabled = settings.METRICS_ENABLED
+
     app.mongo_conn = AsyncIOMotorClient(settings.MONGODB_URL)
     app.db_client = app.mongo_conn[settings.MONGODB_DATABASE]
 
     # create object from the factory of llm and vectordb (act like routing class)
-    llm_provider_factory = LLMProviderFactory(settings)
+    app.llm_provider_factory = LLMProviderFactory(settings)
     vectordb_provider_factory = VectorDBProviderFactory(settings)
 
     # Create generation client using defined model in settings (.env file)
-    app.generation_client = llm_provider_factory.create(provider=settings.GENERATION_BACKEND)
+    app.generation_client = app.llm_provider_factory.create(provider=settings.GENERATION_BACKEND)
     app.generation_client.set_generation_model(model_id = settings.GENERATION_MODEL_ID)
 
     # Create embedding client using defined model in settings (.env file)
-    app.embedding_client = llm_provider_factory.create(provider=settings.EMBEDDING_BACKEND)
+    app.embedding_client = app.llm_provider_factory.create(provider=settings.EMBEDDING_BACKEND)
     app.embedding_client.set_embedding_model(model_id=settings.EMBEDDING_MODEL_ID,
                                              embedding_size=settings.EMBEDDING_MODEL_SIZE)
 
+    # serve repeated texts (re-indexing, repeated queries) from the embedding cache
+    app.embedding_cache = None
+    if settings.EMBEDDING_CACHE_ENABLED:
+        app.embedding_cache = EmbeddingCache(
+            db_path=EmbedController().get_database_path(db_name=settings.EMBEDDING_CACHE_PATH),
+            max_items=settings.EMBEDDING_CACHE_MAX_ITEMS,
+            max_disk_items=settings.EMBEDDING_CACHE_MAX_DISK_ITEMS,
+        )
+        app.embedding_client = CachedEmbeddingClient(
+            client=app.embedding_client,
+            cache=app.embedding_cache,
+            backend=settings.EMBEDDING_BACKEND,
+        )
+
+    # serve repeated questions of /index/answer without retrieval and generation
+    app.answer_cache = None
+    if settings.ANSWER_CACHE_ENABLED:
+        app.answer_cache = AnswerCache(
+            max_items=settings.ANSWER_CACHE_MAX_ITEMS,
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            semantic_enabled=settings.ANSWER_CACHE_SEMANTIC_ENABLED,
+        )
 
     # vector db client
     app.vectordb_client = vectordb_provider_factory.create(
@@ -37,16 +81,55 @@ async def startup_span():
     )
     app.vectordb_client.connect()
 
+    # keyword (BM25) index of the chunks, used by the lexical and hybrid search modes
+    app.lexical_index = BM25Index(
+        db_path=EmbedController().get_database_path(db_name=settings.LEXICAL_INDEX_PATH),
+        language=settings.PRIMARY_LANG,
+    )
+
     # intiatiate the language of rag
     app.template_parser = TemplateParser(
         language=settings.PRIMARY_LANG,
         default_language=settings.DEFAULT_LANG,
+        reload=settings.TEMPLATES_RELOAD,
+    )
+
+    # pool of processes used to load and split files in parallel (the workers start on first use),
+    # "spawn" so the workers do not inherit the db connections and threads of this process
+    app.process_pool = ProcessPoolExecutor(
+        max_workers=settings.PROCESS_POOL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
     )
 
+    # on-demand sampling profiler (disabled without a token)
+    app.profiler = None
+    if settings.PROFILER_TOKEN:
+        app.profiler = SamplingProfiler(
+            output_dir=BaseController().profiles_dir,
+            interval=settings.PROFILER_SAMPLE_INTERVAL,
+            max_seconds=settings.PROFILER_MAX_SECONDS,
+        )
+
+    # background jobs (resume the jobs interrupted by a crash or restart)
+    app.job_controller = JobController(app)
+    await app.job_controller.start()
+
 async def shutdown_span():
+    # stop the running jobs (they are resumed from their checkpoint on next startup)
+    await app.job_controller.stop()
+    app.process_pool.shutdown(cancel_futures=True)
+
     # Shutdown the connection
     app.mongo_conn.close()
-    app.vectordb_client.disconnect()
+    await app.vectordb_client.disconnect_async()
+
+    app.lexical_index.close()
+
+    if app.embedding_cache:
+        app.embedding_cache.close()
+
+    # close the keep-alive connection pool of the llm clients
+    await app.llm_provider_factory.close()
 
 # lifespan it used to do task on specific time (startup, shotdoun)
 #app.router.lifespan.on_startup.append(startup_span)
@@ -58,3 +141,6 @@ app.on_event("shutdown")(shutdown_span)
 app.include_router(base.base_router)
 app.include_router(data.data_router)
 app.include_router(nlp.nlp_router)
+app.include_router(jobs.jobs_router)
+app.include_router(metrics.metrics_router)
+app.include_router(profiler.profiler_router)
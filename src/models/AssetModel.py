@@ -1,4 +1,4 @@
-from .BaseDataModel import BaseDataModel
+from .BaseDataModel import BaseDataModel, track_mongo_latency
 from .db_schemes import Asset
 from .enums.DataBaseEnum import DataBaseEnum
 from bson import ObjectId
@@ -37,6 +37,7 @@ class AssetModel(BaseDataModel):
                 )
 
     # all these functions should be async to avoid blocking
+    @track_mongo_latency
     async def create_asset(self, asset: Asset):
         """Function to insert new asset in the db giving an asset object"""
         # by_alias=True => to us _id instead of id aince the mangodb need it in this way
@@ -45,6 +46,7 @@ class AssetModel(BaseDataModel):
 
         return asset
 
+    @track_mongo_latency
     async def get_all_project_assets(self, asset_project_id: str, asset_type: str):
         """Function to return all assets related to an project id """
 
@@ -58,6 +60,7 @@ class AssetModel(BaseDataModel):
             for record in records
         ]
 
+    @track_mongo_latency
     async def get_asset_record(self, asset_project_id: str, asset_name: str):
         """Function to return asset related by project id and name """
         record = await self.collection.find_one({
@@ -1,4 +1,8 @@
 from helpers.config import get_settings, Settings
+from helpers.metrics import track_latency
+
+# records the latency of a db call, labelled with the collection name of the model
+track_mongo_latency = track_latency("mongo", provider="mongodb", model=lambda self: self.collection.name)
 
 class BaseDataModel:
 
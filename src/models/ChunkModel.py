@@ -1,11 +1,15 @@
-from .BaseDataModel import BaseDataModel
+from .BaseDataModel import BaseDataModel, track_mongo_latency
 from .db_schemes import DataChunk
 from .enums.DataBaseEnum import DataBaseEnum
 from bson.objectid import ObjectId
-from pymongo import InsertOne
+from pymongo import InsertOne, UpdateOne
+from datetime import datetime
 
 class ChunkModel(BaseDataModel):
 
+    # the databases where this process created the indexes of the collection
+    indexed_databases = set()
+
     def __init__(self, db_client: object):
         super().__init__(db_client=db_client)
         self.collection = self.db_client[DataBaseEnum.COLLECTION_CHUNK_NAME.value]
@@ -25,27 +29,35 @@ class ChunkModel(BaseDataModel):
     async def init_collection(self):
         """Function to create an index for the collection"""
 
-        all_collections = await self.db_client.list_collection_names()
-        # would be true only first time got a request from any one (in the begining of using the aplication)
-        if DataBaseEnum.COLLECTION_CHUNK_NAME.value not in all_collections:
-            self.collection = self.db_client[DataBaseEnum.COLLECTION_CHUNK_NAME.value]
-            indexes = DataChunk.get_indexes() # get defined indexes
-            for index in indexes:
-                await self.collection.create_index(
-                    index["key"],
-                    name=index["name"],
-                    unique=index["unique"]
-                )
+        # create_index is idempotent, the indexes are created even if the collection already exists so the
+        # indexes added after it was created (e.g. chunk_project_id + _id) are built on the existing databases.
+        # It's done once per process since an instance is created for each request
+        if self.db_client.name in ChunkModel.indexed_databases:
+            return
+
+        indexes = DataChunk.get_indexes() # get defined indexes
+        for index in indexes:
+            await self.collection.create_index(
+                index["key"],
+                name=index["name"],
+                unique=index["unique"]
+            )
+
+        ChunkModel.indexed_databases.add(self.db_client.name)
 
 
     # all these functions should be async to avoid blocking
+    @track_mongo_latency
     async def create_chunk(self, chunk: DataChunk):
         """Function to insert new chunk in the db giving a datachunk object"""
+        chunk.chunk_hash = chunk.chunk_hash or chunk.create_hash()
+
         # by_alias=True => to us _id instead of id aince the mangodb need it in this way
         result = await self.collection.insert_one(chunk.dict(by_alias=True, exclude_unset=True))
         chunk.id = result.inserted_id
         return chunk
 
+    @track_mongo_latency
     async def get_chunk(self, chunk_id: str):
         """Function to return a chunk by id"""
         result = await self.collection.find_one({
@@ -58,21 +70,29 @@ class ChunkModel(BaseDataModel):
         
         return DataChunk(**result) # result is dict type , cast it to datachunck type
 
+    @track_mongo_latency
     async def insert_many_chunks(self, chunks: list, batch_size: int=100):
         """Function to insert group of chunks together in db giving a list of text"""
         for i in range(0, len(chunks), batch_size):
             batch = chunks[i:i+batch_size]
 
+            # the content hash is used later to index only the new / changed chunks
+            for chunk in batch:
+                chunk.chunk_hash = chunk.chunk_hash or chunk.create_hash()
+
             # create insert object for each chunk
-            operations = [
-                InsertOne(chunk.dict(by_alias=True, exclude_unset=True))
-                for chunk in batch
-            ]
+            documents = [ chunk.dict(by_alias=True, exclude_unset=True) for chunk in batch ]
+            operations = [ InsertOne(document) for document in documents ]
 
             await self.collection.bulk_write(operations)
+
+            # the driver sets the _id of the inserted documents, keep it in the chunks (used by the lexical index)
+            for chunk, document in zip(batch, documents):
+                chunk.id = document.get("_id", chunk.id)
         
         return len(chunks)
 
+    @track_mongo_latency
     async def delete_chunks_by_project_id(self, project_id: ObjectId):
         """Function to delete group of chunks in db by project id"""
         result = await self.collection.delete_many({
@@ -81,6 +101,30 @@ class ChunkModel(BaseDataModel):
 
         return result.deleted_count
 
+    @track_mongo_latency
+    async def delete_chunks_by_asset_id(self, project_id: ObjectId, asset_id: ObjectId, inserted_after: datetime=None):
+        """Function to delete the chunks of one asset in a project,
+        optionally only the ones inserted after a giving time (ObjectIds start with their creation time)"""
+        query = {
+            "chunk_project_id": ObjectId(project_id),
+            "chunk_asset_id": ObjectId(asset_id),
+        }
+
+        if inserted_after is not None:
+            query["_id"] = {"$gte": ObjectId.from_datetime(inserted_after)}
+
+        result = await self.collection.delete_many(query)
+
+        return result.deleted_count
+
+    @track_mongo_latency
+    async def count_project_chunks(self, project_id: ObjectId):
+        """Function to return the number of chunks in a project"""
+        return await self.collection.count_documents({
+            "chunk_project_id": ObjectId(project_id)
+        })
+
+    @track_mongo_latency
     async def get_poject_chunks(self, project_id: ObjectId, page_no: int=1, page_size: int=50):
         records = await self.collection.find({
                     "chunk_project_id": project_id
@@ -93,7 +137,102 @@ class ChunkModel(BaseDataModel):
             for record in records
         ]
 
-    
-    
+    async def iterate_project_chunks(self, project_id: ObjectId, batch_size: int=100,
+                                     projection: dict=None, after_id: ObjectId=None,
+                                     pending_for_model: str=None):
+        """Async generator that yields the chunks of a project in batches ordered by _id (keyset pagination),
+        each batch starts after the last _id of the previous one so the collection is scanned only once
+        and chunks inserted during the scan do not shift the pages.
+
+        Args:
+            project_id (ObjectId): The id of the project.
+            batch_size (int): The number of chunks in each batch. Defaults to 100.
+            projection (dict, optional): The fields to load (e.g. {"chunk_text": 1}), the returned chunks
+                                         are not validated in this case. Defaults to None (all fields).
+            after_id (ObjectId, optional): Resume token, only chunks after this _id are returned
+                                           (the id of the last chunk of an already processed batch).
+            pending_for_model (str, optional): Return only the chunks that are not indexed yet with this
+                                               embedding model or changed since they were indexed.
+                                               Defaults to None (all chunks).
+        """
+        query = {
+            "chunk_project_id": ObjectId(project_id) if isinstance(project_id, str) else project_id
+        }
+
+        if pending_for_model is not None:
+            query["$or"] = [
+                { "chunk_indexed_hash": None },
+                { "chunk_embedding_model": { "$ne": pending_for_model } },
+                { "$expr": { "$ne": ["$chunk_hash", "$chunk_indexed_hash"] } },
+            ]
+
+        while True:
+            if after_id is not None:
+                query["_id"] = {"$gt": ObjectId(after_id) if isinstance(after_id, str) else after_id}
+
+            records = await self.collection.find(
+                query, projection=projection
+            ).sort("_id", 1).limit(batch_size).to_list(length=None)
+
+            if len(records) == 0:
+                return
+
+            after_id = records[-1]["_id"]
+
+            yield [
+                DataChunk(**record) if projection is None else DataChunk.construct(**record)
+                for record in records
+            ]
+
+            # a partial batch means the scan reached the end
+            if len(records) < batch_size:
+                return
+
+    @track_mongo_latency
+    async def mark_chunks_indexed(self, chunk_ids: list, chunk_hashes: list, embedding_model: str,
+                                  batch_size: int=1000):
+        """Function to record that the giving chunks (with the giving content hashes) are in the vector db"""
+        indexed_at = datetime.utcnow()
+
+        for i in range(0, len(chunk_ids), batch_size):
+            operations = [
+                UpdateOne(
+                    { "_id": chunk_id },
+                    { "$set": {
+                        "chunk_hash": chunk_hash,
+                        "chunk_indexed_hash": chunk_hash,
+                        "chunk_embedding_model": embedding_model,
+                        "chunk_indexed_at": indexed_at,
+                    } }
+                )
+                for chunk_id, chunk_hash in zip(chunk_ids[i:i+batch_size], chunk_hashes[i:i+batch_size])
+            ]
 
-    
+            await self.collection.bulk_write(operations, ordered=False)
+
+        return len(chunk_ids)
+
+    @track_mongo_latency
+    async def unmark_project_chunks_indexed(self, project_id: ObjectId):
+        """Function to forget that the chunks of a project are in the vector db (after its collection
+        was reset), so a push that stops early is continued by the next push or a resumed job"""
+        result = await self.collection.update_many(
+            { "chunk_project_id": ObjectId(project_id) if isinstance(project_id, str) else project_id },
+            { "$unset": {
+                "chunk_indexed_hash": "",
+                "chunk_embedding_model": "",
+                "chunk_indexed_at": "",
+            } }
+        )
+
+        return result.modified_count
+
+    @track_mongo_latency
+    async def get_existing_chunk_ids(self, project_id: ObjectId, chunk_ids: list):
+        """Function to return which of the giving chunk ids still exist in a project"""
+        records = await self.collection.find(
+            { "chunk_project_id": ObjectId(project_id), "_id": { "$in": chunk_ids } },
+            projection={ "_id": 1 }
+        ).to_list(length=None)
+
+        return set( record["_id"] for record in records )
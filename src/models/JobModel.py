@@ -0,0 +1,121 @@
+from .BaseDataModel import BaseDataModel
+from .db_schemes import Job
+from .enums.DataBaseEnum import DataBaseEnum
+from .enums.JobEnums import JobStatusEnum
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from datetime import datetime
+
+class JobModel(BaseDataModel):
+
+    def __init__(self, db_client: object):
+        super().__init__(db_client=db_client)
+        self.collection = self.db_client[DataBaseEnum.COLLECTION_JOB_NAME.value]
+
+    @classmethod
+    async def create_instance(cls, db_client: object):
+        """Static Function (called without instant, using class name) used create an instance
+          instead of regular "__init__" because we need to call the function that create the index
+          in the creation instant but its async and could not called inside not async function __init__
+           Note: can not convert __init__ to async
+           Note: Now the creation of instance from this class in the main file would be using this fuction
+            instead of __init__ """
+        instance = cls(db_client) # this function create instance from this class (this line call (__init__)
+        await instance.init_collection() # call create index function for the collection
+        return instance # return an instance from this class after initiated the needed collection and its index
+
+    async def init_collection(self):
+        """Function to create an index for the collection"""
+
+        all_collections = await self.db_client.list_collection_names()
+        # would be true only first time got a request from any one (in the begining of using the aplication)
+        if DataBaseEnum.COLLECTION_JOB_NAME.value not in all_collections:
+            self.collection = self.db_client[DataBaseEnum.COLLECTION_JOB_NAME.value]
+            indexes = Job.get_indexes() # get defined indexes
+            for index in indexes:
+                await self.collection.create_index(
+                    index["key"],
+                    name=index["name"],
+                    unique=index["unique"]
+                )
+
+    # all these functions should be async to avoid blocking
+    async def create_job(self, job: Job):
+        """Function to insert new job in the db giving a job object"""
+        # by_alias=True => to us _id instead of id aince the mangodb need it in this way
+        result = await self.collection.insert_one(job.dict(by_alias=True, exclude_unset=True))
+        job.id = result.inserted_id
+
+        return job
+
+    async def get_job(self, job_id: str):
+        """Function to return a job by id"""
+        if not ObjectId.is_valid(job_id):
+            return None
+
+        record = await self.collection.find_one({
+            "_id": ObjectId(job_id) # casting the id to type in the mongodb
+        })
+
+        # if the job id does not exist
+        if record is None:
+            return None
+
+        return Job(**record) # record is dict type , cast it to job type
+
+    async def update_job(self, job_id: ObjectId, fields: dict):
+        """Function to update some fields of a job (progress, checkpoint, status, ...)"""
+        fields["job_updated_at"] = datetime.utcnow()
+
+        await self.collection.update_one(
+            { "_id": ObjectId(job_id) if isinstance(job_id, str) else job_id },
+            { "$set": fields }
+        )
+
+    async def claim_job(self, job_id: ObjectId, worker_id: str, stale_before: datetime):
+        """Function to take the ownership of an unfinished job if no other process is running it
+        (it has no owner, or its owner did not report for a while), it's atomic so only one process wins"""
+        now = datetime.utcnow()
+
+        record = await self.collection.find_one_and_update(
+            {
+                "_id": job_id,
+                "job_status": { "$in": [JobStatusEnum.PENDING.value, JobStatusEnum.RUNNING.value] },
+                "$or": [
+                    { "job_heartbeat_at": None },
+                    { "job_heartbeat_at": { "$lt": stale_before } },
+                ],
+            },
+            { "$set": { "job_worker_id": worker_id, "job_heartbeat_at": now, "job_updated_at": now } },
+            return_document=ReturnDocument.AFTER,
+        )
+
+        if record is None:
+            return None
+
+        return Job(**record)
+
+    async def get_abandoned_jobs(self, stale_before: datetime):
+        """Function to return the unfinished jobs that their process did not report for a while (crashed or stopped)"""
+        records = await self.collection.find({
+            "job_status": { "$in": [JobStatusEnum.PENDING.value, JobStatusEnum.RUNNING.value] },
+            "$or": [
+                { "job_heartbeat_at": None },
+                { "job_heartbeat_at": { "$lt": stale_before } },
+            ],
+        }).to_list(length=None)
+
+        return [
+            Job(**record)
+            for record in records
+        ]
+
+    async def send_heartbeat(self, job_ids: list, worker_id: str):
+        """Function to report that the giving process is still running its jobs"""
+        if len(job_ids) == 0:
+            return
+
+        await self.collection.update_many(
+            { "_id": { "$in": job_ids }, "job_worker_id": worker_id },
+            { "$set": { "job_heartbeat_at": datetime.utcnow() } }
+        )
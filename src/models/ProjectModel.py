@@ -1,6 +1,7 @@
-from .BaseDataModel import BaseDataModel
+from .BaseDataModel import BaseDataModel, track_mongo_latency
 from .db_schemes import Project
 from .enums.DataBaseEnum import DataBaseEnum
+from pymongo import ReturnDocument
 
 class ProjectModel(BaseDataModel):
 
@@ -37,6 +38,7 @@ class ProjectModel(BaseDataModel):
                 )
 
     # all these functions should be async to avoid blocking
+    @track_mongo_latency
     async def create_project(self, project: Project):
         """Function to insert new project in the db giving a project object"""
         # by_alias=True => to us _id instead of id aince the mangodb need it in this way
@@ -45,6 +47,7 @@ class ProjectModel(BaseDataModel):
 
         return project
 
+    @track_mongo_latency
     async def get_project_or_create_one(self, project_id: str):
         """Function to return a chunk by id or insert new one if not exist"""
         record = await self.collection.find_one({
@@ -62,6 +65,7 @@ class ProjectModel(BaseDataModel):
         # it it exist
         return Project(**record) # record is dict type , cast it to project type
 
+    @track_mongo_latency
     async def get_all_projects(self, page: int=1, page_size: int=10):
         """Function to return group of projects by page number and page size """
 
@@ -82,3 +86,15 @@ class ProjectModel(BaseDataModel):
             )
 
         return projects, total_pages
+
+    @track_mongo_latency
+    async def bump_index_version(self, project_id: str):
+        """Function to increase the index version of a project (after its chunks or its index changed)
+        and return the new version, the cached answers of the older versions are not used anymore"""
+        record = await self.collection.find_one_and_update(
+            { "project_id": project_id },
+            { "$inc": { "index_version": 1 } },
+            return_document=ReturnDocument.AFTER,
+        )
+
+        return record["index_version"] if record else None
@@ -1,3 +1,5 @@
 from .enums.ResponseEnums import ResponseSignal
-from .enums.ProcessingEnum import ProcessingEnum
-from .enums.AssetTypeEnum import AssetTypeEnum
\ No newline at end of file
+from .enums.ProcessingEnum import ProcessingEnum, ChunkerEnum
+from .enums.AssetTypeEnum import AssetTypeEnum
+from .enums.JobEnums import JobTypeEnum, JobStatusEnum
+from .enums.SearchEnums import SearchModeEnum
@@ -2,3 +2,4 @@ from .project import Project
 from .data_chunk import DataChunk
 from .asset import Asset
 from .data_chunk import RetrievedDocument
+from .job import Job
@@ -1,6 +1,9 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Optional, List
 from bson.objectid import ObjectId
+from datetime import datetime
+import hashlib
+import json
 
 # Collection / table for the data chunks
 class DataChunk(BaseModel):
@@ -11,9 +14,24 @@ class DataChunk(BaseModel):
     chunk_project_id: ObjectId # its type of id that deal with mongo
     chunk_asset_id: ObjectId
 
+    # used by the incremental indexing to push only the new / changed chunks
+    chunk_hash: Optional[str] = None # hash of the text and metadata of the chunk
+    chunk_indexed_hash: Optional[str] = None # the hash of the content that is in the vector db
+    chunk_embedding_model: Optional[str] = None # the embedding model used to index the chunk
+    chunk_indexed_at: Optional[datetime] = None
+
     class Config:
         arbitrary_types_allowed = True # this to avoid error that happen when pydantic does not know the type such as ObjectId
 
+    def create_hash(self):
+        """Function to return a hash of the chunk content (text and metadata)"""
+        content = json.dumps({
+            "text": self.chunk_text,
+            "metadata": self.chunk_metadata,
+        }, sort_keys=True, ensure_ascii=False, default=str)
+
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
     @classmethod
     def get_indexes(cls):
         """Function to define the index for this collection"""
@@ -24,6 +42,14 @@ class DataChunk(BaseModel):
                 ],
                 "name": "chunk_project_id_index_1",
                 "unique": False # could be repeated
+            },
+            {
+                "key": [
+                    ("chunk_project_id", 1),
+                    ("_id", 1) # used to page over the chunks of a project by _id
+                ],
+                "name": "chunk_project_id_id_index_1",
+                "unique": False
             }
         ]
 class RetrievedDocument(BaseModel):
@@ -35,6 +61,9 @@ class RetrievedDocument(BaseModel):
         text (str): The content of the retrieved document.
         score (float): The relevance score of the document, typically determined
                        by the retrieval model or algorithm.
+        vector (Optional[List[float]]): The stored vector of the document, only when it's requested
+                                        (e.g. for the MMR re-ranking), never part of the responses.
     """
     text: str  # The content of the retrieved document
-    score: float  # The relevance score of the document
\ No newline at end of file
+    score: float  # The relevance score of the document
+    vector: Optional[List[float]] = Field(None, exclude=True)
\ No newline at end of file
@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from bson.objectid import ObjectId
+from datetime import datetime
+
+# Collection / table for the background jobs
+class Job(BaseModel):
+    id: Optional[ObjectId] = Field(None, alias="_id") # alias because if name it as _id it would be private and not accessable outsid class
+    job_project_id: ObjectId # its type of id that deal with mongo
+    job_type: str = Field(..., min_length=1) # one of JobTypeEnum values
+    job_status: str = Field(..., min_length=1) # one of JobStatusEnum values
+    job_params: dict = Field(default_factory=dict) # the request parameters needed to run (or resume) the job
+    job_progress: int = Field(ge=0, default=0) # number of processed files / indexed chunks
+    job_total: Optional[int] = None # expected value of the progress when the job is completed
+    job_checkpoint: Optional[dict] = None # where to resume from after a crash or restart
+    job_result: Optional[dict] = None
+    job_error: Optional[str] = None
+    job_worker_id: Optional[str] = None # the process that runs the job
+    job_heartbeat_at: Optional[datetime] = None # last time the running process reported it is alive
+    job_created_at: datetime = Field(default_factory=datetime.utcnow)
+    job_updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        arbitrary_types_allowed = True # this to avoid error that happen when pydantic does not know the type such as ObjectId
+
+    @classmethod
+    def get_indexes(cls):
+        """Function to define the index for this collection"""
+        return [
+            {
+                "key": [
+                    ("job_project_id", 1) # 1 means ordered asc
+                ],
+                "name": "job_project_id_index_1",
+                "unique": False # could be repeated
+            },
+            {
+                "key": [
+                    ("job_status", 1)
+                ],
+                "name": "job_status_index_1",
+                "unique": False
+            },
+        ]
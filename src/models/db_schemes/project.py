@@ -6,6 +6,7 @@ from bson.objectid import ObjectId
 class Project(BaseModel):
     id: Optional[ObjectId] = Field(None, alias="_id") # alias because if name it as _id it would be private and not accessable outsid class
     project_id: str = Field(..., min_length=1) # ... means any value , None , means could ne null
+    index_version: int = 0 # increased each time the chunks or the index of the project change (answer cache key)
 
     # when Field function is not enough to write the validation rules
     @validator('project_id')
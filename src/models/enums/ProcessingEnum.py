@@ -4,3 +4,8 @@ class ProcessingEnum(Enum):
 
     TXT = ".txt"
     PDF = ".pdf"
+
+class ChunkerEnum(Enum):
+
+    NATIVE = "native" # helpers.text_chunker.TextChunker (records the offsets of the chunks)
+    LANGCHAIN = "langchain" # RecursiveCharacterTextSplitter
@@ -17,5 +17,13 @@ class ResponseSignal(Enum):
     VECTORDB_COLLECTION_RETRIEVED = "vectordb_collection_retrieved"
     VECTORDB_SEARCH_ERROR = "vectordb_search_error"
     VECTORDB_SEARCH_SUCCESS = "vectordb_search_success"
+    VECTORDB_SEARCH_BATCH_SIZE_EXCEEDED = "vectordb_search_batch_size_exceeded"
     RAG_ANSWER_ERROR = "rag_answer_error"
     RAG_ANSWER_SUCCESS = "rag_answer_success"
+    CACHE_INFO_RETRIEVED = "cache_info_retrieved"
+    JOB_CREATED = "job_created"
+    JOB_RETRIEVED = "job_retrieved"
+    JOB_NOT_FOUND = "job_not_found"
+    PROFILER_ACCESS_DENIED = "profiler_access_denied"
+    PROFILER_BUSY = "profiler_busy"
+    PROFILE_CREATED = "profile_created"
@@ -0,0 +1,7 @@
+from enum import Enum
+
+class SearchModeEnum(Enum):
+
+    VECTOR = "vector" # semantic search (embedding call + vector db)
+    LEXICAL = "lexical" # BM25 keyword search only (no embedding call)
+    HYBRID = "hybrid" # both searches concurrently, fused with reciprocal rank fusion
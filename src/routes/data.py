@@ -4,6 +4,7 @@ import os
 from helpers.config import get_settings, Settings
 from controllers import DataController, ProcessController
 import aiofiles
+import asyncio
 from models import ResponseSignal
 import logging
 from .schemes.data import ProcessRequest
@@ -12,6 +13,7 @@ from models.ChunkModel import ChunkModel
 from models.AssetModel import AssetModel
 from models.db_schemes import DataChunk, Asset
 from models.enums.AssetTypeEnum import AssetTypeEnum
+from models.enums.JobEnums import JobTypeEnum
 
 logger = logging.getLogger('uvicorn.error')
 
@@ -176,66 +178,65 @@ async def process_endpoint(request: Request,
     # start processing the file 
     process_controller = ProcessController(project_id=project_id)
 
-
-    # no of processed chunks and files
-    no_records = 0
-    no_files = 0
-
     chunk_model = await ChunkModel.create_instance(
                         db_client=request.app.db_client
                     )
+
+    # long running processing could be done in background as a job, the response has the job id only
+    if process_request.run_in_background:
+        job = await request.app.job_controller.create_job(
+            project=project,
+            job_type=JobTypeEnum.PROCESS.value,
+            params={
+                "project_id": project_id,
+                "files": { str(asset_id): file_id for asset_id, file_id in project_files_ids.items() },
+                "chunk_size": chunk_size,
+                "overlap_size": overlap_size,
+                "do_reset": do_reset,
+                "parallel": process_request.parallel,
+                "stream": process_request.stream,
+            },
+        )
+
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "signal": ResponseSignal.JOB_CREATED.value,
+                "job_id": str(job.id),
+            }
+        )
     
     # in case you want to clean the chunks for this project in the db first then insert new one
     if do_reset == 1:
         _ = await chunk_model.delete_chunks_by_project_id(
             project_id=project.id
         )
+        _ = await asyncio.to_thread(request.app.lexical_index.delete_project_chunks,
+                                    project_id=project.project_id)
+
+    is_success, no_records, no_files = await process_controller.process_project_files(
+        chunk_model=chunk_model,
+        project=project,
+        project_files_ids=project_files_ids,
+        chunk_size=chunk_size,
+        overlap_size=overlap_size,
+        process_pool=request.app.process_pool if process_request.parallel else None,
+        stream=bool(process_request.stream),
+        lexical_index=request.app.lexical_index,
+    )
 
-    for asset_id, file_id in project_files_ids.items():
-
-
-        # get file content
-        file_content = process_controller.get_file_content(file_id=file_id)
-
-        # if no file exist
-        if file_content is None:
-            logger.error(f"Error while processing file: {file_id}")
-            continue # dont stop the app, skip the rest of this iteration and move to the next iteration/file
+    # the cached answers of the project are not valid anymore (even after a partial failure)
+    _ = await project_model.bump_index_version(project_id=project_id)
 
-        # process the file (spilt to chunks)
-        file_chunks = process_controller.process_file_content(
-            file_content=file_content,
-            file_id=file_id,
-            chunk_size=chunk_size,
-            overlap_size=overlap_size
+    # in case the chunking process is faild
+    if not is_success:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.PROCESSING_FAILED.value
+            }
         )
 
-        # in case the chunking process is faild
-        if file_chunks is None or len(file_chunks) == 0:
-            return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={
-                    "signal": ResponseSignal.PROCESSING_FAILED.value
-                }
-            )
-        
-        # prepare chunks to insert then in db
-        file_chunks_records = [
-            DataChunk(
-                chunk_text=chunk.page_content,
-                chunk_metadata=chunk.metadata,
-                chunk_order=i+1,
-                chunk_project_id=project.id,
-                chunk_asset_id=asset_id
-            )
-            for i, chunk in enumerate(file_chunks)
-        ]
-
-
-        # inset chunks as bulk
-        no_records += await chunk_model.insert_many_chunks(chunks=file_chunks_records)
-        no_files += 1
-
     return JSONResponse(
         content={
             "signal": ResponseSignal.PROCESSING_SUCCESS.value,
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, status, Request
+from fastapi.responses import JSONResponse
+from models.JobModel import JobModel
+from models import ResponseSignal
+
+import logging
+
+logger = logging.getLogger('uvicorn.error')
+
+jobs_router = APIRouter(
+    prefix="/api/v1/jobs",
+    tags=["api_v1", "jobs"],
+)
+
+@jobs_router.get("/{job_id}")
+async def get_job_status(request: Request, job_id: str):
+    """
+    Endpoint to poll the status, progress and result of a background job.
+
+    Args:
+        request (Request): The HTTP request object containing application-wide resources.
+        job_id (str): The ID returned when the job was created.
+
+    Returns:
+        JSONResponse: The job status or an error if the job does not exist.
+    """
+    job_model = await JobModel.create_instance(
+        db_client=request.app.db_client
+    )
+
+    job = await job_model.get_job(job_id=job_id)
+
+    if job is None:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.JOB_NOT_FOUND.value
+            }
+        )
+
+    return JSONResponse(
+        content={
+            "signal": ResponseSignal.JOB_RETRIEVED.value,
+            "job": {
+                "job_id": str(job.id),
+                "job_type": job.job_type,
+                "job_status": job.job_status,
+                "job_progress": job.job_progress,
+                "job_total": job.job_total,
+                "job_result": job.job_result,
+                "job_error": job.job_error,
+                "job_created_at": job.job_created_at.isoformat(),
+                "job_updated_at": job.job_updated_at.isoformat(),
+            }
+        }
+    )
@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from helpers.metrics import get_metrics
+
+metrics_router = APIRouter(
+    tags=["metrics"],
+)
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_stage_metrics():
+    """
+    Endpoint to scrape the per-stage latency histograms and counters (Prometheus text format).
+
+    The series are labelled by stage (mongo, embedding, vectordb, generation, prompt, ingestion),
+    operation, provider and model, and only cover the worker process that serves the request.
+
+    Returns:
+        PlainTextResponse: The metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(
+        content=get_metrics().render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
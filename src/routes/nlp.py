@@ -1,12 +1,14 @@
-from fastapi import FastAPI, APIRouter, status, Request
-from fastapi.responses import JSONResponse
-from routes.schemes.nlp import PushRequest, SearchRequest
+from fastapi import FastAPI, APIRouter, status, Request, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
+from routes.schemes.nlp import PushRequest, SearchRequest, BatchSearchRequest
+from helpers.config import get_settings, Settings
 from models.ProjectModel import ProjectModel
 from models.ChunkModel import ChunkModel
-from controllers import NLPController
-from models import ResponseSignal
+from controllers import NLPController, IndexingController
+from models import ResponseSignal, JobTypeEnum
 
 import logging
+import json
 
 logger = logging.getLogger('uvicorn.error')
 
@@ -58,57 +60,64 @@ async def index_project(request: Request, project_id: str, push_request: PushReq
         generation_client=request.app.generation_client,
         embedding_client=request.app.embedding_client,
         template_parser=request.app.template_parser,
+        lexical_index=request.app.lexical_index,
     )
 
-    # the embedding process and insertion in the vector db would be in batches
-    has_records = True  # Flag to indicate if there are more chunks to process
-    page_no = 1  # Page number = batch number
-    inserted_items_count = 0  # Counter for successfully inserted items
-    idx = 0  # Index for chunk IDs
-
-    # Loop through project chunks and index them
-    while has_records:
-        # Retrieve chunks for the current page
-        page_chunks = await chunk_model.get_poject_chunks(project_id=project.id, page_no=page_no)
-        
-        # If chunks exist, increment the page number for the next iteration
-        if len(page_chunks):
-            page_no += 1
-        
-        # If no chunks are found, stop the loop
-        if not page_chunks or len(page_chunks) == 0:
-            has_records = False
-            break
-
-        # Generate unique IDs for the chunks
-        chunks_ids = list(range(idx, idx + len(page_chunks)))
-        idx += len(page_chunks)
-        
-        # Insert the chunks into the vector database
-        is_inserted = nlp_controller.index_into_vector_db(
+    # long running indexing could be done in background as a job, the response has the job id only
+    if push_request.run_in_background:
+        job = await request.app.job_controller.create_job(
             project=project,
-            chunks=page_chunks,
-            do_reset=push_request.do_reset,
-            chunks_ids=chunks_ids
+            job_type=JobTypeEnum.INDEX.value,
+            params={
+                "project_id": project_id,
+                "do_reset": push_request.do_reset,
+                "batch_size": push_request.batch_size,
+                "embed_workers": push_request.embed_workers,
+                "upsert_workers": push_request.upsert_workers,
+            },
         )
 
-        # If insertion fails, return an error response
-        if not is_inserted:
-            return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={
-                    "signal": ResponseSignal.INSERT_INTO_VECTORDB_ERROR.value
-                }
-            )
-        
-        # Update the count of successfully inserted items
-        inserted_items_count += len(page_chunks)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "signal": ResponseSignal.JOB_CREATED.value,
+                "job_id": str(job.id),
+            }
+        )
+
+    # the chunks are read, embedded and inserted in batches by a pipeline (the three stages run concurrently)
+    indexing_controller = IndexingController(
+        nlp_controller=nlp_controller,
+        chunk_model=chunk_model,
+        embed_workers=push_request.embed_workers,
+        upsert_workers=push_request.upsert_workers,
+    )
+
+    is_inserted, pipeline_stats = await indexing_controller.index_project(
+        project=project,
+        do_reset=bool(push_request.do_reset),
+        read_batch_size=push_request.batch_size,
+    )
+
+    # the cached answers of the project are not valid anymore
+    _ = await project_model.bump_index_version(project_id=project_id)
+
+    # If insertion fails, return an error response
+    if not is_inserted:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "signal": ResponseSignal.INSERT_INTO_VECTORDB_ERROR.value
+            }
+        )
         
-    # Return a success response with the count of inserted items
+    # Return a success response with the count of inserted (new / changed) and deleted items
     return JSONResponse(
         content={
             "signal": ResponseSignal.INSERT_INTO_VECTORDB_SUCCESS.value,
-            "inserted_items_count": inserted_items_count
+            "inserted_items_count": pipeline_stats["inserted_items_count"],
+            "deleted_items_count": pipeline_stats["deleted_items_count"],
+            "pipeline_stats": pipeline_stats,
         }
     )
 
@@ -128,6 +137,7 @@ async def get_project_index_info(request: Request, project_id: str):
         generation_client=request.app.generation_client,
         embedding_client=request.app.embedding_client,
         template_parser=request.app.template_parser,
+        lexical_index=request.app.lexical_index,
     )
 
     collection_info = nlp_controller.get_vector_db_collection_info(project=project)
@@ -155,10 +165,15 @@ async def search_index(request: Request, project_id: str, search_request: Search
         generation_client=request.app.generation_client,
         embedding_client=request.app.embedding_client,
         template_parser=request.app.template_parser,
+        lexical_index=request.app.lexical_index,
     )
 
-    results = nlp_controller.search_vector_db_collection(
-        project=project, text=search_request.text, limit=search_request.limit
+    results = await nlp_controller.search_vector_db_collection(
+        project=project, text=search_request.text, limit=search_request.limit,
+        search_params=search_request.search_params,
+        search_mode=search_request.search_mode,
+        fetch_k=search_request.fetch_k,
+        mmr_lambda=search_request.mmr_lambda,
     )
 
     if not results:
@@ -176,6 +191,58 @@ async def search_index(request: Request, project_id: str, search_request: Search
         }
     )
 
+@nlp_router.post("/index/search/batch/{project_id}")
+async def search_index_batch(request: Request, project_id: str, search_request: BatchSearchRequest,
+                             app_settings: Settings = Depends(get_settings)):
+    """
+    Endpoint to search the index of a project for many queries at once (e.g. evaluation jobs),
+    the queries are embedded in one provider call and searched in one batched vector search.
+    """
+    if len(search_request.texts) > app_settings.SEARCH_BATCH_MAX_QUERIES:
+        return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "signal": ResponseSignal.VECTORDB_SEARCH_BATCH_SIZE_EXCEEDED.value
+                }
+            )
+
+    project_model = await ProjectModel.create_instance(
+        db_client=request.app.db_client
+    )
+
+    project = await project_model.get_project_or_create_one(
+        project_id=project_id
+    )
+
+    nlp_controller = NLPController(
+        vectordb_client=request.app.vectordb_client,
+        generation_client=request.app.generation_client,
+        embedding_client=request.app.embedding_client,
+        template_parser=request.app.template_parser,
+        lexical_index=request.app.lexical_index,
+    )
+
+    batch_results = await nlp_controller.search_vector_db_collection_batch(
+        project=project, texts=search_request.texts, limit=search_request.limit,
+        search_params=search_request.search_params,
+        search_mode=search_request.search_mode,
+        fetch_k=search_request.fetch_k,
+        mmr_lambda=search_request.mmr_lambda,
+    )
+
+    return JSONResponse(
+        content={
+            "signal": ResponseSignal.VECTORDB_SEARCH_SUCCESS.value,
+            "results": [
+                {
+                    "text": text,
+                    "results": [ result.dict() for result in results ],
+                }
+                for text, results in zip(search_request.texts, batch_results)
+            ]
+        }
+    )
+
 @nlp_router.post("/index/answer/{project_id}")
 async def answer_rag(request: Request, project_id: str, search_request: SearchRequest):
     
@@ -192,12 +259,23 @@ async def answer_rag(request: Request, project_id: str, search_request: SearchRe
         generation_client=request.app.generation_client,
         embedding_client=request.app.embedding_client,
         template_parser=request.app.template_parser,
+        lexical_index=request.app.lexical_index,
+        answer_cache=request.app.answer_cache,
     )
 
-    answer, full_prompt, chat_history = nlp_controller.answer_rag_question(
+    # streaming mode: send the retrieval metadata, then the answer token by token (server-sent events)
+    if search_request.stream:
+        return await stream_rag_answer(nlp_controller=nlp_controller, project=project,
+                                       search_request=search_request)
+
+    answer, full_prompt, chat_history = await nlp_controller.answer_rag_question(
         project=project,
         query=search_request.text,
         limit=search_request.limit,
+        search_params=search_request.search_params,
+        search_mode=search_request.search_mode,
+        fetch_k=search_request.fetch_k,
+        mmr_lambda=search_request.mmr_lambda,
     )
 
     if not answer:
@@ -216,3 +294,60 @@ async def answer_rag(request: Request, project_id: str, search_request: SearchRe
             "chat_history": chat_history
         }
     )
+
+async def stream_rag_answer(nlp_controller: NLPController, project, search_request: SearchRequest):
+    """
+    Build the streaming response of the answer endpoint.
+
+    The retrieval is done before the stream starts, so a failed retrieval still returns
+    a regular error response, then the events of the controller are sent as server-sent events.
+    """
+    retrieved_documents = await nlp_controller.search_vector_db_collection(
+        project=project,
+        text=search_request.text,
+        limit=search_request.limit,
+        search_params=search_request.search_params,
+        search_mode=search_request.search_mode,
+        fetch_k=search_request.fetch_k,
+        mmr_lambda=search_request.mmr_lambda,
+    )
+
+    if not retrieved_documents:
+        return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "signal": ResponseSignal.RAG_ANSWER_ERROR.value
+                }
+        )
+
+    async def event_stream():
+        async for event in nlp_controller.stream_rag_answer(
+            query=search_request.text,
+            retrieved_documents=retrieved_documents,
+        ):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no", # ask proxies (nginx) not to buffer the stream
+        },
+    )
+
+@nlp_router.get("/cache/info")
+async def get_cache_info(request: Request):
+    """
+    Endpoint to report the hit/miss counters of the application caches.
+    """
+    embedding_cache = request.app.embedding_cache
+    answer_cache = request.app.answer_cache
+
+    return JSONResponse(
+        content={
+            "signal": ResponseSignal.CACHE_INFO_RETRIEVED.value,
+            "embedding_cache": embedding_cache.get_stats() if embedding_cache else None,
+            "answer_cache": answer_cache.get_stats() if answer_cache else None,
+        }
+    )
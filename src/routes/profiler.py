@@ -0,0 +1,61 @@
+from fastapi import APIRouter, status, Request, Depends, Header
+from fastapi.responses import JSONResponse
+from routes.schemes.profiler import ProfileRequest
+from helpers.config import get_settings, Settings
+from helpers.profiler import SamplingProfiler
+from models import ResponseSignal
+import asyncio
+import time
+
+profiler_router = APIRouter(
+    prefix="/api/v1/profiler",
+    tags=["api_v1", "profiler"],
+)
+
+@profiler_router.post("/run")
+async def run_profiler(request: Request, profile_request: ProfileRequest,
+                       x_profiler_token: str = Header(None),
+                       app_settings: Settings = Depends(get_settings)):
+    """
+    Endpoint to sample the stacks of all the threads of this worker for some seconds (while the other
+    requests are served) and write them as a flamegraph-ready file (folded stacks) under assets/profiles.
+
+    Args:
+        request (Request): The HTTP request object containing application-wide resources.
+        profile_request (ProfileRequest): The number of seconds to sample.
+        x_profiler_token (str): The X-Profiler-Token header, it must match the PROFILER_TOKEN setting.
+
+    Returns:
+        JSONResponse: The profile file name and number of samples, or an error if the access was denied
+                      or another profile is running.
+    """
+    profiler = request.app.profiler
+
+    if profiler is None or not SamplingProfiler.is_authorized(token=x_profiler_token,
+                                                              expected_token=app_settings.PROFILER_TOKEN):
+        return JSONResponse(
+            status_code=status.HTTP_403_FORBIDDEN,
+            content={
+                "signal": ResponseSignal.PROFILER_ACCESS_DENIED.value
+            }
+        )
+
+    # the sampling runs in a thread so the event loop keeps serving (and being sampled)
+    profile = await asyncio.to_thread(profiler.run, seconds=profile_request.seconds,
+                                      name=f"profile-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    if profile is None:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={
+                "signal": ResponseSignal.PROFILER_BUSY.value
+            }
+        )
+
+    return JSONResponse(
+        content={
+            "signal": ResponseSignal.PROFILE_CREATED.value,
+            "profile_file": profile["profile_file"],
+            "samples": profile["samples"],
+        }
+    )
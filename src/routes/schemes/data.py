@@ -6,3 +6,6 @@ class ProcessRequest(BaseModel):
     chunk_size: Optional[int] = 100
     overlap_size: Optional[int] = 20
     do_reset: Optional[int] = 0
+    run_in_background: Optional[int] = 0 # 1 means return a job id immediately and process as a background job
+    parallel: Optional[int] = 0 # 1 means load and split the files in parallel using the processing pool
+    stream: Optional[int] = 0 # 1 means read every file as a stream (the big files are always streamed)
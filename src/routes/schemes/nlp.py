@@ -1,15 +1,27 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 
 class PushRequest(BaseModel):
     """
     Model representing a request to push data into the vector database.
 
     Attributes:
-        do_reset (Optional[int]): Indicates whether to reset the collection before pushing data.
-                                  Defaults to 0 (no reset).
+        do_reset (Optional[int]): Indicates whether to reset the collection and re-index all chunks.
+                                  Defaults to 0 (push only the new / changed chunks).
+        batch_size (Optional[int]): The number of chunks read and embedded together (1 to 10000).
+                                    Defaults to 100.
+        embed_workers (Optional[int]): Number of concurrent embedding workers.
+                                       Defaults to None (INDEX_EMBED_WORKERS setting).
+        upsert_workers (Optional[int]): Number of concurrent vector db upsert workers.
+                                        Defaults to None (INDEX_UPSERT_WORKERS setting).
+        run_in_background (Optional[int]): Indicates whether to return a job id immediately and index
+                                           as a background job. Defaults to 0 (index within the request).
     """
     do_reset: Optional[int] = 0
+    batch_size: Optional[int] = Field(100, ge=1, le=10000)
+    embed_workers: Optional[int] = None
+    upsert_workers: Optional[int] = None
+    run_in_background: Optional[int] = 0
 
 class SearchRequest(BaseModel):
     """
@@ -18,6 +30,47 @@ class SearchRequest(BaseModel):
     Attributes:
         text (str): The query text to search for similar vectors.
         limit (Optional[int]): The maximum number of results to return. Defaults to 5.
+        stream (Optional[int]): Indicates whether to stream the answer as server-sent events
+                                (used by the answer endpoint only). Defaults to 0 (no streaming).
+        search_params (Optional[dict]): Recall / latency knobs of the vector db provider, e.g. {"nprobe": 16}
+                                        for IVF or {"hnsw_ef": 128} for Qdrant. Defaults to None.
+        search_mode (Optional[str]): "vector", "lexical" (keyword search without an embedding call)
+                                     or "hybrid" (both fused). Defaults to None (SEARCH_DEFAULT_MODE setting).
+        fetch_k (Optional[int]): Number of vector search candidates re-ranked by MMR (maximal marginal relevance)
+                                 to return diverse results, used when it's greater than the limit (vector mode),
+                                 at most SEARCH_MMR_MAX_FETCH_K. Defaults to None (SEARCH_MMR_FETCH_K setting).
+        mmr_lambda (Optional[float]): The MMR trade-off, 1 = relevance only, 0 = diversity only.
+                                      Defaults to None (SEARCH_MMR_LAMBDA setting).
     """
     text: str
     limit: Optional[int] = 5
+    stream: Optional[int] = 0
+    search_params: Optional[dict] = None
+    search_mode: Optional[str] = None
+    fetch_k: Optional[int] = Field(None, ge=0)
+    mmr_lambda: Optional[float] = Field(None, alias="lambda")
+
+    class Config:
+        populate_by_name = True
+
+class BatchSearchRequest(BaseModel):
+    """
+    Model representing a request to search the database for many queries at once.
+
+    Attributes:
+        texts (List[str]): The query texts, they are embedded together and searched in one batch.
+        limit (Optional[int]): The maximum number of results to return for each query. Defaults to 5.
+        search_params (Optional[dict]): Same as SearchRequest (applied to all the queries). Defaults to None.
+        search_mode (Optional[str]): Same as SearchRequest. Defaults to None (SEARCH_DEFAULT_MODE setting).
+        fetch_k (Optional[int]): Same as SearchRequest. Defaults to None (SEARCH_MMR_FETCH_K setting).
+        mmr_lambda (Optional[float]): Same as SearchRequest. Defaults to None (SEARCH_MMR_LAMBDA setting).
+    """
+    texts: List[str]
+    limit: Optional[int] = 5
+    search_params: Optional[dict] = None
+    search_mode: Optional[str] = None
+    fetch_k: Optional[int] = Field(None, ge=0)
+    mmr_lambda: Optional[float] = Field(None, alias="lambda")
+
+    class Config:
+        populate_by_name = True
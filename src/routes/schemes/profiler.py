@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class ProfileRequest(BaseModel):
+    seconds: Optional[float] = 10 # wall-clock seconds to sample (capped by PROFILER_MAX_SECONDS)
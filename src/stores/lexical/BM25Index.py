@@ -0,0 +1,196 @@
+from .TextNormalizer import TextNormalizer
+import threading
+import sqlite3
+import logging
+import os
+import re
+
+class BM25Index:
+    """
+    Per-project lexical (keyword) index of the chunks, ranked with BM25.
+
+    Each project has its own SQLite file with a "chunks" table (chunk id, asset id and text)
+    and an FTS5 inverted index over the normalized text of the chunks (porter stemming for
+    the English words), so the statistics of the ranking (document frequencies, average length)
+    are the ones of the project. The chunks are added when they are inserted by /data/process
+    and removed with them (a push rebuilds the index of a project that misses some of its chunks),
+    a search does not need an embedding call.
+    """
+
+    def __init__(self, db_path: str, language: str = "en"):
+        """
+        Initialize the index.
+
+        Args:
+            db_path (str): The directory where the SQLite files of the projects are stored.
+            language (str): The language of the stop words removed from the queries. Defaults to "en".
+        """
+        self.db_path = db_path
+        self.normalizer = TextNormalizer(language=language)
+
+        # project id -> (connection, lock), the connections are opened on first use
+        self.connections = {}
+        self.connections_lock = threading.Lock()
+
+        self.logger = logging.getLogger(__name__)
+
+    def get_connection(self, project_id: str):
+        """Function to return the SQLite connection of a project and the lock that guards it"""
+        with self.connections_lock:
+            if project_id in self.connections:
+                return self.connections[project_id]
+
+            file_name = re.sub(r"[^\w\-]", "_", str(project_id))
+            connection = sqlite3.connect(os.path.join(self.db_path, f"{file_name}.sqlite3"), check_same_thread=False)
+
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    row INTEGER PRIMARY KEY,
+                    chunk_id TEXT UNIQUE NOT NULL,
+                    asset_id TEXT NOT NULL,
+                    chunk_text TEXT NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS chunks_asset_id ON chunks (asset_id, chunk_id)")
+            # the rowid of the inverted index is the row of the chunk
+            connection.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                    content, tokenize='porter unicode61 remove_diacritics 2'
+                )
+            """)
+            connection.commit()
+
+            self.connections[project_id] = (connection, threading.Lock())
+
+            return self.connections[project_id]
+
+    def add_chunks(self, project_id: str, chunks: list):
+        """
+        Add (or replace) chunks in the index of a project.
+
+        Args:
+            project_id (str): The ID of the project.
+            chunks (list): The inserted DataChunk objects (with their ids).
+        """
+        chunks = [ chunk for chunk in chunks if chunk.id is not None ]
+        if len(chunks) == 0:
+            return 0
+
+        connection, lock = self.get_connection(project_id)
+
+        with lock:
+            # a chunk that is already indexed is replaced (e.g. the same chunks added by a resumed job)
+            self.delete_rows(connection, connection.execute(
+                f"SELECT row FROM chunks WHERE chunk_id IN ({','.join('?' * len(chunks))})",
+                [ str(chunk.id) for chunk in chunks ],
+            ).fetchall())
+
+            for chunk in chunks:
+                cursor = connection.execute(
+                    "INSERT INTO chunks (chunk_id, asset_id, chunk_text) VALUES (?, ?, ?)",
+                    (str(chunk.id), str(chunk.chunk_asset_id), chunk.chunk_text),
+                )
+                connection.execute(
+                    "INSERT INTO chunks_fts (rowid, content) VALUES (?, ?)",
+                    (cursor.lastrowid, self.normalizer.normalize(chunk.chunk_text)),
+                )
+
+            connection.commit()
+
+        return len(chunks)
+
+    def delete_rows(self, connection, rows: list):
+        """Function to remove rows from the chunks table and the inverted index (within the lock)"""
+        rows = [ (row,) for row, in rows ]
+
+        connection.executemany("DELETE FROM chunks_fts WHERE rowid = ?", rows)
+        connection.executemany("DELETE FROM chunks WHERE row = ?", rows)
+
+        return len(rows)
+
+    def delete_project_chunks(self, project_id: str):
+        """Function to remove all the chunks of a project from its index"""
+        connection, lock = self.get_connection(project_id)
+
+        with lock:
+            connection.execute("DELETE FROM chunks_fts")
+            deleted_count = connection.execute("DELETE FROM chunks").rowcount
+            connection.commit()
+
+        return deleted_count
+
+    def delete_asset_chunks(self, project_id: str, asset_id: str, inserted_after_id: str = None):
+        """
+        Remove the chunks of one asset from the index of a project.
+
+        Args:
+            project_id (str): The ID of the project.
+            asset_id (str): The ID of the asset.
+            inserted_after_id (str, optional): Remove only the chunks with an id greater or equal to this
+                                               ObjectId (the ids start with their creation time). Defaults to None.
+        """
+        connection, lock = self.get_connection(project_id)
+
+        with lock:
+            rows = connection.execute(
+                "SELECT row FROM chunks WHERE asset_id = ? AND chunk_id >= ?",
+                (str(asset_id), str(inserted_after_id or "")),
+            ).fetchall()
+
+            deleted_count = self.delete_rows(connection, rows)
+            connection.commit()
+
+        return deleted_count
+
+    def count(self, project_id: str):
+        """Function to return the number of indexed chunks of a project"""
+        connection, lock = self.get_connection(project_id)
+
+        with lock:
+            return connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(self, project_id: str, text: str, limit: int = 10):
+        """
+        Search the chunks of a project that contain the words of a query.
+
+        Args:
+            project_id (str): The ID of the project.
+            text (str): The query text.
+            limit (int): The maximum number of results to return. Defaults to 10.
+
+        Returns:
+            list: (chunk_id, chunk_text, score) of the best chunks, the higher the BM25 score the better.
+        """
+        terms = self.normalizer.get_query_terms(text)
+        if len(terms) == 0:
+            return []
+
+        # any of the words (quoted so they are not read as FTS5 operators)
+        match_query = " OR ".join([ '"' + term.replace('"', '""') + '"' for term in terms ])
+
+        connection, lock = self.get_connection(project_id)
+
+        with lock:
+            # fts5 bm25() is lower for better matches
+            results = connection.execute("""
+                SELECT chunks.chunk_id, chunks.chunk_text, -ranked.score
+                FROM (
+                    SELECT rowid, bm25(chunks_fts) AS score FROM chunks_fts
+                    WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?
+                ) AS ranked
+                JOIN chunks ON chunks.row = ranked.rowid
+                ORDER BY ranked.score
+            """, (match_query, limit)).fetchall()
+
+        return results
+
+    def close(self):
+        """Function to close the SQLite connections of all the projects"""
+        with self.connections_lock:
+            for connection, lock in self.connections.values():
+                with lock:
+                    connection.close()
+
+            self.connections = {}
@@ -0,0 +1,69 @@
+import re
+
+class TextNormalizer:
+    """
+    Normalizes the text of the chunks and the queries before the lexical (BM25) indexing and search,
+    so the different spellings of the same word match.
+
+    The Arabic normalization is applied to every text (the documents could mix languages):
+    the diacritics (tashkeel) and tatweel are removed, the alef forms are unified, and
+    the alef maqsura / taa marbuta / hamza forms are mapped to their common letter
+    and the definite article (with its attached prepositions) is removed from the words.
+    """
+
+    ARABIC_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+    ARABIC_TATWEEL = "\u0640"
+    ARABIC_LETTERS = str.maketrans({
+        "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+        "ى": "ي", "ئ": "ي",
+        "ؤ": "و",
+        "ة": "ه",
+        # Arabic-Indic digits
+        "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+        "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+    })
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    # "ال" with the prepositions / conjunctions that are written attached to it (longest first)
+    ARABIC_ARTICLE = re.compile(r"\b(?:وال|بال|كال|فال|لل|ال)(?=\w{2})")
+
+    # the most common words, they match almost every chunk so they are removed from the queries only
+    STOP_WORDS = {
+        "en": {
+            "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+            "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "which",
+            "who", "why", "will", "with", "do", "does", "can",
+        },
+        "ar": {
+            "في", "من", "علي", "الي", "عن", "مع", "هذا", "هذه", "ذلك", "تلك", "تي", "ذي", "هو", "هي",
+            "ما", "ماذا", "متي", "اين", "كيف", "لماذا", "هل", "او", "ثم", "قد", "كان", "لا", "ان", "بين",
+        },
+    }
+
+    def __init__(self, language: str = "en"):
+        """
+        Initialize the normalizer.
+
+        Args:
+            language (str): The language of the stop words removed from the queries
+                            (the normalization itself is the same for all languages). Defaults to "en".
+        """
+        self.language = language
+        self.stop_words = self.STOP_WORDS["en"] | self.STOP_WORDS.get(language, set())
+
+    def normalize(self, text: str):
+        """Function to return the normalized (lower case, unified Arabic letters, no article) form of a text"""
+        text = self.ARABIC_DIACRITICS.sub("", text).replace(self.ARABIC_TATWEEL, "")
+        text = text.translate(self.ARABIC_LETTERS)
+        return self.ARABIC_ARTICLE.sub("", text).lower()
+
+    def tokenize(self, text: str):
+        """Function to return the normalized words of a text"""
+        return self.TOKEN_PATTERN.findall(self.normalize(text))
+
+    def get_query_terms(self, text: str):
+        """Function to return the distinct words of a query without the stop words
+        (all the words if the query has stop words only)"""
+        terms = list(dict.fromkeys(self.tokenize(text)))
+        return [ term for term in terms if term not in self.stop_words ] or terms
@@ -0,0 +1,2 @@
+from .TextNormalizer import TextNormalizer
+from .BM25Index import BM25Index
@@ -4,6 +4,7 @@ class LLMEnums(Enum):
     """All LLm providors"""
     OPENAI = "OPENAI"
     COHERE = "COHERE"
+    FAKE = "FAKE" # offline deterministic provider (benchmarks, local runs)
 
 class OpenAIEnums(Enum):
     """Open AI role types"""
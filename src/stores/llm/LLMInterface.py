@@ -19,12 +19,72 @@ class LLMInterface(ABC):
         """Function to generate new text giving a query and chat history"""
         pass
 
+    @abstractmethod
+    async def generate_text_async(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                        temperature: float = None):
+        """Function to generate new text giving a query and chat history without blocking the event loop"""
+        pass
+
+    @abstractmethod
+    async def generate_text_stream(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                         temperature: float = None):
+        """Function to generate new text giving a query and chat history, yielding the text piece by piece"""
+        pass
+
+    @abstractmethod
+    def get_embedding_input(self, text: str):
+        """Function to return the text exactly as it's sent to the embedding model (the embedding cache key)"""
+        pass
+
     @abstractmethod
     def embed_text(self, text: str, document_type: str = None):
         """Function to get embedding vector of giving text"""
         pass
 
+    @abstractmethod
+    def embed_texts(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts using as few requests as possible,
+        the result keeps the order of the giving texts (None in place of any text that failed)"""
+        pass
+
+    @abstractmethod
+    async def embed_text_async(self, text: str, document_type: str = None):
+        """Function to get embedding vector of giving text without blocking the event loop"""
+        pass
+
+    @abstractmethod
+    async def embed_texts_async(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts without blocking the event loop"""
+        pass
+
     @abstractmethod
     def construct_prompt(self, prompt: str, role: str):
         """Function to build required prompt format for the model"""
         pass
+
+    def estimate_tokens(self, text: str):
+        """Function to estimate number of tokens in a text without calling a tokenizer
+        (roughly 4 characters per token for english text)"""
+        return len(text) // 4 + 1
+
+    def create_text_batches(self, texts: list, max_batch_size: int, max_batch_tokens: int = None):
+        """Function to split texts to batches (lists of positions) respecting the provider limits
+        on number of inputs and total tokens per request"""
+        batches, batch, batch_tokens = [], [], 0
+
+        for idx, text in enumerate(texts):
+            text_tokens = self.estimate_tokens(text)
+
+            # close the current batch if adding this text would exceed one of the limits
+            if batch and (len(batch) >= max_batch_size or
+                          (max_batch_tokens and batch_tokens + text_tokens > max_batch_tokens)):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+
+            batch.append(idx)
+            batch_tokens += text_tokens
+
+        if batch:
+            batches.append(batch)
+
+        return batches
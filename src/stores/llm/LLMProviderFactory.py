@@ -1,6 +1,7 @@
 
 from .LLMEnums import LLMEnums
-from .providers import OpenAIProvider, CoHereProvider
+from .providers import OpenAIProvider, CoHereProvider, FakeProvider
+import httpx
 
 class LLMProviderFactory:
     """Class to manage utilizing all llm types"""
@@ -8,6 +9,30 @@ class LLMProviderFactory:
         """set the needed configration , generation model name , embedding model name"""
         self.config = config
 
+        # one keep-alive connection pool shared by the async clients of all created providers
+        self.http_client = None
+
+    def get_http_client(self):
+        """Function to return the shared async http client (created on first use)"""
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.config.LLM_REQUEST_TIMEOUT,
+                                      connect=self.config.LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=self.config.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=self.config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=self.config.LLM_KEEPALIVE_EXPIRY,
+                ),
+            )
+
+        return self.http_client
+
+    async def close(self):
+        """Function to close the shared connection pool"""
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
     def create(self, provider: str):
         """Function to crate a providor object based on giving name"""
 
@@ -18,7 +43,9 @@ class LLMProviderFactory:
                 base_url = self.config.OPENAI_API_URL,
                 default_input_max_characters=self.config.INPUT_DAFAULT_MAX_CHARACTERS,
                 default_generation_max_output_tokens=self.config.GENERATION_DAFAULT_MAX_TOKENS,
-                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE
+                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE,
+                request_timeout=self.config.LLM_REQUEST_TIMEOUT,
+                http_client=self.get_http_client(),
             )
 
         # CoHere
@@ -27,7 +54,19 @@ class LLMProviderFactory:
                 api_key = self.config.COHERE_API_KEY,
                 default_input_max_characters=self.config.INPUT_DAFAULT_MAX_CHARACTERS,
                 default_generation_max_output_tokens=self.config.GENERATION_DAFAULT_MAX_TOKENS,
-                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE
+                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE,
+                request_timeout=self.config.LLM_REQUEST_TIMEOUT,
+                http_client=self.get_http_client(),
+            )
+
+        # Fake (offline, deterministic)
+        if provider == LLMEnums.FAKE.value:
+            return FakeProvider(
+                default_input_max_characters=self.config.INPUT_DAFAULT_MAX_CHARACTERS,
+                default_generation_max_output_tokens=self.config.GENERATION_DAFAULT_MAX_TOKENS,
+                default_generation_temperature=self.config.GENERATION_DAFAULT_TEMPERATURE,
+                embedding_latency=self.config.FAKE_EMBEDDING_LATENCY,
+                generation_latency=self.config.FAKE_GENERATION_LATENCY,
             )
 
         # if passed unsported llm name
@@ -0,0 +1,211 @@
+from collections import OrderedDict
+import numpy as np
+import threading
+import logging
+import time
+import json
+import re
+
+class AnswerCache:
+    """
+    In-memory (per process) cache of the RAG answers with two tiers:
+    an exact tier keyed on the normalized query, and a semantic tier that returns the answer
+    of a cached query whose embedding is close enough to the embedding of the new query.
+
+    Each entry belongs to a scope (project, index version of the project, generation model,
+    temperature, retrieval options...), an answer is only reused within the same scope, so
+    a new /data/process or /index/push (that bumps the index version) invalidates the
+    answers of the project.
+    """
+
+    NORMALIZE_SPACES = re.compile(r"\s+")
+    TRAILING_PUNCTUATION = " ?.!؟"
+
+    def __init__(self, max_items: int = 1000, similarity_threshold: float = 0.95,
+                 ttl_seconds: int = None, semantic_enabled: bool = True):
+        """
+        Initialize the cache.
+
+        Args:
+            max_items (int): The maximum number of cached answers. Defaults to 1000.
+            similarity_threshold (float): The minimum cosine similarity between two query embeddings
+                                          to reuse an answer in the semantic tier. Defaults to 0.95.
+            ttl_seconds (int, optional): The age after which an answer is not used anymore.
+                                         Defaults to None (no expiry).
+            semantic_enabled (bool): Whether the semantic tier is used. Defaults to True.
+        """
+        self.max_items = max_items
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.semantic_enabled = semantic_enabled
+
+        # (scope, normalized query) -> entry, ordered from the least recently used
+        self.entries = OrderedDict()
+        # scope -> {entry key: unit query vector} for the semantic tier
+        self.scope_vectors = {}
+        # project id -> the latest index version seen
+        self.project_versions = {}
+        self.lock = threading.Lock()
+
+        # hit/miss counters
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def create_scope(project_id: str, index_version: int, **options) -> tuple:
+        """Function to create the scope of the answers that could be shared (the project,
+        its index version and every option that changes the answer, e.g. model id and temperature)"""
+        return (str(project_id), int(index_version or 0), json.dumps(options, sort_keys=True, default=str))
+
+    def normalize_query(self, query: str) -> str:
+        """Function to return the normalized form of a query (lower case, single spaces, no final punctuation)"""
+        return self.NORMALIZE_SPACES.sub(" ", query).strip().rstrip(self.TRAILING_PUNCTUATION).lower()
+
+    def forget(self, key: tuple):
+        """Function to remove an entry from both tiers (within the lock)"""
+        self.entries.pop(key, None)
+
+        scope_vectors = self.scope_vectors.get(key[0])
+        if scope_vectors is not None:
+            scope_vectors.pop(key, None)
+            if len(scope_vectors) == 0:
+                del self.scope_vectors[key[0]]
+
+    def check_project_version(self, scope: tuple):
+        """Function to drop the answers of the older index versions of a project
+        when a newer version is seen (within the lock)"""
+        project_id, index_version, _ = scope
+        if index_version <= self.project_versions.get(project_id, -1):
+            return
+
+        self.project_versions[project_id] = index_version
+
+        for key in [ key for key in self.entries if key[0][0] == project_id and key[0][1] < index_version ]:
+            self.forget(key)
+
+    def is_expired(self, entry: dict) -> bool:
+        """Function to check if an entry is older than the ttl"""
+        return self.ttl_seconds is not None and time.time() - entry["created_at"] > self.ttl_seconds
+
+    def get_exact(self, scope: tuple, query: str, count_miss: bool = True):
+        """
+        Retrieve the cached answer of the same (normalized) query.
+
+        Args:
+            scope (tuple): The scope created by create_scope.
+            query (str): The query text.
+            count_miss (bool): Whether a miss is counted, False when the semantic tier is looked up next
+                               (it counts the miss). Defaults to True.
+
+        Returns:
+            dict or None: The cached entry ("answer", "full_prompt", "chat_history") or None.
+        """
+        key = (scope, self.normalize_query(query))
+
+        with self.lock:
+            self.check_project_version(scope)
+
+            entry = self.entries.get(key)
+            if entry is not None and self.is_expired(entry):
+                self.forget(key)
+                entry = None
+
+            if entry is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.exact_hits += 1
+
+            return entry
+
+    def get_similar(self, scope: tuple, vector: list):
+        """
+        Retrieve the cached answer of the most similar query of the scope (semantic tier).
+
+        Args:
+            scope (tuple): The scope created by create_scope.
+            vector (list): The embedding of the query.
+
+        Returns:
+            dict or None: The cached entry or None if no cached query is similar enough.
+        """
+        with self.lock:
+            scope_vectors = self.scope_vectors.get(scope)
+            if not self.semantic_enabled or vector is None or not scope_vectors:
+                self.misses += 1
+                return None
+
+            keys = list(scope_vectors.keys())
+            similarities = np.stack([ scope_vectors[key] for key in keys ]) @ self.to_unit_vector(vector)
+
+            best = int(np.argmax(similarities))
+            entry = self.entries.get(keys[best])
+
+            if similarities[best] < self.similarity_threshold or entry is None or self.is_expired(entry):
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(keys[best])
+            self.semantic_hits += 1
+
+            return entry
+
+    def set(self, scope: tuple, query: str, answer: str, full_prompt: str = None,
+            chat_history: list = None, vector: list = None):
+        """
+        Store an answer in both tiers.
+
+        Args:
+            scope (tuple): The scope created by create_scope.
+            query (str): The query text.
+            answer (str): The generated answer.
+            full_prompt (str, optional): The prompt sent to the generation model. Defaults to None.
+            chat_history (list, optional): The chat history sent to the generation model. Defaults to None.
+            vector (list, optional): The embedding of the query (semantic tier). Defaults to None.
+        """
+        key = (scope, self.normalize_query(query))
+
+        with self.lock:
+            self.check_project_version(scope)
+
+            # the answer was generated for an older index version (the project changed meanwhile)
+            if scope[1] < self.project_versions[scope[0]]:
+                return
+
+            self.forget(key)
+            self.entries[key] = {
+                "answer": answer,
+                "full_prompt": full_prompt,
+                "chat_history": chat_history,
+                "created_at": time.time(),
+            }
+
+            if self.semantic_enabled and vector is not None:
+                self.scope_vectors.setdefault(scope, {})[key] = self.to_unit_vector(vector)
+
+            while len(self.entries) > self.max_items:
+                self.forget(next(iter(self.entries)))
+
+    @staticmethod
+    def to_unit_vector(vector: list):
+        """Function to convert a vector to a float32 unit vector (the dot product is the cosine similarity)"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get_stats(self) -> dict:
+        """Function to return the hit/miss counters of the cache"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "items": len(self.entries),
+            "max_items": self.max_items,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+
+class CachedEmbeddingClient:
+    """
+    Wrapper around an embedding provider (LLMInterface) that serves repeated texts from an EmbeddingCache.
+
+    Only the embedding functions are intercepted, any other attribute (embedding_size,
+    get_embedding_input, set_embedding_model, ...) is forwarded to the wrapped provider.
+    """
+
+    def __init__(self, client, cache, backend: str):
+        """
+        Initialize the wrapper.
+
+        Args:
+            client: The embedding provider to wrap.
+            cache (EmbeddingCache): The cache used to store the vectors.
+            backend (str): The name of the embedding backend (part of the cache key).
+        """
+        self.client = client
+        self.cache = cache
+        self.backend = backend
+
+        self.logger = logging.getLogger(__name__)
+
+    def __getattr__(self, name: str):
+        # called only for attributes that are not defined on the wrapper
+        return getattr(self.client, name)
+
+    def create_cache_keys(self, texts: list, document_type: str = None):
+        """Function to create the cache keys of texts for the current embedding model
+        (from the texts as the provider embeds them, so two texts share a key only if they share a vector)"""
+        return [
+            self.cache.create_key(
+                backend=self.backend,
+                model_id=self.client.embedding_model_id,
+                embedding_size=self.client.embedding_size,
+                document_type=document_type,
+                text=self.client.get_embedding_input(text),
+            )
+            for text in texts
+        ]
+
+    def embed_text(self, text: str, document_type: str = None):
+        """Function to get embedding vector of giving text"""
+        vectors = self.embed_texts(texts=[text], document_type=document_type)
+
+        if not vectors:
+            return None
+
+        return vectors[0]
+
+    def embed_texts(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts, only the texts
+        that are not cached are sent to the provider"""
+        keys = self.create_cache_keys(texts=texts, document_type=document_type)
+        vectors = self.cache.get_many(keys)
+
+        missing = [ i for i, vector in enumerate(vectors) if vector is None ]
+        if len(missing) == 0:
+            return vectors
+
+        missing_vectors = self.client.embed_texts(
+            texts=[ texts[i] for i in missing ],
+            document_type=document_type,
+        )
+
+        if missing_vectors is None:
+            return None
+
+        new_items = {}
+        for i, vector in zip(missing, missing_vectors):
+            vectors[i] = vector
+            if vector is not None:
+                new_items[keys[i]] = vector
+
+        self.cache.set_many(new_items)
+
+        return vectors
+
+    async def embed_text_async(self, text: str, document_type: str = None):
+        """Function to get embedding vector of giving text without blocking the event loop"""
+        vectors = await self.embed_texts_async(texts=[text], document_type=document_type)
+
+        if not vectors:
+            return None
+
+        return vectors[0]
+
+    async def embed_texts_async(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts without blocking the event loop,
+        the disk tier of the cache is accessed in a worker thread"""
+        keys = self.create_cache_keys(texts=texts, document_type=document_type)
+        vectors = await asyncio.to_thread(self.cache.get_many, keys)
+
+        missing = [ i for i, vector in enumerate(vectors) if vector is None ]
+        if len(missing) == 0:
+            return vectors
+
+        missing_vectors = await self.client.embed_texts_async(
+            texts=[ texts[i] for i in missing ],
+            document_type=document_type,
+        )
+
+        if missing_vectors is None:
+            return None
+
+        new_items = {}
+        for i, vector in zip(missing, missing_vectors):
+            vectors[i] = vector
+            if vector is not None:
+                new_items[keys[i]] = vector
+
+        await asyncio.to_thread(self.cache.set_many, new_items)
+
+        return vectors
@@ -0,0 +1,182 @@
+from collections import OrderedDict
+from array import array
+import threading
+import hashlib
+import sqlite3
+import logging
+import os
+
+class EmbeddingCache:
+    """
+    Content-addressed cache for embedding vectors with two tiers:
+    a bounded in-memory LRU (per process) and a persistent SQLite store on disk,
+    bounded too (the least recently written vectors are evicted).
+
+    The key of each vector is a hash of everything that affects the vector
+    (backend, model id, embedding size, document type and the processed text),
+    so the same text embedded by another model never hits a stale vector.
+    """
+
+    # the disk tier is trimmed to this fraction of its limit, so the eviction does not run on every write
+    DISK_EVICTION_TARGET = 0.9
+
+    def __init__(self, db_path: str, max_items: int = 10000, max_disk_items: int = 1000000):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path (str): The directory where the SQLite file of the disk tier is stored.
+            max_items (int): The maximum number of vectors kept in memory. Defaults to 10000.
+            max_disk_items (int): The maximum number of vectors kept on disk, 0 for no limit. Defaults to 1000000.
+        """
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        # hit/miss counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db_file = os.path.join(db_path, "embeddings.sqlite3")
+        self.connection = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self.connection.commit()
+
+        # upper estimate of the rows on disk (a replaced key is counted twice), recounted before evicting
+        self.disk_items = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def create_key(backend: str, model_id: str, embedding_size: int,
+                   document_type: str, text: str) -> str:
+        """Function to create the cache key of a text for a specific embedding model"""
+        raw_key = "\x1f".join([
+            str(backend), str(model_id), str(embedding_size), str(document_type or ""), text
+        ])
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def remember(self, key: str, vector: list):
+        """Function to put a vector in the memory tier and evict the least recently used ones"""
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys: list) -> list:
+        """
+        Retrieve the cached vectors of the giving keys.
+
+        Args:
+            keys (list): The cache keys to look up.
+
+        Returns:
+            list: The vectors in the same order of the keys (None for the keys that are not cached).
+        """
+        vectors = [None] * len(keys)
+        missing = {}
+
+        with self.lock:
+            # step1: look up in memory
+            for idx, key in enumerate(keys):
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    vectors[idx] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(idx)
+
+            # step2: look up the remaining keys on disk (sqlite limits the number of query variables)
+            missing_keys = list(missing.keys())
+            for i in range(0, len(missing_keys), 500):
+                batch_keys = missing_keys[i:i+500]
+                try:
+                    rows = self.connection.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch_keys))})",
+                        batch_keys,
+                    ).fetchall()
+                except sqlite3.Error as e:
+                    self.logger.error(f"Error while reading embedding cache: {e}")
+                    rows = []
+
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    self.remember(key, vector)
+                    for idx in missing.pop(key):
+                        vectors[idx] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(ids) for ids in missing.values())
+
+        return vectors
+
+    def set_many(self, items: dict):
+        """
+        Store vectors in both tiers.
+
+        Args:
+            items (dict): A mapping between cache keys and their vectors.
+        """
+        if not items:
+            return
+
+        with self.lock:
+            for key, vector in items.items():
+                self.remember(key, vector)
+
+            try:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [ (key, array("f", vector).tobytes()) for key, vector in items.items() ],
+                )
+                self.disk_items += len(items)
+                self.evict_disk_items()
+                self.connection.commit()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error while writing embedding cache: {e}")
+
+    def evict_disk_items(self):
+        """Function to delete the least recently written vectors from the disk tier when it exceeds
+        its limit (within the lock), a written row gets a new rowid so the oldest rows come first"""
+        if not self.max_disk_items or self.disk_items <= self.max_disk_items:
+            return 0
+
+        self.disk_items = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self.disk_items <= self.max_disk_items:
+            return 0
+
+        evicted_count = self.disk_items - int(self.max_disk_items * self.DISK_EVICTION_TARGET)
+        self.connection.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+            (evicted_count,),
+        )
+        self.disk_items -= evicted_count
+
+        return evicted_count
+
+    def get_stats(self) -> dict:
+        """Function to return the hit/miss counters of the cache"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_items": len(self.memory),
+            "max_memory_items": self.max_items,
+            "disk_items": self.disk_items,
+            "max_disk_items": self.max_disk_items,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        """Function to close the disk tier"""
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,3 @@
+from .EmbeddingCache import EmbeddingCache
+from .CachedEmbeddingClient import CachedEmbeddingClient
+from .AnswerCache import AnswerCache
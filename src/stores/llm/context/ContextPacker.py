@@ -0,0 +1,180 @@
+import logging
+
+class ContextPacker:
+    """
+    Selects the text of the retrieved documents that is sent to the generation model.
+
+    The documents are added in score order while they fit in a token budget (the context size
+    of the model minus the answer tokens and the fixed parts of the prompt: system prompt,
+    footer with the question and the template of each document), so the question is never cut.
+    The text that a document shares with the one packed before it (the overlap between adjacent
+    chunks of the splitter) is removed, and the packing stops early when the scores drop.
+    """
+
+    # shorter common prefixes / suffixes are considered a coincidence, not a chunk overlap
+    MIN_OVERLAP_CHARACTERS = 16
+
+    # a document is cut to fit the remaining budget only if this many tokens are left for it
+    MIN_DOCUMENT_TOKENS = 32
+
+    def __init__(self, estimate_tokens, context_size: int, max_output_tokens: int = None,
+                 max_context_tokens: int = None, min_score: float = None, max_score_gap: float = None,
+                 max_overlap_characters: int = 200):
+        """
+        Initialize the packer.
+
+        Args:
+            estimate_tokens (callable): Function that returns the number of tokens of a text.
+            context_size (int): The context size (tokens) of the generation model.
+            max_output_tokens (int, optional): The tokens reserved for the answer. Defaults to None (0).
+            max_context_tokens (int, optional): A lower limit of the tokens of the documents (to cut the cost
+                                                and latency of the prompts). Defaults to None (no limit).
+            min_score (float, optional): The documents with a lower score are not packed. Defaults to None.
+            max_score_gap (float, optional): Stop at a document whose score is lower than the previous one
+                                             by more than this fraction of the best score. Defaults to None.
+            max_overlap_characters (int): The longest overlap searched between two documents, at least
+                                          the overlap_size used to split the files. Defaults to 200.
+        """
+        self.estimate_tokens = estimate_tokens
+        self.context_size = context_size
+        self.max_output_tokens = max_output_tokens or 0
+        self.max_context_tokens = max_context_tokens
+        self.min_score = min_score
+        self.max_score_gap = max_score_gap
+        self.max_overlap_characters = max_overlap_characters
+
+        self.logger = logging.getLogger(__name__)
+
+    def get_budget(self, fixed_tokens: int):
+        """Function to return the number of tokens available for the documents"""
+        budget = self.context_size - self.max_output_tokens - fixed_tokens
+
+        if self.max_context_tokens is not None:
+            budget = min(budget, self.max_context_tokens)
+
+        return max(0, budget)
+
+    def get_overlap(self, first: str, second: str):
+        """Function to return the length of the longest end of the first text that starts the second one"""
+        longest = min(self.max_overlap_characters, len(first), len(second))
+        if longest < self.MIN_OVERLAP_CHARACTERS:
+            return 0
+
+        # an overlap starts where the first characters of the second text occur in the end of the first one,
+        # only these positions are verified (the first match from the left is the longest overlap)
+        tail = first[-longest:]
+        prefix = second[:self.MIN_OVERLAP_CHARACTERS]
+
+        position = tail.find(prefix)
+        while position != -1:
+            if second.startswith(tail[position:]):
+                return longest - position
+
+            position = tail.find(prefix, position + 1)
+
+        return 0
+
+    def remove_overlaps(self, text: str, packed_texts: list):
+        """Function to remove from a text the parts it shares with the packed texts: a text fully
+        contained in one of them is skipped (None), and the overlap at its ends is removed
+        against the text packed just before it"""
+        if any(text in packed_text for packed_text in packed_texts):
+            return None
+
+        if not packed_texts:
+            return text
+
+        previous_text = packed_texts[-1]
+
+        # the document continues the previous one
+        overlap = self.get_overlap(previous_text, text)
+        if overlap:
+            text = text[overlap:].lstrip()
+
+        # the document precedes the previous one
+        overlap = self.get_overlap(text, previous_text)
+        if overlap:
+            text = text[:-overlap].rstrip()
+
+        return text or None
+
+    def cut_to_tokens(self, text: str, max_tokens: int):
+        """Function to cut a text (at a word boundary) so it fits in a number of tokens"""
+        if self.estimate_tokens(text) <= max_tokens:
+            return text
+
+        # start from the average characters per token of this text, then shrink
+        length = int(len(text) * max_tokens / max(1, self.estimate_tokens(text)))
+        while length > 0 and self.estimate_tokens(text[:length]) > max_tokens:
+            length = int(length * 0.9)
+
+        cut = text[:length]
+        if " " in cut:
+            cut = cut[:cut.rindex(" ")]
+
+        return cut.rstrip()
+
+    def pack(self, documents: list, fixed_tokens: int = 0, document_overhead_tokens: int = 0):
+        """
+        Select the documents (and their text) that fit in the budget.
+
+        Args:
+            documents (list): The retrieved documents (with text and score).
+            fixed_tokens (int): The tokens of the parts of the prompt that are always sent
+                                (system prompt, footer with the question). Defaults to 0.
+            document_overhead_tokens (int): The tokens added by the template of each document. Defaults to 0.
+
+        Returns:
+            tuple: The packed texts (in score order) and the packing stats (dict).
+        """
+        budget = self.get_budget(fixed_tokens=fixed_tokens)
+        documents = sorted(documents, key=lambda doc: doc.score, reverse=True)
+
+        packed_texts, used_tokens, stop_reason = [], 0, None
+        best_score = documents[0].score if documents else None
+        previous_score = best_score
+
+        for doc in documents:
+            if self.min_score is not None and doc.score < self.min_score:
+                stop_reason = "min_score"
+                break
+
+            if self.max_score_gap is not None and best_score and \
+                    (previous_score - doc.score) > self.max_score_gap * abs(best_score):
+                stop_reason = "score_gap"
+                break
+
+            previous_score = doc.score
+
+            text = self.remove_overlaps(doc.text.strip(), packed_texts)
+            if text is None:
+                continue
+
+            available_tokens = budget - used_tokens - document_overhead_tokens
+            text_tokens = self.estimate_tokens(text)
+
+            if text_tokens > available_tokens:
+                # the best document is always sent (cut), the others only if enough budget is left
+                if available_tokens < self.MIN_DOCUMENT_TOKENS and packed_texts:
+                    stop_reason = "budget"
+                    break
+
+                text = self.cut_to_tokens(text, max_tokens=max(1, available_tokens))
+                text_tokens = self.estimate_tokens(text)
+                stop_reason = "budget"
+
+            packed_texts.append(text)
+            used_tokens += text_tokens + document_overhead_tokens
+
+            if stop_reason:
+                break
+
+        stats = {
+            "budget_tokens": budget,
+            "context_tokens": used_tokens,
+            "retrieved_documents": len(documents),
+            "packed_documents": len(packed_texts),
+            "stop_reason": stop_reason,
+        }
+
+        return packed_texts, stats
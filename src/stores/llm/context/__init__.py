@@ -0,0 +1 @@
+from .ContextPacker import ContextPacker
@@ -1,18 +1,31 @@
 from ..LLMInterface import LLMInterface
 from ..LLMEnums import CoHereEnums, DocumentTypeEnum
 import cohere
+import asyncio
 import logging
+from helpers.metrics import track_latency
 
 class CoHereProvider(LLMInterface):
     """Class for Cohere model (generation or embedding)"""
     def __init__(self, api_key: str,
                        default_input_max_characters: int=1000,
                        default_generation_max_output_tokens: int=1000,
-                       default_generation_temperature: float=0.1):
+                       default_generation_temperature: float=0.1,
+                       embedding_max_batch_size: int=96,
+                       embedding_max_batch_tokens: int=None,
+                       embedding_max_concurrency: int=4,
+                       request_timeout: float=60,
+                       http_client=None):
         """Function to set needed paramter for open AI model and initiate a client for the model"""
 
         self.api_key = api_key
 
+        # limits of one embedding request (number of inputs and total tokens)
+        self.embedding_max_batch_size = embedding_max_batch_size
+        self.embedding_max_batch_tokens = embedding_max_batch_tokens
+        # number of embedding requests that could run at the same time (async only)
+        self.embedding_max_concurrency = embedding_max_concurrency
+
         self.default_input_max_characters = default_input_max_characters
         self.default_generation_max_output_tokens = default_generation_max_output_tokens
         self.default_generation_temperature = default_generation_temperature
@@ -24,7 +37,12 @@ class CoHereProvider(LLMInterface):
         self.embedding_model_id = None
         self.embedding_size = None
 
-        self.client = cohere.Client(api_key=self.api_key)
+        self.client = cohere.Client(api_key=self.api_key, timeout=request_timeout)
+
+        # async client used by the api routes, it shares the keep-alive connection pool (http_client)
+        # with the other providers created by the same factory
+        self.async_client = cohere.AsyncClient(api_key=self.api_key, timeout=request_timeout,
+                                               httpx_client=http_client)
 
         self.enums = CoHereEnums
         self.logger = logging.getLogger(__name__)
@@ -42,12 +60,12 @@ class CoHereProvider(LLMInterface):
         """Function to do needed preprocessing for text before use it"""
         return text[:self.default_input_max_characters].strip()
 
-    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
-                            temperature: float = None):
-        """Function to generate new text giving a query and chat history"""
-        
+    def prepare_generation_request(self, client, prompt: str, chat_history: list,
+                                         max_output_tokens: int, temperature: float):
+        """Function to validate the generation setup and build the arguments of the chat request"""
+
         # check if the model client didn't setup correctly
-        if not self.client:
+        if not client:
             self.logger.error("CoHere client was not set")
             return None
 
@@ -55,63 +73,245 @@ class CoHereProvider(LLMInterface):
         if not self.generation_model_id:
             self.logger.error("Generation model for CoHere was not set")
             return None
-        
+
         # setup the max output token length / temp if it'nt the same as the one setted in the clearation of class object
         max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
         temperature = temperature if temperature else self.default_generation_temperature
 
-        # generate response using llm model
-        response = self.client.chat(
-            model = self.generation_model_id,
-            chat_history = chat_history,
-            message = self.process_text(prompt),
-            temperature = temperature,
-            max_tokens = max_output_tokens
-        )
+        return {
+            "model": self.generation_model_id,
+            "chat_history": chat_history,
+            # the prompt is not cut, the documents are already packed within the context size (the question is kept)
+            "message": prompt.strip(),
+            "temperature": temperature,
+            "max_tokens": max_output_tokens,
+        }
+
+    def parse_generation_response(self, response):
+        """Function to extract the generated text from the chat response"""
 
         # if the model does not return a response or it was empty
         if not response or not response.text:
             self.logger.error("Error while generating text with CoHere")
             return None
-        
+
         # return the response if everyyhing went well
         return response.text
-    
+
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                            temperature: float = None):
+        """Function to generate new text giving a query and chat history"""
+
+        request = self.prepare_generation_request(client=self.client, prompt=prompt, chat_history=chat_history,
+                                                  max_output_tokens=max_output_tokens, temperature=temperature)
+        if request is None:
+            return None
+
+        # generate response using llm model
+        response = self.client.chat(**request)
+
+        return self.parse_generation_response(response)
+
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    async def generate_text_async(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                        temperature: float = None):
+        """Function to generate new text giving a query and chat history without blocking the event loop"""
+
+        request = self.prepare_generation_request(client=self.async_client, prompt=prompt, chat_history=chat_history,
+                                                  max_output_tokens=max_output_tokens, temperature=temperature)
+        if request is None:
+            return None
+
+        # generate response using llm model
+        response = await self.async_client.chat(**request)
+
+        return self.parse_generation_response(response)
+
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    async def generate_text_stream(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                         temperature: float = None):
+        """Function to generate new text giving a query and chat history, yielding the text piece by piece"""
+
+        request = self.prepare_generation_request(client=self.async_client, prompt=prompt, chat_history=chat_history,
+                                                  max_output_tokens=max_output_tokens, temperature=temperature)
+        if request is None:
+            return
+
+        # generate response using llm model (the response is a stream of events)
+        async for event in self.async_client.chat_stream(**request):
+            if event.event_type == "text-generation" and event.text:
+                yield event.text
+
     def embed_text(self, text: str, document_type: str = None):
         """Function to get embedding vector of giving text"""
 
+        vectors = self.embed_texts(texts=[text], document_type=document_type)
+
+        if not vectors:
+            return None
+
+        return vectors[0]
+
+    async def embed_text_async(self, text: str, document_type: str = None):
+        """Function to get embedding vector of giving text without blocking the event loop"""
+
+        vectors = await self.embed_texts_async(texts=[text], document_type=document_type)
+
+        if not vectors:
+            return None
+
+        return vectors[0]
+
+    def get_embedding_input(self, text: str):
+        """Function to return the text exactly as it's sent to the embedding model"""
+        return self.process_text(text)
+
+    def prepare_embedding_batches(self, client, texts: list):
+        """Function to validate the embedding setup then process the texts and split them to batches"""
+
         # check if the model client didn't setup correctly
-        if not self.client:
+        if not client:
             self.logger.error("CoHere client was not set")
-            return None
-        
+            return None, None
+
         # check if the model id didn't assign correctly
         if not self.embedding_model_id:
             self.logger.error("Embedding model for CoHere was not set")
+            return None, None
+
+        processed_texts = [ self.get_embedding_input(text) for text in texts ]
+
+        batches = self.create_text_batches(
+            texts=processed_texts,
+            max_batch_size=self.embedding_max_batch_size,
+            max_batch_tokens=self.embedding_max_batch_tokens,
+        )
+
+        return processed_texts, batches
+
+    def get_input_type(self, document_type: str):
+        """Function to map the giving text type to the CoHere input type"""
+        return CoHereEnums.QUERY.value if document_type == DocumentTypeEnum.QUERY.value else CoHereEnums.DOCUMENT.value
+
+    @track_latency("embedding", model=lambda self: self.embedding_model_id, items=lambda args: len(args["texts"] or []))
+    def embed_texts(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts using as few requests as possible,
+        the result keeps the order of the giving texts (None in place of any text that failed)"""
+
+        processed_texts, batches = self.prepare_embedding_batches(client=self.client, texts=texts)
+        if processed_texts is None:
             return None
-        
+
         # setup document type
-        input_type = CoHereEnums.QUERY if document_type == DocumentTypeEnum.QUERY else CoHereEnums.DOCUMENT
-
-        # generate embeddings using llm model
-        response = self.client.embed(
-            model = self.embedding_model_id,
-            texts = [self.process_text(text)],
-            input_type = input_type,
-            embedding_types=['float'],
-        )
+        input_type = self.get_input_type(document_type=document_type)
+        vectors = [None] * len(processed_texts)
+
+        for batch in batches:
+            batch_vectors = self.embed_batch(texts=[ processed_texts[i] for i in batch ],
+                                             input_type=input_type)
+
+            # if the whole batch failed, retry text by text so one bad input does not drop the others
+            if batch_vectors is None and len(batch) > 1:
+                batch_vectors = [
+                    (self.embed_batch(texts=[processed_texts[i]], input_type=input_type) or [None])[0]
+                    for i in batch
+                ]
+
+            if batch_vectors is None:
+                continue
+
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+        return vectors
+
+    @track_latency("embedding", model=lambda self: self.embedding_model_id, items=lambda args: len(args["texts"] or []))
+    async def embed_texts_async(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts without blocking the event loop,
+        batches are sent concurrently (up to embedding_max_concurrency requests at the same time)"""
+
+        processed_texts, batches = self.prepare_embedding_batches(client=self.async_client, texts=texts)
+        if processed_texts is None:
+            return None
+
+        # setup document type
+        input_type = self.get_input_type(document_type=document_type)
+        vectors = [None] * len(processed_texts)
+        semaphore = asyncio.Semaphore(self.embedding_max_concurrency)
+
+        async def embed_one_batch(batch: list):
+            async with semaphore:
+                batch_vectors = await self.embed_batch_async(texts=[ processed_texts[i] for i in batch ],
+                                                             input_type=input_type)
+
+                # if the whole batch failed, retry text by text so one bad input does not drop the others
+                if batch_vectors is None and len(batch) > 1:
+                    batch_vectors = [
+                        ((await self.embed_batch_async(texts=[processed_texts[i]], input_type=input_type)) or [None])[0]
+                        for i in batch
+                    ]
+
+            if batch_vectors is None:
+                return
+
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+        await asyncio.gather(*[ embed_one_batch(batch) for batch in batches ])
+
+        return vectors
+
+    def parse_embedding_response(self, response, texts: list):
+        """Function to extract the embedding vectors (in the order of the giving texts) from the response"""
 
         # if the model does not return a response or it was empty
         if not response or not response.embeddings or not response.embeddings.float:
             self.logger.error("Error while embedding text with CoHere")
             return None
-        
+
+        if len(response.embeddings.float) != len(texts):
+            self.logger.error("CoHere returned a different number of embeddings than the giving texts")
+            return None
+
         # return the response if everyyhing went well
-        return response.embeddings.float[0]
-    
+        return response.embeddings.float
+
+    def embed_batch(self, texts: list, input_type: str):
+        """Function to embed one batch of texts in a single request"""
+        try:
+            # generate embeddings using llm model
+            response = self.client.embed(
+                model = self.embedding_model_id,
+                texts = texts,
+                input_type = input_type,
+                embedding_types=['float'],
+            )
+        except Exception as e:
+            self.logger.error(f"Error while embedding batch with CoHere: {e}")
+            return None
+
+        return self.parse_embedding_response(response=response, texts=texts)
+
+    async def embed_batch_async(self, texts: list, input_type: str):
+        """Function to embed one batch of texts in a single request without blocking the event loop"""
+        try:
+            # generate embeddings using llm model
+            response = await self.async_client.embed(
+                model = self.embedding_model_id,
+                texts = texts,
+                input_type = input_type,
+                embedding_types=['float'],
+            )
+        except Exception as e:
+            self.logger.error(f"Error while embedding batch with CoHere: {e}")
+            return None
+
+        return self.parse_embedding_response(response=response, texts=texts)
+
     def construct_prompt(self, prompt: str, role: str):
         """Function to build required prompt format for the model history"""
         return {
             "role": role,
             "text": prompt
-        }
\ No newline at end of file
+        }
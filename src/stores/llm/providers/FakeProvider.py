@@ -0,0 +1,194 @@
+from ..LLMInterface import LLMInterface
+from ..LLMEnums import OpenAIEnums
+import numpy as np
+import asyncio
+import logging
+import zlib
+import time
+import re
+from helpers.metrics import track_latency
+
+class FakeProvider(LLMInterface):
+    """
+    Offline provider (generation or embedding) for the benchmarks and local runs without api keys.
+
+    The embeddings are deterministic: the hashed words of a text (feature hashing) projected to
+    embedding_size dimensions and normalized, so the texts sharing words are close and the searches
+    return meaningful results. The answer is built from the prompt. An optional latency per request
+    simulates the network and model time of a real provider.
+    """
+    WORD_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, default_input_max_characters: int=1000,
+                       default_generation_max_output_tokens: int=1000,
+                       default_generation_temperature: float=0.1,
+                       embedding_max_batch_size: int=2048,
+                       embedding_latency: float=0.0,
+                       generation_latency: float=0.0):
+        """Function to set needed paramter for the fake model (latency in seconds per request)"""
+        # limit of one embedding request (number of inputs)
+        self.embedding_max_batch_size = embedding_max_batch_size
+
+        self.embedding_latency = embedding_latency
+        self.generation_latency = generation_latency
+
+        self.default_input_max_characters = default_input_max_characters
+        self.default_generation_max_output_tokens = default_generation_max_output_tokens
+        self.default_generation_temperature = default_generation_temperature
+
+        # generation model
+        self.generation_model_id = None
+
+        # embedding model
+        self.embedding_model_id = None
+        self.embedding_size = None
+
+        # same chat roles as Open AI
+        self.enums = OpenAIEnums
+        self.logger = logging.getLogger(__name__)
+
+    def set_generation_model(self, model_id: str):
+        """Function to set model id for generation tasks"""
+        self.generation_model_id = model_id
+
+    def set_embedding_model(self, model_id: str, embedding_size: int):
+        """Function to set model id for embedding tasks"""
+        self.embedding_model_id = model_id
+        self.embedding_size = embedding_size
+
+    def process_text(self, text: str):
+        """Function to do needed preprocessing for text before use it"""
+        return text[:self.default_input_max_characters].strip()
+
+    def create_answer(self, prompt: str, max_output_tokens: int=None):
+        """Function to build a deterministic answer from the words of the prompt"""
+        if not self.generation_model_id:
+            self.logger.error("Generation model for Fake provider was not set")
+            return None
+
+        max_output_tokens = max_output_tokens or self.default_generation_max_output_tokens
+        words = self.WORD_PATTERN.findall(self.process_text(prompt))
+
+        return " ".join(words[:max_output_tokens])
+
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                            temperature: float = None):
+        """Function to generate new text giving a query and chat history"""
+        if self.generation_latency:
+            time.sleep(self.generation_latency)
+
+        return self.create_answer(prompt=prompt, max_output_tokens=max_output_tokens)
+
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    async def generate_text_async(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                        temperature: float = None):
+        """Function to generate new text giving a query and chat history without blocking the event loop"""
+        if self.generation_latency:
+            await asyncio.sleep(self.generation_latency)
+
+        return self.create_answer(prompt=prompt, max_output_tokens=max_output_tokens)
+
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    async def generate_text_stream(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                         temperature: float = None):
+        """Function to generate new text giving a query and chat history, yielding the text piece by piece"""
+        answer = await self.generate_text_async(prompt=prompt, chat_history=chat_history,
+                                                max_output_tokens=max_output_tokens, temperature=temperature)
+        if answer is None:
+            return
+
+        for idx, word in enumerate(answer.split(" ")):
+            yield word if idx == 0 else " " + word
+
+    def create_embedding(self, text: str):
+        """Function to return the normalized hashed bag of words of a text"""
+        vector = np.zeros(self.embedding_size, dtype=np.float32)
+
+        for word in self.WORD_PATTERN.findall(text.lower()):
+            word_hash = zlib.crc32(word.encode("utf-8"))
+            # the highest bit of the (32 bits) hash gives the sign, so the collisions cancel out instead of
+            # adding up (the bucket depends on the low bits, with an even size the lowest bit as well)
+            vector[word_hash % self.embedding_size] += 1.0 if (word_hash >> 31) & 1 else -1.0
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+
+        return (vector / norm).tolist()
+
+    def embed_text(self, text: str, document_type: str = None):
+        """Function to get embedding vector of giving text"""
+
+        vectors = self.embed_texts(texts=[text], document_type=document_type)
+
+        if not vectors:
+            return None
+
+        return vectors[0]
+
+    async def embed_text_async(self, text: str, document_type: str = None):
+        """Function to get embedding vector of giving text without blocking the event loop"""
+
+        vectors = await self.embed_texts_async(texts=[text], document_type=document_type)
+
+        if not vectors:
+            return None
+
+        return vectors[0]
+
+    def get_embedding_input(self, text: str):
+        """Function to return the text exactly as it's sent to the embedding model"""
+        return self.process_text(text)
+
+    def prepare_embedding_batches(self, texts: list):
+        """Function to validate the embedding setup then process the texts and split them to batches"""
+
+        # check if the model id didn't assign correctly
+        if not self.embedding_model_id or not self.embedding_size:
+            self.logger.error("Embedding model for Fake provider was not set")
+            return None, None
+
+        processed_texts = [ self.get_embedding_input(text) for text in texts ]
+
+        batches = self.create_text_batches(
+            texts=processed_texts,
+            max_batch_size=self.embedding_max_batch_size,
+        )
+
+        return processed_texts, batches
+
+    @track_latency("embedding", model=lambda self: self.embedding_model_id, items=lambda args: len(args["texts"] or []))
+    def embed_texts(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts (one simulated request per batch)"""
+
+        processed_texts, batches = self.prepare_embedding_batches(texts=texts)
+        if processed_texts is None:
+            return None
+
+        if self.embedding_latency:
+            time.sleep(self.embedding_latency * len(batches))
+
+        return [ self.create_embedding(text) for text in processed_texts ]
+
+    @track_latency("embedding", model=lambda self: self.embedding_model_id, items=lambda args: len(args["texts"] or []))
+    async def embed_texts_async(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts without blocking the event loop
+        (the simulated requests of the batches run concurrently)"""
+
+        processed_texts, batches = self.prepare_embedding_batches(texts=texts)
+        if processed_texts is None:
+            return None
+
+        if self.embedding_latency:
+            await asyncio.sleep(self.embedding_latency)
+
+        return [ self.create_embedding(text) for text in processed_texts ]
+
+    def construct_prompt(self, prompt: str, role: str):
+        """Function to build required prompt format for the model"""
+        return {
+            "role": role,
+            "content": prompt
+        }
@@ -1,18 +1,31 @@
 from ..LLMInterface import LLMInterface
 from ..LLMEnums import OpenAIEnums
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import asyncio
 import logging
+from helpers.metrics import track_latency
 
 class OpenAIProvider(LLMInterface):
     """Class for Open AI model (generation or embedding)"""
     def __init__(self, api_key: str, base_url: str,
                        default_input_max_characters: int=1000,
                        default_generation_max_output_tokens: int=1000,
-                       default_generation_temperature: float=0.1):
+                       default_generation_temperature: float=0.1,
+                       embedding_max_batch_size: int=2048,
+                       embedding_max_batch_tokens: int=300000,
+                       embedding_max_concurrency: int=4,
+                       request_timeout: float=60,
+                       http_client=None):
         """Function to set needed paramter for open AI model and initiate a client for the model"""
         self.api_key = api_key
         self.base_url = base_url
 
+        # limits of one embedding request (number of inputs and total tokens)
+        self.embedding_max_batch_size = embedding_max_batch_size
+        self.embedding_max_batch_tokens = embedding_max_batch_tokens
+        # number of embedding requests that could run at the same time (async only)
+        self.embedding_max_concurrency = embedding_max_concurrency
+
         self.default_input_max_characters = default_input_max_characters
         self.default_generation_max_output_tokens = default_generation_max_output_tokens
         self.default_generation_temperature = default_generation_temperature
@@ -27,8 +40,17 @@ class OpenAIProvider(LLMInterface):
 
         self.client = OpenAI(
             base_url = self.base_url if self.base_url and len(self.base_url) else None,
-            api_key = self.api_key
-            
+            api_key = self.api_key,
+            timeout = request_timeout,
+        )
+
+        # async client used by the api routes, it shares the keep-alive connection pool (http_client)
+        # with the other providers created by the same factory
+        self.async_client = AsyncOpenAI(
+            base_url = self.base_url if self.base_url and len(self.base_url) else None,
+            api_key = self.api_key,
+            timeout = request_timeout,
+            http_client = http_client,
         )
 
         self.enums = OpenAIEnums
@@ -47,12 +69,12 @@ class OpenAIProvider(LLMInterface):
         """Function to do needed preprocessing for text before use it"""
         return text[:self.default_input_max_characters].strip()
 
-    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
-                            temperature: float = None):
-        """Function to generate new text giving a query and chat history"""
-        
+    def prepare_generation_request(self, client, prompt: str, chat_history: list,
+                                         max_output_tokens: int, temperature: float):
+        """Function to validate the generation setup and build the arguments of the completion request"""
+
         # check if the model client didn't setup correctly
-        if not self.client:
+        if not client:
             self.logger.error("OpenAI client was not set")
             return None
 
@@ -60,7 +82,7 @@ class OpenAIProvider(LLMInterface):
         if not self.generation_model_id:
             self.logger.error("Generation model for OpenAI was not set")
             return None
-        
+
         # setup the max output token length / temp if it'nt the same as the one setted in the clearation of class object
         max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
         temperature = temperature if temperature else self.default_generation_temperature
@@ -70,13 +92,15 @@ class OpenAIProvider(LLMInterface):
             self.construct_prompt(prompt=prompt, role=OpenAIEnums.USER.value) # put the user query in the needed format as well
         )
 
-        # generate response using llm model
-        response = self.client.chat.completions.create(
-            model = self.generation_model_id,
-            messages = chat_history,
-            max_tokens = max_output_tokens,
-            temperature = temperature
-        )
+        return {
+            "model": self.generation_model_id,
+            "messages": chat_history,
+            "max_tokens": max_output_tokens,
+            "temperature": temperature,
+        }
+
+    def parse_generation_response(self, response):
+        """Function to extract the generated text from the completion response"""
 
         # if the model does not return a response or it was empty
         if not response or not response.choices or len(response.choices) == 0 or not response.choices[0].message:
@@ -86,33 +110,207 @@ class OpenAIProvider(LLMInterface):
         # return the response if everyyhing went well
         return response.choices[0].message.content
 
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    def generate_text(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                            temperature: float = None):
+        """Function to generate new text giving a query and chat history"""
+
+        request = self.prepare_generation_request(client=self.client, prompt=prompt, chat_history=chat_history,
+                                                  max_output_tokens=max_output_tokens, temperature=temperature)
+        if request is None:
+            return None
+
+        # generate response using llm model
+        response = self.client.chat.completions.create(**request)
+
+        return self.parse_generation_response(response)
+
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    async def generate_text_async(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                        temperature: float = None):
+        """Function to generate new text giving a query and chat history without blocking the event loop"""
+
+        request = self.prepare_generation_request(client=self.async_client, prompt=prompt, chat_history=chat_history,
+                                                  max_output_tokens=max_output_tokens, temperature=temperature)
+        if request is None:
+            return None
+
+        # generate response using llm model
+        response = await self.async_client.chat.completions.create(**request)
+
+        return self.parse_generation_response(response)
+
+    @track_latency("generation", model=lambda self: self.generation_model_id)
+    async def generate_text_stream(self, prompt: str, chat_history: list=[], max_output_tokens: int=None,
+                                         temperature: float = None):
+        """Function to generate new text giving a query and chat history, yielding the text piece by piece"""
+
+        request = self.prepare_generation_request(client=self.async_client, prompt=prompt, chat_history=chat_history,
+                                                  max_output_tokens=max_output_tokens, temperature=temperature)
+        if request is None:
+            return
+
+        # generate response using llm model (the response is a stream of deltas)
+        stream = await self.async_client.chat.completions.create(**request, stream=True)
+
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta:
+                continue
+
+            if chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
     def embed_text(self, text: str, document_type: str = None):
         """Function to get embedding vector of giving text"""
 
+        vectors = self.embed_texts(texts=[text], document_type=document_type)
+
+        if not vectors:
+            return None
+
+        return vectors[0]
+
+    async def embed_text_async(self, text: str, document_type: str = None):
+        """Function to get embedding vector of giving text without blocking the event loop"""
+
+        vectors = await self.embed_texts_async(texts=[text], document_type=document_type)
+
+        if not vectors:
+            return None
+
+        return vectors[0]
+
+    def get_embedding_input(self, text: str):
+        """Function to return the text exactly as it's sent to the embedding model
+        (as it is, not cut to default_input_max_characters)"""
+        return text
+
+    def prepare_embedding_batches(self, client, texts: list):
+        """Function to validate the embedding setup then process the texts and split them to batches"""
+
         # check if the model client didn't setup correctly
-        if not self.client:
+        if not client:
             self.logger.error("OpenAI client was not set")
-            return None
+            return None, None
 
         # check if the model id didn't assign correctly
         if not self.embedding_model_id:
             self.logger.error("Embedding model for OpenAI was not set")
-            return None
-        
-        # generate the embeddings using llm model
-        response = self.client.embeddings.create(
-            model = self.embedding_model_id,
-            input = text,
+            return None, None
+
+        processed_texts = [ self.get_embedding_input(text) for text in texts ]
+
+        batches = self.create_text_batches(
+            texts=processed_texts,
+            max_batch_size=self.embedding_max_batch_size,
+            max_batch_tokens=self.embedding_max_batch_tokens,
         )
 
+        return processed_texts, batches
+
+    @track_latency("embedding", model=lambda self: self.embedding_model_id, items=lambda args: len(args["texts"] or []))
+    def embed_texts(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts using as few requests as possible,
+        the result keeps the order of the giving texts (None in place of any text that failed)"""
+
+        processed_texts, batches = self.prepare_embedding_batches(client=self.client, texts=texts)
+        if processed_texts is None:
+            return None
+
+        vectors = [None] * len(processed_texts)
+
+        for batch in batches:
+            batch_vectors = self.embed_batch(texts=[ processed_texts[i] for i in batch ])
+
+            # if the whole batch failed, retry text by text so one bad input does not drop the others
+            if batch_vectors is None and len(batch) > 1:
+                batch_vectors = [
+                    (self.embed_batch(texts=[processed_texts[i]]) or [None])[0]
+                    for i in batch
+                ]
+
+            if batch_vectors is None:
+                continue
+
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+        return vectors
+
+    @track_latency("embedding", model=lambda self: self.embedding_model_id, items=lambda args: len(args["texts"] or []))
+    async def embed_texts_async(self, texts: list, document_type: str = None):
+        """Function to get embedding vectors of a list of texts without blocking the event loop,
+        batches are sent concurrently (up to embedding_max_concurrency requests at the same time)"""
+
+        processed_texts, batches = self.prepare_embedding_batches(client=self.async_client, texts=texts)
+        if processed_texts is None:
+            return None
+
+        vectors = [None] * len(processed_texts)
+        semaphore = asyncio.Semaphore(self.embedding_max_concurrency)
+
+        async def embed_one_batch(batch: list):
+            async with semaphore:
+                batch_vectors = await self.embed_batch_async(texts=[ processed_texts[i] for i in batch ])
+
+                # if the whole batch failed, retry text by text so one bad input does not drop the others
+                if batch_vectors is None and len(batch) > 1:
+                    batch_vectors = [
+                        ((await self.embed_batch_async(texts=[processed_texts[i]])) or [None])[0]
+                        for i in batch
+                    ]
+
+            if batch_vectors is None:
+                return
+
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+        await asyncio.gather(*[ embed_one_batch(batch) for batch in batches ])
+
+        return vectors
+
+    def parse_embedding_response(self, response, texts: list):
+        """Function to extract the embedding vectors (in the order of the giving texts) from the response"""
+
         # if the model does not return a response or it was empty
-        if not response or not response.data or len(response.data) == 0 or not response.data[0].embedding:
+        if not response or not response.data or len(response.data) != len(texts):
             self.logger.error("Error while embedding text with OpenAI")
             return None
 
-        # return the response if everyyhing went well
-        return response.data[0].embedding
+        # the items of response could be out of order, so sort them by their input index
+        return [
+            item.embedding
+            for item in sorted(response.data, key=lambda item: item.index)
+        ]
+
+    def embed_batch(self, texts: list):
+        """Function to embed one batch of texts in a single request"""
+        try:
+            # generate the embeddings using llm model
+            response = self.client.embeddings.create(
+                model = self.embedding_model_id,
+                input = texts,
+            )
+        except Exception as e:
+            self.logger.error(f"Error while embedding batch with OpenAI: {e}")
+            return None
+
+        return self.parse_embedding_response(response=response, texts=texts)
+
+    async def embed_batch_async(self, texts: list):
+        """Function to embed one batch of texts in a single request without blocking the event loop"""
+        try:
+            # generate the embeddings using llm model
+            response = await self.async_client.embeddings.create(
+                model = self.embedding_model_id,
+                input = texts,
+            )
+        except Exception as e:
+            self.logger.error(f"Error while embedding batch with OpenAI: {e}")
+            return None
+
+        return self.parse_embedding_response(response=response, texts=texts)
 
     def construct_prompt(self, prompt: str, role: str):
         """Function to build required prompt format for the model"""
@@ -120,8 +318,3 @@ class OpenAIProvider(LLMInterface):
             "role": role,
             "content": prompt
         }
-    
-
-
-    
-
@@ -1,2 +1,3 @@
 from .CoHereProvider import CoHereProvider
 from .OpenAIProvider import OpenAIProvider
+from .FakeProvider import FakeProvider
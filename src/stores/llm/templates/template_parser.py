@@ -1,44 +1,166 @@
+from string import Template
+import importlib
+import threading
+import logging
+import time
 import os
 
 class TemplateParser:
     """
     A utility class for parsing localized templates based on the user's language preference.
 
-    This class is used to retrieve and substitute variables in localized templates
-    stored in language-specific directories under a "locales" folder.
+    The templates are stored in language-specific directories under a "locales" folder (one module
+    per group, e.g. locales/en/rag.py). All the groups of all the languages are loaded once and
+    compiled to format strings, and the templates of the active language (with the missing groups / keys
+    taken from the default language) are resolved ahead of time, so a call does not touch the filesystem.
     """
 
-    def __init__(self, language: str=None, default_language='en'):
+    def __init__(self, language: str=None, default_language='en', reload: bool = False,
+                 reload_interval: float = 1.0):
         """
         Initialize a TemplateParser instance.
 
         Args:
-            language (str, optional): The preferred language code (e.g., 'en', 'fr'). 
+            language (str, optional): The preferred language code (e.g., 'en', 'fr').
                                       If not provided, defaults to the default_language.
             default_language (str): The fallback language code. Defaults to 'en'.
-            language (str): The currently active language code.
+            reload (bool): Whether the modified template files are reloaded (development). Defaults to False.
+            reload_interval (float): Minimum seconds between two checks of the template files. Defaults to 1.0.
         """
         self.current_path = os.path.dirname(os.path.abspath(__file__)) # to get the parent forlder name "templates"
-        self.default_language = default_language 
+        self.locales_path = os.path.join(self.current_path, "locales")
+        self.default_language = default_language
         self.language = None
 
+        self.reload = reload
+        self.reload_interval = reload_interval
+        self.last_reload_check = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.logger = logging.getLogger(__name__)
+
+        # language -> group -> key -> compiled template (format string), and the modification times of the files
+        self.registry = {}
+        self.file_mtimes = {}
+        # group -> key -> compiled template of the active language (with the default language fallback)
+        self.templates = {}
+
+        self.load_templates()
         self.set_language(language)
 
-    
+    @staticmethod
+    def compile_template(template: Template):
+        """Function to convert a string.Template to an equivalent format string ($var -> {var})"""
+        parts, position = [], 0
+
+        for match in template.pattern.finditer(template.template):
+            # the text before the placeholder (the braces are literal for string.Template)
+            parts.append(template.template[position:match.start()].replace("{", "{{").replace("}", "}}"))
+
+            name = match.group("named") or match.group("braced")
+            if name is not None:
+                parts.append("{" + name + "}")
+            elif match.group("escaped") is not None:
+                parts.append("$")
+            else:
+                # invalid placeholder, kept as it is
+                parts.append(match.group().replace("{", "{{").replace("}", "}}"))
+
+            position = match.end()
+
+        parts.append(template.template[position:].replace("{", "{{").replace("}", "}}"))
+
+        return "".join(parts)
+
+    def get_group_files(self):
+        """Function to return the (language, group, file path) of all the template modules"""
+        group_files = []
+
+        for language in sorted(os.listdir(self.locales_path)):
+            language_path = os.path.join(self.locales_path, language)
+            if not os.path.isdir(language_path) or language.startswith("__"):
+                continue
+
+            for file_name in sorted(os.listdir(language_path)):
+                if file_name.endswith(".py") and not file_name.startswith("__"):
+                    group_files.append((language, file_name[:-3], os.path.join(language_path, file_name)))
+
+        return group_files
+
+    def load_templates(self):
+        """Function to import and compile the templates of all the languages (called once, and on reload)"""
+        registry, file_mtimes = {}, {}
+
+        for language, group, group_path in self.get_group_files():
+            # import group (rag) module (file) -- it's like doing import statment
+            module_name = f"stores.llm.templates.locales.{language}.{group}"
+            module = importlib.import_module(module_name)
+            if group_path in self.file_mtimes:
+                module = importlib.reload(module)
+
+            registry.setdefault(language, {})[group] = {
+                key: self.compile_template(value)
+                for key, value in vars(module).items()
+                if isinstance(value, Template)
+            }
+            file_mtimes[group_path] = os.path.getmtime(group_path)
+
+        with self.lock:
+            self.registry = registry
+            self.file_mtimes = file_mtimes
+
+            if self.language:
+                self.templates = self.resolve_templates(self.language)
+
+    def resolve_templates(self, language: str):
+        """Function to merge the templates of a language over the templates of the default language"""
+        templates = {}
+
+        for templates_language in [self.default_language, language]:
+            for group, group_templates in self.registry.get(templates_language, {}).items():
+                templates.setdefault(group, {}).update(group_templates)
+
+        return templates
+
     def set_language(self, language: str):
         """ Set the active language for the template parser."""
-        if not language:
         # If the specified language does not exist in the "locales" directory, it falls back
         # to the default language.
-            self.language = self.default_language
-
-        # get the path of defined languages
-        language_path = os.path.join(self.current_path, "locales", language)
-        if os.path.exists(language_path):
+        if language and language in self.registry:
             self.language = language
         else:
             self.language = self.default_language
 
+        with self.lock:
+            self.templates = self.resolve_templates(self.language)
+
+    def check_reload(self):
+        """Function to reload the templates if a template file was added, removed or modified (reload mode)"""
+        now = time.monotonic()
+        if now - self.last_reload_check < self.reload_interval:
+            return
+
+        self.last_reload_check = now
+
+        file_mtimes = {
+            group_path: os.path.getmtime(group_path)
+            for _, _, group_path in self.get_group_files()
+        }
+
+        if file_mtimes != self.file_mtimes:
+            self.logger.info("Template files changed, reloading the templates")
+            self.load_templates()
+
+    def get_template(self, group: str, key: str):
+        """Function to return the compiled template of a group key (None if it does not exist)"""
+        if not group or not key:
+            return None
+
+        if self.reload:
+            self.check_reload()
+
+        return self.templates.get(group, {}).get(key)
+
     def get(self, group: str, key: str, vars: dict={}):
         """
         Retrieve a localized template value and substitute variables into it.
@@ -53,28 +175,29 @@ class TemplateParser:
             str or None: The localized and formatted template string if found, or `None` if
                          the group or key does not exist.
         """
-        if not group or not key:
+        template = self.get_template(group=group, key=key)
+        if template is None:
             return None
-        
-        # look up for a Python file in the "locales" directory corresponding to the specified group (rag) and language. 
-        group_path = os.path.join(self.current_path, "locales", self.language, f"{group}.py" )
-        targeted_language = self.language
 
-        # If the file is not found in the specified language, it looks up for it in the default language. 
-        if not os.path.exists(group_path):
-            group_path = os.path.join(self.current_path, "locales", self.default_language, f"{group}.py" )
-            targeted_language = self.default_language
+        # put needed values
+        return template.format_map(vars)
 
-        if not os.path.exists(group_path):
-            return None
-        
-        # import group (rag) module (file) -- it's like doing import statment
-        module = __import__(f"stores.llm.templates.locales.{targeted_language}.{group}", fromlist=[group])
+    def render_many(self, group: str, key: str, vars_list: list, separator: str = "\n"):
+        """
+        Substitute the variables of many items into the same template and join the results
+        (e.g. the block of the retrieved documents of a prompt).
 
-        if not module:
+        Args:
+            group (str): The name of the group (module) to load (e.g., "rag").
+            key (str): The key/variable to retrieve from the module (e.g., "document_prompt").
+            vars_list (list): The variables (dict) of each item.
+            separator (str, optional): The text between two items. Defaults to a new line.
+
+        Returns:
+            str or None: The joined items, or `None` if the group or key does not exist.
+        """
+        template = self.get_template(group=group, key=key)
+        if template is None:
             return None
-        
-        # get variables names
-        key_attribute = getattr(module, key)
-        # put needed values
-        return key_attribute.substitute(vars)
+
+        return separator.join([ template.format_map(vars) for vars in vars_list ])
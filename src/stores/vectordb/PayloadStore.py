@@ -0,0 +1,241 @@
+import json
+import sqlite3
+import threading
+import re
+
+class PayloadStore:
+    """
+    SQLite table that maps the records of a collection to their rows in a vector matrix
+    and holds their payloads (text and metadata), used by the in-process vector db providers.
+
+    A deleted record keeps its row (marked as deleted) so the matrix is never rewritten,
+    the row is reused if the same record is inserted again.
+
+    The filterable payload fields of a record (e.g. its project id) are stored as a JSON object,
+    a field used by the filters could be indexed (SQLite expression index).
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) the payload store.
+
+        Args:
+            db_path (str): The path of the SQLite file.
+        """
+        # the store is used by the request handlers and the insert threads
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                row INTEGER PRIMARY KEY,
+                record_id TEXT UNIQUE NOT NULL,
+                text TEXT,
+                metadata TEXT,
+                is_deleted INTEGER NOT NULL DEFAULT 0,
+                fields TEXT
+            )
+        """)
+
+        # stores created before the payload fields were added
+        columns = [ column[1] for column in self.connection.execute("PRAGMA table_info(records)").fetchall() ]
+        if "fields" not in columns:
+            self.connection.execute("ALTER TABLE records ADD COLUMN fields TEXT")
+
+        self.connection.commit()
+
+    @staticmethod
+    def get_field_expression(field_name: str):
+        """Function to return the SQL expression of a payload field (the same text is used by its index)"""
+        if not re.fullmatch(r"\w+", field_name):
+            raise ValueError(f"Invalid payload field name: {field_name}")
+
+        return f"json_extract(fields, '$.{field_name}')"
+
+    def get_filter_clause(self, filters: dict):
+        """Function to return the SQL conditions (starting with AND) and parameters of a filter"""
+        if not filters:
+            return "", []
+
+        clause = "".join([ f" AND {self.get_field_expression(field_name)} = ?" for field_name in filters ])
+        return clause, list(filters.values())
+
+    def create_field_index(self, field_name: str):
+        """Function to index a payload field, so the filters on it do not scan all the records"""
+        with self.lock:
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS records_{field_name} ON records ({self.get_field_expression(field_name)})"
+            )
+            self.connection.commit()
+
+    def get_rows(self, record_ids: list):
+        """
+        Return the rows of the giving records (deleted records included).
+
+        Args:
+            record_ids (list): The IDs of the records.
+
+        Returns:
+            dict: record id (str) -> row (int) of the records that exist.
+        """
+        rows = {}
+        record_ids = [ str(record_id) for record_id in record_ids ]
+
+        with self.lock:
+            # sqlite limits the number of the query parameters
+            for i in range(0, len(record_ids), 500):
+                batch = record_ids[i:i+500]
+                cursor = self.connection.execute(
+                    f"SELECT record_id, row FROM records WHERE record_id IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                rows.update(cursor.fetchall())
+
+        return rows
+
+    def set_records(self, rows: list, record_ids: list, texts: list, metadata: list, fields: list = None):
+        """
+        Insert or replace the payloads of records at the giving rows.
+
+        Args:
+            rows (list): The rows of the records in the vector matrix.
+            record_ids (list): The IDs of the records.
+            texts (list): The texts of the records.
+            metadata (list): The metadata of the records.
+            fields (list, optional): The filterable payload fields of the records. Defaults to None.
+        """
+        fields = fields or [None] * len(rows)
+
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO records (row, record_id, text, metadata, is_deleted, fields) "
+                "VALUES (?, ?, ?, ?, 0, ?)",
+                [
+                    (row, str(record_id), text, json.dumps(record_metadata, ensure_ascii=False, default=str),
+                     json.dumps(record_fields, ensure_ascii=False, default=str) if record_fields else None)
+                    for row, record_id, text, record_metadata, record_fields in zip(rows, record_ids, texts,
+                                                                                    metadata, fields)
+                ],
+            )
+            self.connection.commit()
+
+    def delete_records(self, record_ids: list):
+        """
+        Mark records as deleted.
+
+        Args:
+            record_ids (list): The IDs of the records.
+
+        Returns:
+            list: The rows of the deleted records.
+        """
+        rows = list(self.get_rows(record_ids=record_ids).values())
+
+        with self.lock:
+            self.connection.executemany(
+                "UPDATE records SET is_deleted = 1 WHERE row = ?",
+                [ (row,) for row in rows ],
+            )
+            self.connection.commit()
+
+        return rows
+
+    def delete_by_filter(self, filters: dict):
+        """
+        Mark the records that match a filter as deleted.
+
+        Args:
+            filters (dict): Payload field -> value.
+
+        Returns:
+            list: The rows of the deleted records.
+        """
+        rows = self.get_filtered_rows(filters=filters)
+
+        with self.lock:
+            self.connection.executemany(
+                "UPDATE records SET is_deleted = 1 WHERE row = ?",
+                [ (row,) for row in rows ],
+            )
+            self.connection.commit()
+
+        return rows
+
+    def get_filtered_rows(self, filters: dict):
+        """Function to return the rows of the records (not deleted) that match a filter, ordered by row"""
+        clause, params = self.get_filter_clause(filters)
+
+        with self.lock:
+            cursor = self.connection.execute(f"SELECT row FROM records WHERE is_deleted = 0{clause} ORDER BY row",
+                                             params)
+            return [ row for row, in cursor.fetchall() ]
+
+    def get_deleted_rows(self):
+        """Function to return the rows of the deleted records"""
+        with self.lock:
+            cursor = self.connection.execute("SELECT row FROM records WHERE is_deleted = 1")
+            return [ row for row, in cursor.fetchall() ]
+
+    def get_payloads(self, rows: list):
+        """
+        Return the payloads of the records at the giving rows.
+
+        Args:
+            rows (list): The rows of the records.
+
+        Returns:
+            dict: row (int) -> {"record_id", "text", "metadata"}.
+        """
+        rows = [ int(row) for row in rows ]
+        payloads = {}
+
+        with self.lock:
+            for i in range(0, len(rows), 500):
+                batch = rows[i:i+500]
+                cursor = self.connection.execute(
+                    f"SELECT row, record_id, text, metadata FROM records WHERE row IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+
+                for row, record_id, text, metadata in cursor.fetchall():
+                    payloads[row] = {
+                        "record_id": record_id,
+                        "text": text,
+                        "metadata": json.loads(metadata) if metadata else None,
+                    }
+
+        return payloads
+
+    def count(self, filters: dict = None):
+        """Function to return the number of records that are not deleted (and match the filter if giving)"""
+        clause, params = self.get_filter_clause(filters)
+
+        with self.lock:
+            return self.connection.execute(f"SELECT COUNT(*) FROM records WHERE is_deleted = 0{clause}",
+                                           params).fetchone()[0]
+
+    def iterate_record_ids(self, batch_size: int = 1000, filters: dict = None):
+        """Generator that yields the IDs of the records that are not deleted (and match the filter if giving)
+        in batches"""
+        clause, params = self.get_filter_clause(filters)
+        last_row = -1
+
+        while True:
+            with self.lock:
+                records = self.connection.execute(
+                    f"SELECT row, record_id FROM records WHERE is_deleted = 0{clause} AND row > ? ORDER BY row LIMIT ?",
+                    (*params, last_row, batch_size),
+                ).fetchall()
+
+            if len(records) == 0:
+                return
+
+            last_row = records[-1][0]
+            yield [ record_id for _, record_id in records ]
+
+    def close(self):
+        """Function to close the SQLite connection"""
+        with self.lock:
+            self.connection.close()
@@ -3,8 +3,15 @@ from enum import Enum
 class VectorDBEnums(Enum):
     """ Enumeration for supported vector database implementations """
     QDRANT = "QDRANT"
+    NUMPY = "NUMPY" # in-process exact search over memory mapped float32 matrices
+    IVF = "IVF" # NUMPY storage + inverted file index (approximate search, tunable nprobe)
 
 class DistanceMethodEnums(Enum):
     """ Enumeration for distance calculation methods used in vector similarity searches """
     COSINE = "cosine"
-    DOT = "dot"
\ No newline at end of file
+    DOT = "dot"
+
+class QuantizationEnums(Enum):
+    """ Enumeration for the compression of the stored vectors (searched in RAM, rescored with the original vectors) """
+    SCALAR = "scalar" # int8 per dimension, 4x smaller
+    BINARY = "binary" # 1 bit per dimension, 32x smaller (for high dimensional embeddings)
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import List
+import asyncio
 from models.db_schemes import RetrievedDocument
+from helpers.metrics import track_latency
  
 
 class VectorDBInterface(ABC):
@@ -19,6 +21,10 @@ class VectorDBInterface(ABC):
         """ Close the connection to the vector database. """
         pass
 
+    async def disconnect_async(self):
+        """ Close the connection to the vector database (from async code). """
+        self.disconnect()
+
     @abstractmethod
     def is_collection_existed(self, collection_name: str) -> bool:
         """
@@ -68,7 +74,10 @@ class VectorDBInterface(ABC):
     @abstractmethod
     def create_collection(self, collection_name: str, 
                                 embedding_size: int,
-                                do_reset: bool = False):
+                                do_reset: bool = False,
+                                quantization: str = None,
+                                indexed_fields: list = None,
+                                tenant_field: str = None):
         """
         Create a new collection in the database.
 
@@ -76,6 +85,12 @@ class VectorDBInterface(ABC):
             collection_name (str): The name of the new collection.
             embedding_size (int): The size of the embedding vectors to store.
             do_reset (bool, optional): If True, reset/delete the collection if it already exists. Defaults to False.
+            quantization (str, optional): One of QuantizationEnums values to keep compressed copies of the vectors
+                                          for the search. Defaults to None (the default of the provider).
+            indexed_fields (list, optional): Payload fields (see insert_many payload_fields) that are indexed
+                                             to be used by the filters. Defaults to None.
+            tenant_field (str, optional): An indexed payload field that splits the collection between tenants
+                                          (every search is filtered by it). Defaults to None.
         """
         pass
 
@@ -98,7 +113,8 @@ class VectorDBInterface(ABC):
     @abstractmethod
     def insert_many(self, collection_name: str, texts: list, 
                           vectors: list, metadata: list = None, 
-                          record_ids: list = None, batch_size: int = 50):
+                          record_ids: list = None, batch_size: int = 50,
+                          payload_fields: list = None):
         """
         Insert multiple records into a collection in batches.
 
@@ -109,11 +125,66 @@ class VectorDBInterface(ABC):
             metadata (list, optional): A list of metadata dictionaries for each record. Defaults to None.
             record_ids (list, optional): A list of unique identifiers for the records. Defaults to None.
             batch_size (int, optional): The size of each batch for insertion. Defaults to 50.
+            payload_fields (list, optional): A dictionary of filterable fields (e.g. {"project_id": ...})
+                                             for each record. Defaults to None.
+        """
+        pass
+
+    @abstractmethod
+    def delete_many(self, collection_name: str, record_ids: list):
+        """
+        Delete multiple records from a collection by their IDs.
+
+        Args:
+            collection_name (str): The name of the collection.
+            record_ids (list): The unique identifiers of the records to delete.
+        """
+        pass
+
+    @abstractmethod
+    def delete_by_filter(self, collection_name: str, filters: dict):
+        """
+        Delete the records of a collection that match a filter.
+
+        Args:
+            collection_name (str): The name of the collection.
+            filters (dict): Payload field -> value, a record matches when all the fields are equal.
+        """
+        pass
+
+    @abstractmethod
+    def count(self, collection_name: str, filters: dict = None) -> int:
+        """
+        Count the records of a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            filters (dict, optional): Count only the records that match (payload field -> value). Defaults to None.
+
+        Returns:
+            int: The number of records.
         """
         pass
 
     @abstractmethod
-    def search_by_vector(self, collection_name: str, vector: list, limit: int) -> List[RetrievedDocument]:
+    def iterate_record_ids(self, collection_name: str, batch_size: int = 1000, filters: dict = None):
+        """
+        Iterate over the IDs of all records in a collection (without their vectors or payloads).
+
+        Args:
+            collection_name (str): The name of the collection.
+            batch_size (int, optional): The number of IDs in each yielded batch. Defaults to 1000.
+            filters (dict, optional): Only the records that match (payload field -> value). Defaults to None.
+
+        Yields:
+            list: A batch of record IDs.
+        """
+        pass
+
+    @abstractmethod
+    def search_by_vector(self, collection_name: str, vector: list, limit: int,
+                         search_params: dict = None, filters: dict = None,
+                         with_vectors: bool = False) -> List[RetrievedDocument]:
         """
         Search for the most similar vectors in a collection to the given vector.
 
@@ -121,6 +192,66 @@ class VectorDBInterface(ABC):
             collection_name (str): The name of the collection to search.
             vector (list): The query vector.
             limit (int): The maximum number of results to return.
+            search_params (dict, optional): Provider specific knobs that trade recall for latency
+                                            (e.g. {"nprobe": 16}, {"hnsw_ef": 128}, {"exact": True}).
+                                            Defaults to None (the provider defaults).
+            filters (dict, optional): Search only the records that match (payload field -> value).
+                                      Defaults to None.
+            with_vectors (bool, optional): Whether the stored vectors are returned with the documents.
+                                           Defaults to False.
+
+        """
+        pass
 
+    @track_latency("vectordb")
+    async def search_by_vector_async(self, collection_name: str, vector: list, limit: int,
+                                     search_params: dict = None, filters: dict = None,
+                                     with_vectors: bool = False) -> List[RetrievedDocument]:
+        """
+        Search for the most similar vectors without blocking the event loop, the providers with an async
+        client override it, by default the blocking search runs in a thread.
+
+        Args:
+            Same as search_by_vector.
+        """
+        return await asyncio.to_thread(self.search_by_vector, collection_name=collection_name, vector=vector,
+                                       limit=limit, search_params=search_params, filters=filters,
+                                       with_vectors=with_vectors)
+
+    def search_by_vectors(self, collection_name: str, vectors: list, limit: int,
+                          search_params: dict = None, filters: dict = None,
+                          with_vectors: bool = False) -> List[List[RetrievedDocument]]:
+        """
+        Search for the most similar vectors of many queries in one call, the providers with a batched
+        search override it, by default the queries are searched one by one.
+
+        Args:
+            collection_name (str): The name of the collection to search.
+            vectors (list): The query vectors.
+            limit (int): The maximum number of results to return for each query.
+            search_params (dict, optional): Same as search_by_vector (applied to all the queries).
+            filters (dict, optional): Same as search_by_vector (applied to all the queries).
+            with_vectors (bool, optional): Same as search_by_vector. Defaults to False.
+
+        Returns:
+            list: The results of each query in the order of the vectors (an empty list if a query has no results).
+        """
+        return [
+            self.search_by_vector(collection_name=collection_name, vector=vector, limit=limit,
+                                  search_params=search_params, filters=filters, with_vectors=with_vectors) or []
+            for vector in vectors
+        ]
+
+    @track_latency("vectordb", items=lambda args: len(args["vectors"]))
+    async def search_by_vectors_async(self, collection_name: str, vectors: list, limit: int,
+                                      search_params: dict = None, filters: dict = None,
+                                      with_vectors: bool = False) -> List[List[RetrievedDocument]]:
+        """
+        Batched search without blocking the event loop, by default the blocking batched search runs in a thread.
+
+        Args:
+            Same as search_by_vectors.
         """
-        pass
\ No newline at end of file
+        return await asyncio.to_thread(self.search_by_vectors, collection_name=collection_name, vectors=vectors,
+                                       limit=limit, search_params=search_params, filters=filters,
+                                       with_vectors=with_vectors)
@@ -1,4 +1,4 @@
-from .providers import QdrantDBProvider
+from .providers import QdrantDBProvider, NumpyDBProvider, IVFDBProvider
 from .VectorDBEnums import VectorDBEnums
 from controllers.EmbedController import EmbedController
 
@@ -41,7 +41,41 @@ class VectorDBProviderFactory:
             return QdrantDBProvider(
                 db_path=db_path,
                 distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+                quantization=self.config.VECTOR_DB_QUANTIZATION,
+                quantization_oversampling=self.config.VECTOR_DB_QUANTIZATION_OVERSAMPLING,
+                quantization_rescore=self.config.VECTOR_DB_QUANTIZATION_RESCORE,
+                url=self.config.VECTOR_DB_URL,
+                api_key=self.config.VECTOR_DB_API_KEY,
+                prefer_grpc=self.config.VECTOR_DB_PREFER_GRPC,
+                grpc_port=self.config.VECTOR_DB_GRPC_PORT,
+                timeout=self.config.VECTOR_DB_TIMEOUT,
+                pool_size=self.config.VECTOR_DB_POOL_SIZE,
+                upload_parallel=self.config.VECTOR_DB_UPLOAD_PARALLEL,
+                upload_batch_size=self.config.VECTOR_DB_UPLOAD_BATCH_SIZE,
             )
-        
+
+        # Check if the specified provider is NUMPY
+        if provider == VectorDBEnums.NUMPY.value:
+            db_path = self.embed_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH)
+
+            return NumpyDBProvider(
+                db_path=db_path,
+                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+            )
+
+        # Check if the specified provider is IVF
+        if provider == VectorDBEnums.IVF.value:
+            db_path = self.embed_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH)
+
+            return IVFDBProvider(
+                db_path=db_path,
+                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+                nlist=self.config.IVF_NLIST,
+                nprobe=self.config.IVF_NPROBE,
+                min_train_size=self.config.IVF_MIN_TRAIN_SIZE,
+                train_sample_size=self.config.IVF_TRAIN_SAMPLE_SIZE,
+                retrain_growth=self.config.IVF_RETRAIN_GROWTH,
+            )
+
         # Return None if the specified provider is not supported
         return None
@@ -0,0 +1,353 @@
+from .NumpyDBProvider import NumpyDBProvider
+from ..VectorDBEnums import DistanceMethodEnums
+import numpy as np
+import shutil
+import json
+import os
+from helpers.metrics import track_latency
+
+class IVFDBProvider(NumpyDBProvider):
+    """
+    In-process approximate vector db implementation (inverted file index) for Abstract base class (VectorDBInterface).
+
+    The vectors and payloads are stored like NumpyDBProvider, in addition every collection has an "ivf" folder with:
+        - centroids.npy: k-means centroids trained on a sample of the vectors,
+        - assignments.i32: the centroid (list) of every row,
+        - lists/<list>.i64: the posting list (rows) of every centroid, new rows are appended to them.
+    A search scores the centroids, then only the rows of the "nprobe" nearest lists, so its cost grows with
+    the size of the probed lists instead of the size of the collection.
+    The index is trained when the collection reaches min_train_size vectors (before that the search is exact)
+    and retrained every time the collection grows by retrain_growth times.
+    """
+
+    IVF_FOLDER_NAME = "ivf"
+
+    def __init__(self, db_path: str, distance_method: str,
+                 nlist: int = 0, nprobe: int = 8,
+                 min_train_size: int = 10000, train_sample_size: int = 50000,
+                 retrain_growth: float = 2.0, train_iterations: int = 10):
+        """
+        Initialize the vector database client.
+
+        Args:
+            db_path (str): The folder of the database (one sub folder per collection).
+            distance_method (str): The distance method to be used for similarity searches.
+                                Should be one of the values from DistanceMethodEnums.
+            nlist (int): Number of centroids (lists). Defaults to 0 (the square root of the number of vectors).
+            nprobe (int): Default number of lists scanned by a search. Defaults to 8.
+            min_train_size (int): Number of vectors needed to train the index. Defaults to 10000.
+            train_sample_size (int): Number of vectors used to train the centroids. Defaults to 50000.
+            retrain_growth (float): Retrain when the collection is this many times bigger than at the last
+                                    training. Defaults to 2.0.
+            train_iterations (int): Number of k-means iterations. Defaults to 10.
+        """
+        super().__init__(db_path=db_path, distance_method=distance_method)
+
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.train_sample_size = train_sample_size
+        self.retrain_growth = retrain_growth
+        self.train_iterations = train_iterations
+
+    def get_index_path(self, collection: dict, *parts: str):
+        """Function to return a path inside the ivf folder of a collection"""
+        return os.path.join(os.path.dirname(collection["vectors_path"]), self.IVF_FOLDER_NAME, *parts)
+
+    def get_collection(self, collection_name: str):
+        """Function to return the state of a collection with its ivf index (loaded once)"""
+        collection = super().get_collection(collection_name)
+
+        if collection is None or "ivf" in collection:
+            return collection
+
+        with collection["lock"]:
+            if "ivf" not in collection:
+                collection["ivf"] = self.load_index(collection)
+
+        return collection
+
+    def load_index(self, collection: dict):
+        """Function to read the ivf index of a collection from its folder"""
+        index = { "centroids": None, "assignments": np.zeros(0, dtype=np.int32), "lists": [], "trained_rows": 0 }
+
+        if not os.path.exists(self.get_index_path(collection, "index.json")):
+            return index
+
+        with open(self.get_index_path(collection, "index.json"), "r") as index_file:
+            index_config = json.load(index_file)
+
+        index["trained_rows"] = index_config["trained_rows"]
+        index["centroids"] = np.load(self.get_index_path(collection, "centroids.npy"))
+        index["assignments"] = np.fromfile(self.get_index_path(collection, "assignments.i32"), dtype=np.int32)
+        index["lists"] = [
+            np.fromfile(self.get_index_path(collection, "lists", f"{list_id}.i64"), dtype=np.int64)
+            for list_id in range(index_config["nlist"])
+        ]
+
+        return index
+
+    def assign_to_centroids(self, centroids: np.ndarray, vectors: np.ndarray, batch_size: int = 8192):
+        """Function to return the nearest centroid of every vector (the scores are computed in batches)"""
+        list_ids = np.empty(vectors.shape[0], dtype=np.int32)
+
+        for i in range(0, vectors.shape[0], batch_size):
+            list_ids[i:i+batch_size] = np.argmax(np.asarray(vectors[i:i+batch_size]) @ centroids.T, axis=1)
+
+        return list_ids
+
+    def train_centroids(self, vectors: np.ndarray, nlist: int, distance_method: str):
+        """Function to train the centroids with k-means (spherical k-means for cosine distance)"""
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(vectors.shape[0], nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            list_ids = self.assign_to_centroids(centroids, vectors)
+
+            # new centroid = mean of its vectors (summed after sorting the vectors by their list)
+            order = np.argsort(list_ids, kind="stable")
+            counts = np.bincount(list_ids, minlength=nlist)
+            non_empty = np.flatnonzero(counts)
+            sums = np.add.reduceat(vectors[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[non_empty], axis=0)
+
+            centroids[non_empty] = sums / counts[non_empty, None]
+
+            # an empty list restarts from a random vector
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = vectors[rng.choice(vectors.shape[0], len(empty), replace=False)]
+
+            if distance_method == DistanceMethodEnums.COSINE.value:
+                norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+                centroids = centroids / np.where(norms == 0, 1, norms)
+
+        return centroids.astype(np.float32)
+
+    def train_index(self, collection: dict):
+        """Function to (re)train the centroids of a collection and rebuild its posting lists,
+        must be called within the collection lock"""
+        vectors = self.get_vectors(collection)
+        if vectors is None:
+            return False
+
+        rows_count = vectors.shape[0]
+        alive_rows = np.setdiff1d(np.arange(rows_count), np.fromiter(collection["deleted_rows"], dtype=np.int64))
+        if len(alive_rows) == 0:
+            return False
+
+        nlist = self.nlist or int(np.sqrt(len(alive_rows)))
+        nlist = max(1, min(nlist, len(alive_rows)))
+
+        # train on a sample, the sorted rows read the memory mapped file in order
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(alive_rows, min(self.train_sample_size, len(alive_rows)), replace=False))
+        centroids = self.train_centroids(np.asarray(vectors[sample_rows]), nlist=nlist,
+                                         distance_method=collection["config"]["distance_method"])
+
+        assignments = self.assign_to_centroids(centroids, vectors)
+
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        boundaries = np.cumsum(np.bincount(assignments, minlength=nlist))[:-1]
+        lists = np.split(order, boundaries)
+
+        # the new index is written next to the old one then swapped
+        index_path = self.get_index_path(collection)
+        new_index_path = index_path + ".new"
+        shutil.rmtree(new_index_path, ignore_errors=True)
+        os.makedirs(os.path.join(new_index_path, "lists"))
+
+        np.save(os.path.join(new_index_path, "centroids.npy"), centroids)
+        assignments.tofile(os.path.join(new_index_path, "assignments.i32"))
+        for list_id, rows in enumerate(lists):
+            rows.tofile(os.path.join(new_index_path, "lists", f"{list_id}.i64"))
+
+        with open(os.path.join(new_index_path, "index.json"), "w") as index_file:
+            json.dump({ "nlist": nlist, "trained_rows": rows_count }, index_file)
+
+        shutil.rmtree(index_path, ignore_errors=True)
+        os.replace(new_index_path, index_path)
+
+        collection["ivf"] = {
+            "centroids": centroids,
+            "assignments": assignments,
+            "lists": lists,
+            "trained_rows": rows_count,
+        }
+
+        self.logger.info(f"Trained ivf index with {nlist} lists on {len(sample_rows)} of {rows_count} vectors")
+
+        return True
+
+    def train_collection(self, collection_name: str):
+        """
+        (Re)train the index of a collection now instead of waiting for it to grow.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            bool: True if the index was trained.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return False
+
+        with collection["lock"]:
+            return self.train_index(collection)
+
+    def on_rows_written(self, collection: dict, rows: list, vectors: np.ndarray):
+        """Function to add the written rows to the posting lists of their nearest centroids,
+        or to (re)train the index when the collection is big enough"""
+        index = collection["ivf"]
+        rows_count = self.get_rows_count(collection)
+
+        if index["centroids"] is None:
+            if rows_count >= self.min_train_size:
+                self.train_index(collection)
+            return
+
+        if rows_count >= index["trained_rows"] * self.retrain_growth:
+            self.train_index(collection)
+            return
+
+        rows = np.asarray(rows, dtype=np.int64)
+        list_ids = self.assign_to_centroids(index["centroids"], vectors)
+
+        # the assignments file has one entry per row (-1 for a row without a list)
+        assignments_path = self.get_index_path(collection, "assignments.i32")
+        if rows_count > index["assignments"].shape[0]:
+            missing = np.full(rows_count - index["assignments"].shape[0], -1, dtype=np.int32)
+            with open(assignments_path, "ab") as assignments_file:
+                assignments_file.write(missing.tobytes())
+            index["assignments"] = np.concatenate([index["assignments"], missing])
+
+        index["assignments"][rows] = list_ids
+        file_assignments = np.memmap(assignments_path, dtype=np.int32, mode="r+", shape=(rows_count,))
+        file_assignments[rows] = list_ids
+        file_assignments.flush()
+        del file_assignments
+
+        # an updated row could stay in its old list too, the search skips it there (its assignment changed)
+        for list_id in np.unique(list_ids).tolist():
+            list_rows = rows[list_ids == list_id]
+
+            with open(self.get_index_path(collection, "lists", f"{list_id}.i64"), "ab") as list_file:
+                list_file.write(list_rows.tobytes())
+
+            index["lists"][list_id] = np.concatenate([index["lists"][list_id], list_rows])
+
+    def get_collection_info(self, collection_name: str) -> dict:
+        """
+        Retrieve metadata and information about a specific collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            dict: A dictionary containing information about the collection (and its ivf index).
+        """
+        collection_info = super().get_collection_info(collection_name)
+        if collection_info is None:
+            return None
+
+        index = self.get_collection(collection_name)["ivf"]
+        collection_info["ivf"] = {
+            "is_trained": index["centroids"] is not None,
+            "nlist": len(index["lists"]),
+            "trained_rows": index["trained_rows"],
+            "default_nprobe": self.nprobe,
+        }
+
+        return collection_info
+
+    @track_latency("vectordb")
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5, search_params: dict = None,
+                         filters: dict = None, with_vectors: bool = False):
+        """
+        Search for the most similar vectors in a collection to the given vector.
+
+        Args:
+            collection_name (str): The name of the collection to search.
+            vector (list): The query vector.
+            limit (int): The maximum number of results to return.
+            search_params (dict, optional): "nprobe" (number of lists scanned, more lists = better recall
+                                            and slower search) and / or "exact" (scan all the vectors).
+                                            Defaults to None (nprobe of the provider).
+            filters (dict, optional): Search only the records that match (payload field -> value).
+                                      Defaults to None.
+            with_vectors (bool, optional): Whether the stored vectors are returned with the documents.
+                                           Defaults to False.
+
+        """
+        search_params = search_params or {}
+
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return None
+
+        index = collection["ivf"]
+        if index["centroids"] is None or search_params.get("exact"):
+            return super().search_by_vector(collection_name=collection_name, vector=vector, limit=limit,
+                                            filters=filters, with_vectors=with_vectors)
+
+        vectors = self.get_vectors(collection)
+        if vectors is None:
+            return None
+
+        query = self.prepare_vectors(collection, vector)[0]
+
+        # the nearest lists to the query
+        nlist = len(index["lists"])
+        nprobe = max(1, min(int(search_params.get("nprobe", self.nprobe)), nlist))
+        centroid_scores = index["centroids"] @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        candidates = np.concatenate([ index["lists"][list_id] for list_id in probe ])
+        owners = np.repeat(probe, [ index["lists"][list_id].shape[0] for list_id in probe ])
+
+        # skip the rows that moved to another list, add the rows that were written without a list
+        assignments = index["assignments"]
+        candidates = candidates[assignments[candidates] == owners]
+        candidates = np.concatenate([candidates, np.arange(assignments.shape[0], vectors.shape[0])])
+        candidates = np.unique(candidates)
+
+        # filtered search: a small filtered set (e.g. a small tenant) is scanned exactly,
+        # otherwise the candidates of the probed lists are restricted to the filtered rows
+        if filters:
+            filtered_rows = self.get_filtered_rows(collection, filters=filters, rows_count=vectors.shape[0])
+            if filtered_rows.shape[0] <= candidates.shape[0]:
+                candidates = filtered_rows
+            else:
+                candidates = candidates[np.isin(candidates, filtered_rows, assume_unique=True)]
+
+        if candidates.shape[0] == 0:
+            return None
+
+        scores = np.asarray(vectors[candidates]) @ query
+
+        return self.get_top_documents(collection=collection, scores=scores, limit=limit, rows=candidates,
+                                      vectors=vectors if with_vectors else None)
+
+    @track_latency("vectordb", items=lambda args: len(args["vectors"]))
+    def search_by_vectors(self, collection_name: str, vectors: list, limit: int = 5, search_params: dict = None,
+                          filters: dict = None, with_vectors: bool = False):
+        """
+        Search for the most similar vectors of many queries, the exact search (untrained index
+        or "exact" param) scores all the queries in one product, otherwise each query probes its own lists.
+
+        Args:
+            Same as search_by_vectors of VectorDBInterface.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return None
+
+        if collection["ivf"]["centroids"] is None or (search_params or {}).get("exact"):
+            return super().search_by_vectors(collection_name=collection_name, vectors=vectors, limit=limit,
+                                             filters=filters, with_vectors=with_vectors)
+
+        return [
+            self.search_by_vector(collection_name=collection_name, vector=vector, limit=limit,
+                                  search_params=search_params, filters=filters, with_vectors=with_vectors) or []
+            for vector in vectors
+        ]
@@ -0,0 +1,566 @@
+from ..VectorDBInterface import VectorDBInterface
+from ..VectorDBEnums import DistanceMethodEnums
+from ..PayloadStore import PayloadStore
+from models.db_schemes import RetrievedDocument
+from typing import List
+import numpy as np
+import threading
+import logging
+import shutil
+import json
+import os
+from helpers.metrics import track_latency
+
+class NumpyDBProvider(VectorDBInterface):
+    """
+    In-process vector db implementation for Abstract base class (VectorDBInterface).
+
+    Each collection is a folder in db_path with:
+        - vectors.f32: a contiguous float32 matrix (one row per record) read with np.memmap,
+          new records are appended to the end of the file, it's never rewritten,
+        - payloads.sqlite3: the record id, text and metadata of every row (PayloadStore),
+        - config.json: the embedding size, the distance method and the indexed payload fields.
+    For cosine distance the vectors are normalised when inserted, so a search is one exact
+    matrix-vector product followed by a top-k selection (np.argpartition).
+    """
+
+    VECTORS_FILE_NAME = "vectors.f32"
+    PAYLOADS_FILE_NAME = "payloads.sqlite3"
+    CONFIG_FILE_NAME = "config.json"
+
+    def __init__(self, db_path: str, distance_method: str):
+        """
+        Initialize the vector database client.
+
+        Args:
+            db_path (str): The folder of the database (one sub folder per collection).
+            distance_method (str): The distance method to be used for similarity searches.
+                                Should be one of the values from DistanceMethodEnums.
+        """
+        self.db_path = db_path
+        self.distance_method = distance_method
+
+        # loaded collections: name -> state (config, payload store, memory mapped vectors, deleted rows)
+        self.collections = None
+        self.collections_lock = threading.Lock()
+
+        # Set up a logger for the class
+        self.logger = logging.getLogger(__name__)
+
+    def connect(self):
+        """ Establish a connection to the vector database."""
+        os.makedirs(self.db_path, exist_ok=True)
+        self.collections = {}
+
+    def disconnect(self):
+        """ Close the connection to the vector database. """
+        for collection in (self.collections or {}).values():
+            collection["payloads"].close()
+
+        self.collections = None
+
+    def get_collection_path(self, collection_name: str):
+        """Function to return the folder of a collection"""
+        return os.path.join(self.db_path, collection_name)
+
+    def get_collection(self, collection_name: str):
+        """Function to return the state of a collection (loaded once), or None if it does not exist"""
+        with self.collections_lock:
+            if collection_name in self.collections:
+                return self.collections[collection_name]
+
+            if not self.is_collection_existed(collection_name):
+                return None
+
+            collection_path = self.get_collection_path(collection_name)
+            with open(os.path.join(collection_path, self.CONFIG_FILE_NAME), "r") as config_file:
+                config = json.load(config_file)
+
+            payloads = PayloadStore(db_path=os.path.join(collection_path, self.PAYLOADS_FILE_NAME))
+            for field_name in config.get("indexed_fields", []):
+                payloads.create_field_index(field_name=field_name)
+
+            self.collections[collection_name] = {
+                "config": config,
+                "vectors_path": os.path.join(collection_path, self.VECTORS_FILE_NAME),
+                "payloads": payloads,
+                "vectors": None, # memory map of the vectors file, reopened when the file grows
+                # immutable, the writers replace it (within the lock) so a search can read it without the lock
+                "deleted_rows": frozenset(payloads.get_deleted_rows()),
+                "lock": threading.Lock(), # one writer at a time
+            }
+
+            return self.collections[collection_name]
+
+    def get_rows_count(self, collection: dict):
+        """Function to return the number of complete rows in the vectors file"""
+        row_bytes = collection["config"]["embedding_size"] * np.dtype(np.float32).itemsize
+        return os.path.getsize(collection["vectors_path"]) // row_bytes
+
+    def get_vectors(self, collection: dict):
+        """Function to return the vectors matrix of a collection (memory mapped, not loaded in memory)"""
+        rows_count = self.get_rows_count(collection)
+
+        if rows_count == 0:
+            return None
+
+        vectors = collection["vectors"]
+        if vectors is None or vectors.shape[0] != rows_count:
+            vectors = collection["vectors"] = np.memmap(
+                collection["vectors_path"], dtype=np.float32, mode="r",
+                shape=(rows_count, collection["config"]["embedding_size"]),
+            )
+
+        return vectors
+
+    def prepare_vectors(self, collection: dict, vectors: list):
+        """Function to convert vectors to a float32 matrix (normalised for cosine distance)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+
+        if collection["config"]["distance_method"] == DistanceMethodEnums.COSINE.value:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+
+        return vectors
+
+    def is_collection_existed(self, collection_name: str) -> bool:
+        """
+        Check if a collection with the specified name exists in the database.
+
+        Args:
+            collection_name (str): The name of the collection to check.
+
+        Returns:
+            bool: True if the collection exists, False otherwise.
+        """
+        return os.path.exists(os.path.join(self.get_collection_path(collection_name), self.CONFIG_FILE_NAME))
+
+    def list_all_collections(self) -> List:
+        """
+        Retrieve a list of all collections available in the database.
+
+        Returns:
+            List: A list of collection names.
+        """
+        return [
+            collection_name
+            for collection_name in sorted(os.listdir(self.db_path))
+            if self.is_collection_existed(collection_name)
+        ]
+
+    def get_collection_info(self, collection_name: str) -> dict:
+        """
+        Retrieve metadata and information about a specific collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            dict: A dictionary containing information about the collection.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return None
+
+        return {
+            "points_count": collection["payloads"].count(),
+            "rows_count": self.get_rows_count(collection),
+            "deleted_rows_count": len(collection["deleted_rows"]),
+            "config": collection["config"],
+        }
+
+    def delete_collection(self, collection_name: str):
+        """
+        Delete a collection from the database.
+
+        Args:
+            collection_name (str): The name of the collection to delete.
+        """
+        if not self.is_collection_existed(collection_name):
+            return None
+
+        with self.collections_lock:
+            collection = self.collections.pop(collection_name, None)
+            if collection is not None:
+                collection["payloads"].close()
+
+            shutil.rmtree(self.get_collection_path(collection_name))
+
+        return True
+
+    def create_collection(self, collection_name: str,
+                                embedding_size: int,
+                                do_reset: bool = False,
+                                quantization: str = None,
+                                indexed_fields: list = None,
+                                tenant_field: str = None):
+        """
+        Create a new collection in the database.
+
+        Args:
+            collection_name (str): The name of the new collection.
+            embedding_size (int): The size of the embedding vectors to store.
+            do_reset (bool, optional): If True, reset/delete the collection if it already exists. Defaults to False.
+            quantization (str, optional): One of QuantizationEnums values to keep compressed copies of the vectors
+                                          for the search. Not supported by this provider (the vectors are
+                                          kept in float32), defaults to None.
+            indexed_fields (list, optional): Payload fields (see insert_many payload_fields) that are indexed
+                                             to be used by the filters. Defaults to None.
+            tenant_field (str, optional): An indexed payload field that splits the collection between tenants
+                                          (every search is filtered by it). Defaults to None.
+        """
+        if do_reset:
+            _ = self.delete_collection(collection_name=collection_name)
+
+        if self.is_collection_existed(collection_name):
+            return False
+
+        if quantization:
+            self.logger.warning(f"Quantization is not supported by {self.__class__.__name__}, "
+                                f"the vectors of {collection_name} are kept in float32")
+
+        collection_path = self.get_collection_path(collection_name)
+        os.makedirs(collection_path, exist_ok=True)
+
+        # empty vectors file, the records are appended to it
+        open(os.path.join(collection_path, self.VECTORS_FILE_NAME), "wb").close()
+
+        # the config is written last, a collection exists only when it has its config
+        with open(os.path.join(collection_path, self.CONFIG_FILE_NAME), "w") as config_file:
+            json.dump({
+                "embedding_size": embedding_size,
+                "distance_method": self.distance_method,
+                "indexed_fields": list(dict.fromkeys([ *([tenant_field] if tenant_field else []),
+                                                       *(indexed_fields or []) ])),
+            }, config_file)
+
+        return True
+
+    def insert_one(self, collection_name: str, text: str, vector: list,
+                         metadata: dict = None,
+                         record_id: str = None):
+        """
+        Insert a single record into a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            text (str): The text data to associate with the vector.
+            vector (list): The vector representation of the text.
+            metadata (dict, optional): Additional metadata to store with the record. Defaults to None.
+            record_id (str, optional): An optional unique identifier for the record. Defaults to None.
+        """
+        return self.insert_many(collection_name=collection_name, texts=[text], vectors=[vector],
+                                metadata=[metadata], record_ids=[record_id] if record_id is not None else None)
+
+    @track_latency("vectordb", items=lambda args: len(args["texts"]))
+    def insert_many(self, collection_name: str, texts: list,
+                          vectors: list, metadata: list = None,
+                          record_ids: list = None, batch_size: int = 50,
+                          payload_fields: list = None):
+        """
+        Insert multiple records into a collection in batches.
+
+        Args:
+            collection_name (str): The name of the collection.
+            texts (list): A list of text data to associate with the vectors.
+            vectors (list): A list of vector representations of the texts.
+            metadata (list, optional): A list of metadata dictionaries for each record. Defaults to None.
+            record_ids (list, optional): A list of unique identifiers for the records. Defaults to None.
+            batch_size (int, optional): Not used, all the records are written together. Defaults to 50.
+            payload_fields (list, optional): A dictionary of filterable fields (e.g. {"project_id": ...})
+                                             for each record. Defaults to None.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            self.logger.error(f"Can not insert new record to non-existed collection: {collection_name}")
+            return False
+
+        # these args are optional, in this case we need to make them consistance with other giving lists
+        if metadata is None:
+            metadata = [None] * len(texts)
+
+        if record_ids is None:
+            record_ids = list(range(0, len(texts)))
+
+        if payload_fields is None:
+            payload_fields = [None] * len(texts)
+
+        if len(texts) == 0:
+            return True
+
+        try:
+            vectors = self.prepare_vectors(collection, vectors)
+        except ValueError as e:
+            self.logger.error(f"Error while inserting batch: {e}")
+            return False
+
+        if vectors.shape[1] != collection["config"]["embedding_size"]:
+            self.logger.error(f"Can not insert vectors of size {vectors.shape[1]} to collection: {collection_name}")
+            return False
+
+        # the last record wins if the same id is repeated in the batch
+        positions = { str(record_id): i for i, record_id in enumerate(record_ids) }
+        positions = list(positions.items())
+
+        with collection["lock"]:
+            existing_rows = collection["payloads"].get_rows(record_ids=[ record_id for record_id, _ in positions ])
+            next_row = self.get_rows_count(collection)
+
+            rows = []
+            new_positions = []
+            updated_rows, updated_positions = [], []
+
+            for record_id, i in positions:
+                if record_id in existing_rows:
+                    updated_rows.append(existing_rows[record_id])
+                    updated_positions.append(i)
+                    rows.append(existing_rows[record_id])
+                else:
+                    new_positions.append(i)
+                    rows.append(next_row + len(new_positions) - 1)
+
+            try:
+                # new records are appended to the end of the file
+                if len(new_positions):
+                    with open(collection["vectors_path"], "ab") as vectors_file:
+                        vectors_file.write(vectors[new_positions].tobytes())
+
+                # existing records (updated or deleted before) are overwritten in place
+                if len(updated_rows):
+                    file_vectors = np.memmap(collection["vectors_path"], dtype=np.float32, mode="r+",
+                                             shape=(next_row + len(new_positions), vectors.shape[1]))
+                    file_vectors[updated_rows] = vectors[updated_positions]
+                    file_vectors.flush()
+                    del file_vectors
+
+                collection["payloads"].set_records(
+                    rows=rows,
+                    record_ids=[ record_id for record_id, _ in positions ],
+                    texts=[ texts[i] for _, i in positions ],
+                    metadata=[ metadata[i] for _, i in positions ],
+                    fields=[ payload_fields[i] for _, i in positions ],
+                )
+            except Exception as e:
+                self.logger.error(f"Error while inserting batch: {e}")
+                return False
+
+            collection["deleted_rows"] = collection["deleted_rows"].difference(updated_rows)
+
+            self.on_rows_written(collection=collection, rows=rows,
+                                 vectors=vectors[[ i for _, i in positions ]])
+
+        return True
+
+    def on_rows_written(self, collection: dict, rows: list, vectors: np.ndarray):
+        """Hook called (within the collection lock) after records are written to the giving rows,
+        used by the providers that keep an index over the vectors"""
+        pass
+
+    def delete_many(self, collection_name: str, record_ids: list):
+        """
+        Delete multiple records from a collection by their IDs.
+
+        Args:
+            collection_name (str): The name of the collection.
+            record_ids (list): The unique identifiers of the records to delete.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None or len(record_ids) == 0:
+            return False
+
+        # the rows are only marked as deleted (skipped by the search), the file is not rewritten
+        with collection["lock"]:
+            deleted_rows = collection["payloads"].delete_records(record_ids=record_ids)
+            collection["deleted_rows"] = collection["deleted_rows"].union(deleted_rows)
+
+        return True
+
+    def delete_by_filter(self, collection_name: str, filters: dict):
+        """
+        Delete the records of a collection that match a filter.
+
+        Args:
+            collection_name (str): The name of the collection.
+            filters (dict): Payload field -> value, a record matches when all the fields are equal.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None or not filters:
+            return False
+
+        with collection["lock"]:
+            deleted_rows = collection["payloads"].delete_by_filter(filters=filters)
+            collection["deleted_rows"] = collection["deleted_rows"].union(deleted_rows)
+
+        return True
+
+    def count(self, collection_name: str, filters: dict = None) -> int:
+        """
+        Count the records of a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            filters (dict, optional): Count only the records that match (payload field -> value). Defaults to None.
+
+        Returns:
+            int: The number of records.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return 0
+
+        return collection["payloads"].count(filters=filters)
+
+    def iterate_record_ids(self, collection_name: str, batch_size: int = 1000, filters: dict = None):
+        """
+        Iterate over the IDs of all records in a collection (without their vectors or payloads).
+
+        Args:
+            collection_name (str): The name of the collection.
+            batch_size (int, optional): The number of IDs in each yielded batch. Defaults to 1000.
+            filters (dict, optional): Only the records that match (payload field -> value). Defaults to None.
+
+        Yields:
+            list: A batch of record IDs.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return
+
+        yield from collection["payloads"].iterate_record_ids(batch_size=batch_size, filters=filters)
+
+    @track_latency("vectordb")
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5, search_params: dict = None,
+                         filters: dict = None, with_vectors: bool = False):
+        """
+        Search for the most similar vectors in a collection to the given vector.
+
+        Args:
+            collection_name (str): The name of the collection to search.
+            vector (list): The query vector.
+            limit (int): The maximum number of results to return.
+            search_params (dict, optional): Not used, the search is always exact. Defaults to None.
+            filters (dict, optional): Search only the records that match (payload field -> value).
+                                      Defaults to None.
+            with_vectors (bool, optional): Whether the stored vectors are returned with the documents.
+                                           Defaults to False.
+
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return None
+
+        vectors = self.get_vectors(collection)
+        if vectors is None:
+            return None
+
+        query = self.prepare_vectors(collection, vector)[0]
+
+        # filtered search: only the rows of the matching records are scored
+        if filters:
+            rows = self.get_filtered_rows(collection, filters=filters, rows_count=vectors.shape[0])
+            if rows.shape[0] == 0:
+                return None
+
+            return self.get_top_documents(collection=collection, scores=np.asarray(vectors[rows]) @ query,
+                                          limit=limit, rows=rows, vectors=vectors if with_vectors else None)
+
+        # exact scores of all the rows in one product
+        scores = vectors @ query
+
+        return self.get_top_documents(collection=collection, scores=scores, limit=limit,
+                                      vectors=vectors if with_vectors else None)
+
+    @track_latency("vectordb", items=lambda args: len(args["vectors"]))
+    def search_by_vectors(self, collection_name: str, vectors: list, limit: int = 5, search_params: dict = None,
+                          filters: dict = None, with_vectors: bool = False):
+        """
+        Search for the most similar vectors of many queries, the scores of all the queries
+        are computed by one matrix product.
+
+        Args:
+            Same as search_by_vectors of VectorDBInterface.
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return None
+
+        stored_vectors = self.get_vectors(collection)
+        if stored_vectors is None or len(vectors) == 0:
+            return [ [] for _ in vectors ]
+
+        queries = self.prepare_vectors(collection, vectors)
+
+        rows, candidate_vectors = None, stored_vectors
+        if filters:
+            rows = self.get_filtered_rows(collection, filters=filters, rows_count=stored_vectors.shape[0])
+            if rows.shape[0] == 0:
+                return [ [] for _ in vectors ]
+
+            candidate_vectors = stored_vectors[rows]
+
+        # (queries x rows) scores
+        scores = queries @ np.asarray(candidate_vectors).T
+
+        return [
+            self.get_top_documents(collection=collection, scores=query_scores, limit=limit, rows=rows,
+                                   vectors=stored_vectors if with_vectors else None) or []
+            for query_scores in scores
+        ]
+
+    def get_filtered_rows(self, collection: dict, filters: dict, rows_count: int):
+        """Function to return the rows (sorted, within the vectors file) of the records that match a filter"""
+        rows = np.asarray(collection["payloads"].get_filtered_rows(filters=filters), dtype=np.int64)
+        return rows[rows < rows_count]
+
+    def get_top_documents(self, collection: dict, scores: np.ndarray, limit: int, rows: np.ndarray = None,
+                          vectors: np.ndarray = None):
+        """
+        Select the records with the highest scores.
+
+        Args:
+            collection (dict): The state of the collection.
+            scores (np.ndarray): The scores of the candidate rows.
+            limit (int): The maximum number of results to return.
+            rows (np.ndarray, optional): The row of each score. Defaults to None (the score of row i is scores[i]).
+            vectors (np.ndarray, optional): The stored vectors, when the documents are returned with their vectors.
+                                            Defaults to None.
+
+        Returns:
+            List[RetrievedDocument] or None: The records ordered by their scores.
+        """
+        if rows is None:
+            rows = np.arange(scores.shape[0])
+
+        # a snapshot, the writers replace the set instead of changing it
+        deleted_rows = collection["deleted_rows"]
+        if len(deleted_rows):
+            deleted_rows = np.fromiter(deleted_rows, dtype=np.int64, count=len(deleted_rows))
+            scores = np.where(np.isin(rows, deleted_rows), -np.inf, scores)
+
+        if scores.shape[0] == 0:
+            return None
+
+        # top-k without sorting all the scores, then sort the k results
+        limit = min(limit, scores.shape[0])
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+
+        if len(top) == 0:
+            return None
+
+        top_rows = rows[top].tolist()
+        payloads = collection["payloads"].get_payloads(rows=top_rows)
+
+        return [
+            RetrievedDocument(**{
+                "score": float(score),
+                "text": payloads[row]["text"],
+                "vector": vectors[row].tolist() if vectors is not None else None,
+            })
+            for row, score in zip(top_rows, scores[top].tolist())
+            if row in payloads # a row written without its payload (interrupted insert) is skipped
+        ]
@@ -1,27 +1,68 @@
-from qdrant_client import models, QdrantClient
+from qdrant_client import models, QdrantClient, AsyncQdrantClient
 from ..VectorDBInterface import VectorDBInterface
-from ..VectorDBEnums import DistanceMethodEnums
+from ..VectorDBEnums import DistanceMethodEnums, QuantizationEnums
+import httpx
 import logging
 from typing import List
 from models.db_schemes import RetrievedDocument
+from helpers.metrics import track_latency
 
 class QdrantDBProvider(VectorDBInterface):
-    """ Qdrant db implementation for Abstract base class (VectorDBInterface) """
+    """
+    Qdrant db implementation for Abstract base class (VectorDBInterface)
+
+    Without a url the client runs in local mode on db_path (the folder is locked by one process),
+    with a url it connects to a qdrant server (REST or gRPC), so many API workers / replicas
+    could share the same collections, and the searches use the async client.
+    """
     
-    def __init__(self, db_path: str, distance_method: str):
+    def __init__(self, db_path: str, distance_method: str,
+                 quantization: str = None,
+                 quantization_oversampling: float = 2.0,
+                 quantization_rescore: bool = True,
+                 url: str = None, api_key: str = None,
+                 prefer_grpc: bool = False, grpc_port: int = 6334,
+                 timeout: int = None, pool_size: int = None,
+                 upload_parallel: int = 1, upload_batch_size: int = 64):
         """
         Initialize the vector database client.
 
         Args:
-            db_path (str): The file path to the database.
+            db_path (str): The file path to the database (local mode).
             distance_method (str): The distance method to be used for similarity searches.
                                 Should be one of the values from DistanceMethodEnums.
+            quantization (str, optional): Default quantization of the new collections, one of QuantizationEnums
+                                          values. Defaults to None (float32 vectors only).
+            quantization_oversampling (float): The search fetches limit * oversampling candidates from the
+                                               quantized vectors. Defaults to 2.0.
+            quantization_rescore (bool): Whether the candidates are rescored with the original vectors.
+                                         Defaults to True.
+            url (str, optional): The url of a qdrant server (e.g. http://localhost:6333). Defaults to None (local mode).
+            api_key (str, optional): The API key of the server. Defaults to None.
+            prefer_grpc (bool): Use gRPC instead of REST for the server calls. Defaults to False.
+            grpc_port (int): The gRPC port of the server. Defaults to 6334.
+            timeout (int, optional): Timeout (seconds) of the server calls. Defaults to None (client default).
+            pool_size (int, optional): Maximum number of (keep-alive) REST connections per client.
+                                       Defaults to None (client default).
+            upload_parallel (int): Number of parallel upload workers (processes) used for the big inserts.
+                                   Defaults to 1.
+            upload_batch_size (int): Number of points sent in each upload request. Defaults to 64.
         """
-        # Initialize the database client as None (to be set up later)
+        # Initialize the database clients as None (to be set up later)
         self.client = None
+        self.async_client = None
 
-        # Store the database path
+        # Store the database path (local mode) or the server settings
         self.db_path = db_path
+        self.url = url
+        self.api_key = api_key
+        self.prefer_grpc = prefer_grpc
+        self.grpc_port = grpc_port
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self.upload_parallel = upload_parallel
+        self.upload_batch_size = upload_batch_size
 
         # Initialize the distance method based on the input string
         self.distance_method = None
@@ -32,17 +73,55 @@ class QdrantDBProvider(VectorDBInterface):
             # Set to dot product similarity if specified
             self.distance_method = models.Distance.DOT
 
+        # quantized collections: compressed vectors in RAM, the original vectors on disk for the rescoring
+        self.quantization = quantization
+        self.quantization_oversampling = quantization_oversampling
+        self.quantization_rescore = quantization_rescore
+
         # Set up a logger for the class
         self.logger = logging.getLogger(__name__)
 
+    def get_server_client_args(self):
+        """Function to return the arguments of the (sync and async) server clients"""
+        client_args = {
+            "url": self.url,
+            "api_key": self.api_key,
+            "prefer_grpc": self.prefer_grpc,
+            "grpc_port": self.grpc_port,
+            "timeout": self.timeout,
+        }
+
+        # connection pool of the REST transport
+        if self.pool_size:
+            client_args["limits"] = httpx.Limits(max_connections=self.pool_size,
+                                                 max_keepalive_connections=self.pool_size)
+
+        return client_args
+
     def connect(self):
         """ Establish a connection to the vector database."""
-        self.client = QdrantClient(path=self.db_path)
+        if self.url:
+            self.client = QdrantClient(**self.get_server_client_args())
+            self.async_client = AsyncQdrantClient(**self.get_server_client_args())
+        else:
+            # the local storage can not be opened by a second client, the async calls use the sync client
+            self.client = QdrantClient(path=self.db_path)
 
     def disconnect(self):
         """ Close the connection to the vector database. """
+        if self.client is not None:
+            self.client.close()
+
         self.client = None
 
+    async def disconnect_async(self):
+        """ Close the connections of the sync and async clients. """
+        if self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+
+        self.disconnect()
+
     def is_collection_existed(self, collection_name: str) -> bool:
         """
         Check if a collection with the specified name exists in the database.
@@ -86,9 +165,33 @@ class QdrantDBProvider(VectorDBInterface):
         if self.is_collection_existed(collection_name):
             return self.client.delete_collection(collection_name=collection_name)
         
+    def get_quantization_config(self, quantization: str):
+        """Function to return the qdrant quantization config of a QuantizationEnums value"""
+        if quantization == QuantizationEnums.SCALAR.value:
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99, # the outliers are clipped to keep the precision of the common values
+                    always_ram=True,
+                )
+            )
+
+        if quantization == QuantizationEnums.BINARY.value:
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=True)
+            )
+
+        if quantization:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+
+        return None
+
     def create_collection(self, collection_name: str, 
                                 embedding_size: int,
-                                do_reset: bool = False):
+                                do_reset: bool = False,
+                                quantization: str = None,
+                                indexed_fields: list = None,
+                                tenant_field: str = None):
         """
         Create a new collection in the database.
 
@@ -96,19 +199,47 @@ class QdrantDBProvider(VectorDBInterface):
             collection_name (str): The name of the new collection.
             embedding_size (int): The size of the embedding vectors to store.
             do_reset (bool, optional): If True, reset/delete the collection if it already exists. Defaults to False.
+            quantization (str, optional): One of QuantizationEnums values to keep compressed copies of the vectors
+                                          for the search. Defaults to None (the default of the provider).
+            indexed_fields (list, optional): Payload fields (see insert_many payload_fields) that are indexed
+                                             to be used by the filters. Defaults to None.
+            tenant_field (str, optional): An indexed payload field that splits the collection between tenants
+                                          (every search is filtered by it). Defaults to None.
         """
         if do_reset:
             _ = self.delete_collection(collection_name=collection_name)
         
         if not self.is_collection_existed(collection_name):
+            quantization_config = self.get_quantization_config(quantization or self.quantization)
+
             _ = self.client.create_collection(
                 collection_name=collection_name,
                 vectors_config=models.VectorParams(
                     size=embedding_size,
-                    distance=self.distance_method
-                )
+                    distance=self.distance_method,
+                    # with quantization the original vectors are only read to rescore the candidates
+                    on_disk=quantization_config is not None,
+                ),
+                quantization_config=quantization_config,
+                # multi-tenant collection: one HNSW graph per tenant instead of a global one
+                hnsw_config=models.HnswConfigDiff(payload_m=16, m=0) if tenant_field else None,
             )
 
+            if tenant_field:
+                _ = self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=tenant_field,
+                    field_schema=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+                )
+
+            for field_name in indexed_fields or []:
+                if field_name != tenant_field:
+                    _ = self.client.create_payload_index(
+                        collection_name=collection_name,
+                        field_name=field_name,
+                        field_schema=models.PayloadSchemaType.KEYWORD,
+                    )
+
             return True
         
         return False
@@ -132,11 +263,11 @@ class QdrantDBProvider(VectorDBInterface):
             return False
         
         try:
-            _ = self.client.upload_records(
+            _ = self.client.upsert(
                 collection_name=collection_name,
-                records=[
-                    models.Record(
-                        id=[record_id],
+                points=[
+                    models.PointStruct(
+                        id=record_id,
                         vector=vector,
                         payload={
                             "text": text, "metadata": metadata
@@ -150,9 +281,11 @@ class QdrantDBProvider(VectorDBInterface):
 
         return True
     
+    @track_latency("vectordb", items=lambda args: len(args["texts"]))
     def insert_many(self, collection_name: str, texts: list, 
                           vectors: list, metadata: list = None, 
-                          record_ids: list = None, batch_size: int = 50):
+                          record_ids: list = None, batch_size: int = 50,
+                          payload_fields: list = None):
         """
         Insert multiple records into a collection in batches.
 
@@ -162,51 +295,168 @@ class QdrantDBProvider(VectorDBInterface):
             vectors (list): A list of vector representations of the texts.
             metadata (list, optional): A list of metadata dictionaries for each record. Defaults to None.
             record_ids (list, optional): A list of unique identifiers for the records. Defaults to None.
-            batch_size (int, optional): The size of each batch for insertion. Defaults to 50.
+            batch_size (int, optional): Not used, the points are sent in batches of upload_batch_size.
+                                        Defaults to 50.
+            payload_fields (list, optional): A dictionary of filterable fields (e.g. {"project_id": ...})
+                                             for each record. Defaults to None.
         """
         # these args are optional, in this case we need to make them consistance with other giving lists
         if metadata is None:
             metadata = [None] * len(texts)
 
+        if payload_fields is None:
+            payload_fields = [{}] * len(texts)
+
         if record_ids is None:
             record_ids = list(range(0, len(texts)))
 
-        # loop over batches
-        for i in range(0, len(texts), batch_size):
-            batch_end = i + batch_size
-
-            # identify batch records
-            batch_texts = texts[i:batch_end]
-            batch_vectors = vectors[i:batch_end]
-            batch_metadata = metadata[i:batch_end]
-            batch_record_ids = record_ids[i:batch_end]
-
-            # prepare list of records
-            batch_records = [
-                models.Record(
-                    id=batch_record_ids[x],
-                    vector=batch_vectors[x],
-                    payload={
-                        "text": batch_texts[x], "metadata": batch_metadata[x]
-                    }
-                )
+        # the points are created while they are uploaded
+        points = (
+            models.PointStruct(
+                id=record_id,
+                vector=vector,
+                payload={
+                    "text": text, "metadata": record_metadata,
+                    **(record_payload_fields or {}),
+                }
+            )
+            for text, vector, record_metadata, record_id, record_payload_fields in zip(
+                texts, vectors, metadata, record_ids, payload_fields
+            )
+        )
 
-                for x in range(len(batch_texts))
-            ]
+        # the parallel workers open their own clients (server mode only), they are started
+        # only when there is enough points to keep them busy
+        parallel = 1
+        if self.url and len(texts) >= self.upload_parallel * self.upload_batch_size:
+            parallel = self.upload_parallel
 
-            try:
-                # insert the batch
-                _ = self.client.upload_records(
-                    collection_name=collection_name,
-                    records=batch_records,
-                )
-            except Exception as e:
-                self.logger.error(f"Error while inserting batch: {e}")
-                return False
+        try:
+            # wait for the points to be stored, the caller marks them as indexed after this call
+            self.client.upload_points(
+                collection_name=collection_name,
+                points=points,
+                batch_size=self.upload_batch_size,
+                parallel=parallel,
+                max_retries=3,
+                wait=True,
+            )
+        except Exception as e:
+            self.logger.error(f"Error while inserting batch: {e}")
+            return False
+
+        return True
+
+    def delete_many(self, collection_name: str, record_ids: list):
+        """
+        Delete multiple records from a collection by their IDs.
+
+        Args:
+            collection_name (str): The name of the collection.
+            record_ids (list): The unique identifiers of the records to delete.
+        """
+        if len(record_ids) == 0 or not self.is_collection_existed(collection_name):
+            return False
+
+        try:
+            _ = self.client.delete(
+                collection_name=collection_name,
+                points_selector=models.PointIdsList(points=record_ids),
+            )
+        except Exception as e:
+            self.logger.error(f"Error while deleting records: {e}")
+            return False
+
+        return True
+
+    def get_filter(self, filters: dict):
+        """Function to return the qdrant filter of a payload field -> value dictionary (all must match)"""
+        if not filters:
+            return None
+
+        return models.Filter(must=[
+            models.FieldCondition(key=field_name, match=models.MatchValue(value=value))
+            for field_name, value in filters.items()
+        ])
+
+    def delete_by_filter(self, collection_name: str, filters: dict):
+        """
+        Delete the records of a collection that match a filter.
+
+        Args:
+            collection_name (str): The name of the collection.
+            filters (dict): Payload field -> value, a record matches when all the fields are equal.
+        """
+        if not filters or not self.is_collection_existed(collection_name):
+            return False
+
+        try:
+            _ = self.client.delete(
+                collection_name=collection_name,
+                points_selector=models.FilterSelector(filter=self.get_filter(filters)),
+            )
+        except Exception as e:
+            self.logger.error(f"Error while deleting records: {e}")
+            return False
 
         return True
+
+    def count(self, collection_name: str, filters: dict = None) -> int:
+        """
+        Count the records of a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            filters (dict, optional): Count only the records that match (payload field -> value). Defaults to None.
+
+        Returns:
+            int: The number of records.
+        """
+        if not self.is_collection_existed(collection_name):
+            return 0
+
+        return self.client.count(
+            collection_name=collection_name,
+            count_filter=self.get_filter(filters),
+            exact=True,
+        ).count
+
+    def iterate_record_ids(self, collection_name: str, batch_size: int = 1000, filters: dict = None):
+        """
+        Iterate over the IDs of all records in a collection (without their vectors or payloads).
+
+        Args:
+            collection_name (str): The name of the collection.
+            batch_size (int, optional): The number of IDs in each yielded batch. Defaults to 1000.
+            filters (dict, optional): Only the records that match (payload field -> value). Defaults to None.
+
+        Yields:
+            list: A batch of record IDs.
+        """
+        if not self.is_collection_existed(collection_name):
+            return
+
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                scroll_filter=self.get_filter(filters),
+                with_payload=False,
+                with_vectors=False,
+            )
+
+            if len(records):
+                yield [ record.id for record in records ]
+
+            # no offset means the scroll reached the last page
+            if offset is None:
+                return
         
-    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5):
+    @track_latency("vectordb")
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5, search_params: dict = None,
+                         filters: dict = None, with_vectors: bool = False):
         """
         Search for the most similar vectors in a collection to the given vector.
 
@@ -214,14 +464,133 @@ class QdrantDBProvider(VectorDBInterface):
             collection_name (str): The name of the collection to search.
             vector (list): The query vector.
             limit (int): The maximum number of results to return.
+            search_params (dict, optional): "hnsw_ef" (size of the HNSW candidates list), "exact" (scan all the
+                                            vectors), "oversampling" and "rescore" (for quantized collections,
+                                            override the defaults of the provider). Defaults to None.
+            filters (dict, optional): Search only the records that match (payload field -> value).
+                                      Defaults to None.
+            with_vectors (bool, optional): Whether the stored vectors are returned with the documents.
+                                           Defaults to False.
 
         """
         results = self.client.search(
+            **self.get_search_args(collection_name=collection_name, vector=vector, limit=limit,
+                                   search_params=search_params, filters=filters, with_vectors=with_vectors)
+        )
+
+        return self.get_retrieved_documents(results=results)
+
+    @track_latency("vectordb")
+    async def search_by_vector_async(self, collection_name: str, vector: list, limit: int = 5,
+                                     search_params: dict = None, filters: dict = None,
+                                     with_vectors: bool = False):
+        """
+        Search for the most similar vectors in a collection without blocking the event loop
+        (with the async client in server mode, in a thread in local mode).
+
+        Args:
+            Same as search_by_vector.
+        """
+        if self.async_client is None:
+            return await super().search_by_vector_async(collection_name=collection_name, vector=vector,
+                                                        limit=limit, search_params=search_params,
+                                                        filters=filters, with_vectors=with_vectors)
+
+        results = await self.async_client.search(
+            **self.get_search_args(collection_name=collection_name, vector=vector, limit=limit,
+                                   search_params=search_params, filters=filters, with_vectors=with_vectors)
+        )
+
+        return self.get_retrieved_documents(results=results)
+
+    @track_latency("vectordb", items=lambda args: len(args["vectors"]))
+    def search_by_vectors(self, collection_name: str, vectors: list, limit: int = 5,
+                          search_params: dict = None, filters: dict = None, with_vectors: bool = False):
+        """
+        Search for the most similar vectors of many queries in one request (qdrant search_batch).
+
+        Args:
+            Same as search_by_vectors of VectorDBInterface.
+        """
+        batch_results = self.client.search_batch(
             collection_name=collection_name,
-            query_vector=vector,
-            limit=limit
+            requests=self.get_search_requests(vectors=vectors, limit=limit, search_params=search_params,
+                                              filters=filters, with_vectors=with_vectors),
         )
 
+        return [ self.get_retrieved_documents(results=results) or [] for results in batch_results ]
+
+    @track_latency("vectordb", items=lambda args: len(args["vectors"]))
+    async def search_by_vectors_async(self, collection_name: str, vectors: list, limit: int = 5,
+                                      search_params: dict = None, filters: dict = None,
+                                      with_vectors: bool = False):
+        """
+        Batched search without blocking the event loop (with the async client in server mode, in a thread in local mode).
+
+        Args:
+            Same as search_by_vectors of VectorDBInterface.
+        """
+        if self.async_client is None:
+            return await super().search_by_vectors_async(collection_name=collection_name, vectors=vectors,
+                                                         limit=limit, search_params=search_params,
+                                                         filters=filters, with_vectors=with_vectors)
+
+        batch_results = await self.async_client.search_batch(
+            collection_name=collection_name,
+            requests=self.get_search_requests(vectors=vectors, limit=limit, search_params=search_params,
+                                              filters=filters, with_vectors=with_vectors),
+        )
+
+        return [ self.get_retrieved_documents(results=results) or [] for results in batch_results ]
+
+    def get_search_requests(self, vectors: list, limit: int, search_params: dict = None, filters: dict = None,
+                            with_vectors: bool = False):
+        """Function to return the requests of a batched search (one per query vector, with the same options)"""
+        search_requests = []
+
+        for vector in vectors:
+            search_args = self.get_search_args(collection_name=None, vector=vector, limit=limit,
+                                               search_params=search_params, filters=filters,
+                                               with_vectors=with_vectors)
+
+            search_requests.append(models.SearchRequest(
+                vector=search_args["query_vector"],
+                filter=search_args["query_filter"],
+                limit=search_args["limit"],
+                params=search_args["search_params"],
+                with_payload=True,
+                with_vector=search_args["with_vectors"],
+            ))
+
+        return search_requests
+
+    def get_search_args(self, collection_name: str, vector: list, limit: int,
+                        search_params: dict = None, filters: dict = None, with_vectors: bool = False):
+        """Function to return the arguments of a search call (shared by the sync and async clients)"""
+        search_params = search_params or {}
+
+        # ignored by qdrant for the collections without quantization
+        quantization_params = models.QuantizationSearchParams(
+            ignore=False,
+            rescore=bool(search_params.get("rescore", self.quantization_rescore)),
+            oversampling=float(search_params.get("oversampling", self.quantization_oversampling)),
+        )
+
+        return {
+            "collection_name": collection_name,
+            "query_vector": vector,
+            "query_filter": self.get_filter(filters),
+            "limit": limit,
+            "with_vectors": with_vectors,
+            "search_params": models.SearchParams(
+                hnsw_ef=search_params.get("hnsw_ef"),
+                exact=bool(search_params.get("exact", False)),
+                quantization=quantization_params,
+            ),
+        }
+
+    def get_retrieved_documents(self, results: list):
+        """Function to convert the points of a search to retrieved documents"""
         if not results or len(results) == 0:
             return None
         
@@ -229,6 +598,7 @@ class QdrantDBProvider(VectorDBInterface):
             RetrievedDocument(**{
                 "score": result.score,
                 "text": result.payload["text"],
+                "vector": result.vector if isinstance(result.vector, list) else None,
             })
             for result in results
         ]
@@ -1 +1,3 @@
 from .QdrantDBProvider import QdrantDBProvider
+from .NumpyDBProvider import NumpyDBProvider
+from .IVFDBProvider import IVFDBProvider